@@ -1,128 +1,94 @@
 import os
 import json
 import textwrap
-import hashlib
 import langextract as lx
 from dotenv import load_dotenv
-import re
+import time
+from routes.llm_cache import get_cache, make_key
+from routes.metrics import record_llm_call
+from routes.analysis_cache import get_analysis_cache
+from routes.transcripts import parse_transcript
+from routes.convo_store import read_conversation
 
 load_dotenv()
 API_KEY = os.getenv("GEMINI_API_KEY")
 if not API_KEY:
     raise ValueError("GEMINI_API_KEY missing")
 
-def get_cache_key(filepath):
-    """Generate a unique cache key based on file content and modification time"""
-    try:
-        # Get file modification time and content hash
-        mtime = os.path.getmtime(filepath)
-        with open(filepath, 'rb') as f:
-            content_hash = hashlib.md5(f.read()).hexdigest()
-        
-        # Create cache key from filename, mtime, and content hash
-        filename = os.path.basename(filepath)
-        cache_key = f"{filename}_{mtime}_{content_hash}"
-        return cache_key
-    except Exception as e:
-        print(f"Error generating cache key: {e}")
-        return None
-
-def get_cache_dir():
-    """Get or create the cache directory"""
-    cache_dir = os.path.join(os.path.dirname(__file__), "langextract_cache")
-    os.makedirs(cache_dir, exist_ok=True)
-    return cache_dir
-
-def load_from_cache(cache_key):
-    """Load analysis results from cache if available"""
-    if not cache_key:
-        return None
-    
-    cache_dir = get_cache_dir()
-    cache_file = os.path.join(cache_dir, cache_key, "analysis_result.json")
-    
-    try:
-        if os.path.exists(cache_file):
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cached_data = json.load(f)
-            
-            # Load the visualization HTML separately
-            html_file = os.path.join(cache_dir, cache_key, "visualization.html")
-            if os.path.exists(html_file):
-                with open(html_file, 'r', encoding='utf-8') as f:
-                    cached_data["visualization_html"] = f.read()
-            
-            print(f"Loaded analysis from cache: {cache_key}")
-            return cached_data
-    except Exception as e:
-        print(f"Error loading from cache: {e}")
-    
-    return None
-
-def save_to_cache(cache_key, analysis_result):
-    """Save analysis results to cache"""
-    if not cache_key:
-        return
-    
-    cache_dir = get_cache_dir()
-    call_cache_dir = os.path.join(cache_dir, cache_key)
-    os.makedirs(call_cache_dir, exist_ok=True)
-    
-    try:
-        # Save the main analysis data (without HTML to avoid JSON issues)
-        cache_data = analysis_result.copy()
-        visualization_html = cache_data.pop("visualization_html", "")
-        
-        cache_file = os.path.join(call_cache_dir, "analysis_result.json")
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, indent=2, ensure_ascii=False)
-        
-        # Save visualization HTML separately
-        if visualization_html:
-            html_file = os.path.join(call_cache_dir, "visualization.html")
-            with open(html_file, 'w', encoding='utf-8') as f:
-                f.write(visualization_html)
-        
-        # Also save the extraction files in the cache directory
-        extraction_file = os.path.join(call_cache_dir, "extraction_results.jsonl")
-        if os.path.exists("extraction_results.jsonl"):
-            import shutil
-            shutil.copy2("extraction_results.jsonl", extraction_file)
-        
-        print(f"Saved analysis to cache: {cache_key}")
-    except Exception as e:
-        print(f"Error saving to cache: {e}")
-
 def clean_cache(max_age_days=7):
     """Clean up cache entries older than max_age_days"""
-    import time
-    import shutil
-    
-    cache_dir = get_cache_dir()
-    current_time = time.time()
-    max_age_seconds = max_age_days * 24 * 60 * 60
-    
     try:
-        for cache_entry in os.listdir(cache_dir):
-            cache_path = os.path.join(cache_dir, cache_entry)
-            if os.path.isdir(cache_path):
-                # Check the age of the cache directory
-                cache_age = current_time - os.path.getctime(cache_path)
-                if cache_age > max_age_seconds:
-                    shutil.rmtree(cache_path)
-                    print(f"Removed old cache entry: {cache_entry}")
+        for entry in get_analysis_cache().clean(max_age_days):
+            print(f"Removed old cache entry: {entry}")
     except Exception as e:
         print(f"Error cleaning cache: {e}")
 
 def list_cache_entries():
     """List all cache entries for debugging"""
-    cache_dir = get_cache_dir()
+    return get_analysis_cache().list_entries()
+
+EXTRACTION_MODEL = "gemini-2.5-flash-lite"
+
+
+def _serialize(obj):
+    """Serialize extraction objects to JSON-compatible format"""
+    import enum
+    if isinstance(obj, enum.Enum):
+        return obj.name
+    elif hasattr(obj, '__dict__'):
+        return {k: _serialize(v) for k, v in vars(obj).items()}
+    elif isinstance(obj, list):
+        return [_serialize(v) for v in obj]
+    elif isinstance(obj, dict):
+        return {k: _serialize(v) for k, v in obj.items()}
+    else:
+        return obj
+
+
+def run_extraction(full_transcript, prompt, examples, output_jsonl_path):
+    """lx.extract through the shared LLM response cache.
+    Leaves the annotated-document JSONL at output_jsonl_path (needed by
+    lx.visualize) and returns the serialized extractions."""
+    key = make_key(EXTRACTION_MODEL, prompt + "\n" + full_transcript, examples=repr(examples))
+    upstream = []
+
+    def compute():
+        upstream.append(True)
+        result = lx.extract(
+            text_or_documents=full_transcript,
+            prompt_description=prompt,
+            examples=examples,
+            model_id=EXTRACTION_MODEL,
+            
+            # extraction_passes=2,
+            # max_workers=4,
+            # max_char_buffer=800
+        )
+        # without output_dir langextract also creates test_output/ in the working directory
+        lx.io.save_annotated_documents([result], output_dir=os.path.dirname(output_jsonl_path),
+                                       output_name=os.path.basename(output_jsonl_path), show_progress=False)
+        with open(output_jsonl_path, "r", encoding="utf-8") as f:
+            jsonl = f.read()
+        return json.dumps({
+            "extractions": [_serialize(ext) for ext in result.extractions],
+            "jsonl": jsonl,
+        }, ensure_ascii=False)
+
+    # lx.extract calls the model itself, so it is timed here rather than in llm_client.generate
+    started = time.perf_counter()
     try:
-        entries = [d for d in os.listdir(cache_dir) if os.path.isdir(os.path.join(cache_dir, d))]
-        return sorted(entries)
+        text = get_cache().get_or_compute(key, compute, model=EXTRACTION_MODEL)
     except Exception as e:
-        print(f"Error listing cache entries: {e}")
-        return []
+        record_llm_call(EXTRACTION_MODEL, "analysis.extract", time.perf_counter() - started,
+                        prompt + full_transcript, error=e, source="upstream")
+        raise
+    record_llm_call(EXTRACTION_MODEL, "analysis.extract", time.perf_counter() - started,
+                    prompt + full_transcript, text, source="upstream" if upstream else "cache")
+    cached = json.loads(text)
+    with open(output_jsonl_path, "w", encoding="utf-8") as f:
+        f.write(cached["jsonl"])
+    return cached["extractions"]
+
 
 def analyze_conversation_with_langextract(filepath):
     """
@@ -130,20 +96,18 @@ def analyze_conversation_with_langextract(filepath):
     action items, and emotions with proper attributes.
     Uses caching to avoid re-analyzing unchanged files.
     """
-    # Check cache first
-    cache_key = get_cache_key(filepath)
-    cached_result = load_from_cache(cache_key)
-    if cached_result:
-        return cached_result
-    
+    return get_analysis_cache().get_or_compute(filepath, _run_analysis)
+
+
+def _run_analysis(filepath, workspace):
+    """Uncached analysis; scratch files go into workspace (a private temp dir)"""
     print(f"Processing new analysis for: {os.path.basename(filepath)}")
     
     conversation = []
     summary_metrics = {}
     _, ext = os.path.splitext(filepath)
     if ext.lower() == ".json":
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = read_conversation(filepath)
         conversation = data.get("conversation", [])
         summary_metrics = data.get("summary", {})
     else:
@@ -151,32 +115,7 @@ def analyze_conversation_with_langextract(filepath):
         with open(filepath, "r", encoding="utf-8") as f:
             text = f.read()
 
-        # Basic heuristic: lines with "Villager:" are user, lines with named caller/agent are ai
-        # We'll capture speaker prefixes like "Villager:" or "Sumitra Devi:" at line starts.
-        lines = [ln.strip() for ln in text.splitlines()]
-        speaker_re = re.compile(r"^(?P<speaker>[A-Za-z .]+):\s*(?P<msg>.*)$")
-        last_speaker = None
-        for ln in lines:
-            if not ln:
-                continue
-            m = speaker_re.match(ln)
-            if m:
-                raw_speaker = m.group("speaker").strip().lower()
-                msg = m.group("msg").strip()
-                if not msg:
-                    continue
-                # Map to 'user' or 'ai'
-                if "villager" in raw_speaker or "user" in raw_speaker:
-                    speaker = "user"
-                else:
-                    speaker = "ai"
-                conversation.append({"speaker": speaker, "text": msg})
-                last_speaker = speaker
-            else:
-                # Continuation of previous speaker or assign alternately
-                if last_speaker is None:
-                    last_speaker = "user"
-                conversation.append({"speaker": last_speaker, "text": ln})
+        conversation = parse_transcript(text)
         # Minimal metrics when none available
         user_turns = sum(1 for m in conversation if m.get("speaker") == "user")
         ai_turns = sum(1 for m in conversation if m.get("speaker") == "ai")
@@ -555,43 +494,16 @@ def analyze_conversation_with_langextract(filepath):
         ),
     ]
 
-    # Run LangExtract analysis
-    result = lx.extract(
-        text_or_documents=full_transcript,
-        prompt_description=prompt,
-        examples=examples,
-        model_id="gemini-2.5-flash-lite",
-        
-        # extraction_passes=2,
-        # max_workers=4,
-        # max_char_buffer=800
-    )
-
-    def serialize(obj):
-        """Serialize extraction objects to JSON-compatible format"""
-        import enum
-        if isinstance(obj, enum.Enum):
-            return obj.name
-        elif hasattr(obj, '__dict__'):
-            return {k: serialize(v) for k, v in vars(obj).items()}
-        elif isinstance(obj, list):
-            return [serialize(v) for v in obj]
-        elif isinstance(obj, dict):
-            return {k: serialize(v) for k, v in obj.items()}
-        else:
-            return obj
-
-    # Serialize extractions
-    extractions = [serialize(ext) for ext in result.extractions]
-    # Save the results to a JSONL file in a known absolute path
-    output_jsonl_path = os.path.abspath("extraction_results.jsonl")
-    lx.io.save_annotated_documents([result], output_name=output_jsonl_path)
+    # Run LangExtract analysis (identical transcript + prompt + examples reuse the cached run)
+    output_jsonl_path = os.path.join(workspace, "extraction_results.jsonl")
+    extractions = run_extraction(full_transcript, prompt, examples, output_jsonl_path)
 
     # Generate the interactive visualization from the saved file
     visualization_html = lx.visualize(output_jsonl_path)
 
-    # Save visualization HTML
-    output_html_path = os.path.abspath("visualization.html")
+    # Save visualization HTML; the cache serves it from /visualization/<id>
+    # instead of it riding along in the JSON
+    output_html_path = os.path.join(workspace, "visualization.html")
     with open(output_html_path, "w", encoding="utf-8") as f:
         f.write(visualization_html)
     
@@ -599,7 +511,6 @@ def analyze_conversation_with_langextract(filepath):
     analysis_result = {
         "metrics": summary_metrics,
         "extractions": extractions,
-        "visualization_html": visualization_html,
         "conversation_summary": {
             "total_messages": len(conversation),
             "user_messages": len(user_messages), 
@@ -607,8 +518,5 @@ def analyze_conversation_with_langextract(filepath):
             "extracted_entities": len(extractions)
         }
     }
-    
-    # Save to cache before returning
-    save_to_cache(cache_key, analysis_result)
-    
+
     return analysis_result
\ No newline at end of file
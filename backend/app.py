@@ -1,135 +1,198 @@
 # app.py
-from flask import Flask, jsonify, request, Response
+from flask import Flask, jsonify, request, Response, send_file
 from flask_cors import CORS
 import os
 import json
 import pandas as pd
 from datetime import datetime
 
-from routes.s3_downloader import download_logs
-from routes.parser import parse_all_logs, get_last_n_conversations
+from routes.convo_index import list_conversations, TAIL_TURNS
 from routes.dashboard import get_dashboard_with_latest_convo, get_top_concerns
 from analysis import analyze_conversation_with_langextract, clean_cache, list_cache_entries
 from routes.district_stats import bp_district_stats
-from routes.sentiment_flow import get_sentiment_flow
+from routes.sentiment_flow import get_sentiment_flow, get_sentiment_cache_stats
+from routes.ingest import bp_ingest, start_ingest_scheduler
+from routes.live_tail import bp_live, start_live_tail
+from routes.llm_cache import get_cache
+from routes.analysis_cache import get_analysis_cache
+from routes.responses import init_app as init_responses
+from routes.limits import limited, job_pool, pending_response, get_limit_stats
+from routes.metrics import bp_metrics, init_app as init_metrics, register_collector
+from routes.profiling import bp_profiling, init_app as init_profiling
+from routes.search import bp_search
+
+BASE_DIR = os.path.dirname(__file__)
+CONVO_DIR = os.path.join(BASE_DIR, "convoJson")
+TRANSCRIPT_DIR = os.path.join(BASE_DIR, "transcripts")
+
+# LLM-bound endpoints: requests admitted at once (more get 503), seconds a
+# request waits on its job before answering 202, and jobs run at once.
+# Each admitted request holds a server thread while it waits, so the two
+# limits together default to half of a worker's threads (gunicorn.conf.py)
+# and the rest stay free for the cheap read endpoints.
+SERVER_THREADS = int(os.getenv("GUNICORN_THREADS", "64"))
+ANALYZE_MAX_CONCURRENT = int(os.getenv("ANALYZE_MAX_CONCURRENT", max(1, SERVER_THREADS // 4)))
+ANALYZE_TIMEOUT_SECONDS = float(os.getenv("ANALYZE_TIMEOUT_SECONDS", "3"))
+ANALYZE_WORKERS = int(os.getenv("ANALYZE_WORKERS", "8"))
+SENTIMENT_MAX_CONCURRENT = int(os.getenv("SENTIMENT_MAX_CONCURRENT", max(1, SERVER_THREADS // 4)))
+LOGS_MAX_LIMIT = 200
+TOP_CONCERNS_MAX = 50
 
 app = Flask(__name__)
+# per-route latency histograms for /metrics (registered first, so its
+# after_request hook runs last and the timing includes compression)
+init_metrics(app)
+# opt-in cProfile (X-Profile header) and sampled captures of slow requests
+init_profiling(app)
+# orjson for jsonify, gzip/brotli for large JSON and text bodies
+init_responses(app)
 
 # Configure CORS with flask_cors extension. This is the preferred way.
 CORS(app, resources={
     r"/*": {
         "origins": "*",  # Allow all origins
-        "allow_headers": ["Content-Type", "Authorization", "ngrok-skip-browser-warning", "Accept"],
+        "allow_headers": ["Content-Type", "Authorization", "ngrok-skip-browser-warning", "Accept", "X-Profile",
+                          "Last-Event-ID"],
+        "expose_headers": ["X-Profile-Id", "X-Next-Cursor", "Retry-After"],
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         "supports_credentials": True
     }
 })
 
 app.register_blueprint(bp_district_stats)
+app.register_blueprint(bp_ingest)
+app.register_blueprint(bp_live)
+app.register_blueprint(bp_metrics)
+app.register_blueprint(bp_profiling)
+app.register_blueprint(bp_search)
 
-# Generate state-level aggregated data from district data
-def generate_state_stats():
-    data_path = os.path.join(os.path.dirname(__file__), 'district_stats.json')
-    
-    try:
-        with open(data_path, 'r') as f:
-            district_data = json.load(f)
-        
-        state_stats = {}
-        
-        for state_name, districts in district_data.items():
-            if isinstance(districts, dict) and districts:
-                # Calculate total calls for the state
-                total_calls = sum(district.get('calls', 0) for district in districts.values())
-                
-                # Aggregate all concerns across districts
-                all_concerns = []
-                for district in districts.values():
-                    if 'top_concerns' in district:
-                        all_concerns.extend(district['top_concerns'])
-                
-                # Count concern frequency and get top concerns
-                concern_counts = {}
-                for concern in all_concerns:
-                    concern_counts[concern] = concern_counts.get(concern, 0) + 1
-                
-                # Get top 5 most common concerns
-                top_concerns = sorted(concern_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-                top_concerns = [concern for concern, count in top_concerns]
-                
-                state_stats[state_name] = {
-                    'calls': total_calls,
-                    'top_concerns': top_concerns
-                }
-        
-        return state_stats
-    
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print(f"Error generating state stats: {e}")
-        return {}
+analysis_jobs = job_pool("analyze", ANALYZE_WORKERS)
 
-# api endpoints
+# cache and limiter counters, read on each /metrics scrape
+register_collector("llm_cache", lambda: get_cache().stats())
+register_collector("analysis_cache", lambda: get_analysis_cache().stats())
+register_collector("sentiment_cache", get_sentiment_cache_stats)
+register_collector("limits", lambda: {
+    f"{kind}_{name}_{key}": value
+    for kind, entries in get_limit_stats().items()
+    for name, stats in entries.items()
+    for key, value in stats.items()
+})
 
-@app.route('/state_stats', methods=['GET'])
-def get_state_stats():
-    """Get aggregated state-level statistics"""
-    state_stats = generate_state_stats()
-    return jsonify({"states": state_stats})
+# S3 sync + parsing run in the background; GET endpoints only read processed data
+start_ingest_scheduler()
+# In-progress calls are pushed to /stream/calls as their logs grow
+start_live_tail()
+
+# api endpoints
 
 @app.route('/logs', methods=['GET'])
 def get_logs():
-    download_logs()           # Step 1: fetch from S3
-    parse_all_logs()          # Step 2: process into convoJson
-    recent = get_last_n_conversations(10)  # Step 3: get last 10 summaries + snippets
-    return jsonify(recent)
+    """Newest calls first, a page at a time.
+    ?limit=N (default 10), ?cursor= (from the previous page's X-Next-Cursor
+    header), ?fields=summary|tail|full, ?turns=K for tail (default 6),
+    ?since= / ?until= (ISO call start)"""
+    try:
+        limit = int(request.args.get('limit', 10))
+        turns = int(request.args.get('turns', TAIL_TURNS))
+    except ValueError:
+        return jsonify({"error": "limit and turns must be integers"}), 400
+    if not 1 <= limit <= LOGS_MAX_LIMIT:
+        return jsonify({"error": f"limit must be between 1 and {LOGS_MAX_LIMIT}"}), 400
+    try:
+        items, next_cursor = list_conversations(
+            limit=limit,
+            cursor=request.args.get('cursor') or None,
+            fields=request.args.get('fields', 'tail'),
+            turns=turns,
+            since=request.args.get('since') or None,
+            until=request.args.get('until') or None,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # the body stays a plain list for existing clients; the next page is in a header
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 @app.route('/dashboard_with_convo', methods=['GET'])
 def dashboard_and_transcript():
-    download_logs()          # incase it ain't cached
-    parse_all_logs()         
     return jsonify(get_dashboard_with_latest_convo())
 
 @app.route('/top_concerns', methods=['GET'])
 def top_concerns():
-    return jsonify(get_top_concerns())
+    """?top=N (default 3), ?since=<ISO call start> and ?district= filter the counts"""
+    try:
+        top = int(request.args.get('top', 3))
+    except ValueError:
+        return jsonify({"error": "top must be an integer"}), 400
+    if not 1 <= top <= TOP_CONCERNS_MAX:
+        return jsonify({"error": f"top must be between 1 and {TOP_CONCERNS_MAX}"}), 400
+    return jsonify(get_top_concerns(
+        top=top,
+        since=request.args.get('since') or None,
+        district=request.args.get('district') or None,
+    ))
 
 @app.route('/list_transcripts', methods=['GET'])
 def list_transcripts():
-    base_dir = os.path.dirname(__file__)
-    txt_dir = os.path.join(base_dir, "transcripts")
     try:
-        files = [f for f in os.listdir(txt_dir) if f.endswith('.txt')]
+        files = [f for f in os.listdir(TRANSCRIPT_DIR) if f.endswith('.txt')]
         return jsonify(sorted(files, reverse=True))
     except FileNotFoundError:
         return jsonify({"error": "transcripts directory not found."}), 404
 
 @app.route('/analyze/<filename>', methods=['GET'])
+@limited('analyze', ANALYZE_MAX_CONCURRENT)
 def analyze_transcript(filename):
-    base_dir = os.path.dirname(__file__)
-    convo_dir = os.path.join(base_dir, "convoJson")
-    txt_dir = os.path.join(base_dir, "transcripts")
-
+    """LangExtract analysis of a transcript. 202 if the extraction is still
+    running after ANALYZE_TIMEOUT_SECONDS; it carries on and the next poll
+    is served from the analysis cache."""
     # Resolve safe path based on extension (support both .txt and .json)
     if filename.endswith('.txt'):
-        filepath = os.path.join(txt_dir, filename)
+        filepath = os.path.join(TRANSCRIPT_DIR, filename)
     elif filename.endswith('.json'):
-        filepath = os.path.join(convo_dir, filename)
+        filepath = os.path.join(CONVO_DIR, filename)
     else:
         # Try .txt first then .json
-        candidate_txt = os.path.join(txt_dir, filename)
-        candidate_json = os.path.join(convo_dir, filename)
+        candidate_txt = os.path.join(TRANSCRIPT_DIR, filename)
+        candidate_json = os.path.join(CONVO_DIR, filename)
         filepath = candidate_txt if os.path.exists(candidate_txt) else candidate_json
 
     # Ensure file exists and path remains within allowed dirs
     if not os.path.exists(filepath):
         return jsonify({"error": "File not found."}), 404
 
-    analysis_result = analyze_conversation_with_langextract(filepath)
+    done, analysis_result = analysis_jobs.run(
+        filepath, lambda: analyze_conversation_with_langextract(filepath), timeout=ANALYZE_TIMEOUT_SECONDS)
+    if not done:
+        return pending_response()
     if "error" in analysis_result:
         return jsonify(analysis_result), 500
         
     return jsonify(analysis_result)
 
+@app.route('/visualization/<visualization_id>', methods=['GET'])
+def get_visualization(visualization_id):
+    """LangExtract HTML for an analysis, streamed from the cache directory.
+    Ids are content hashes, so the file behind one never changes: it is
+    cacheable for good, with ETag revalidation, and gzip clients get the
+    precompressed copy."""
+    cache = get_analysis_cache()
+    gz_path = None
+    if 'gzip' in request.accept_encodings:
+        gz_path = cache.visualization_path(visualization_id, gzipped=True)
+    path = gz_path or cache.visualization_path(visualization_id)
+    if path is None:
+        return jsonify({"error": "Visualization not found."}), 404
+
+    response = send_file(path, mimetype='text/html', conditional=True, etag=True, max_age=31536000)
+    if gz_path:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/update-last-seen', methods=['POST'])
 def update_last_seen():
     data = request.get_json()
@@ -178,7 +241,10 @@ def cache_status():
         return jsonify({
             "cache_entries": len(cache_entries),
             "cache_size_mb": round(cache_size / (1024 * 1024), 2),
-            "entries": cache_entries
+            "entries": cache_entries,
+            "analysis_cache": get_analysis_cache().stats(),
+            "sentiment_cache": get_sentiment_cache_stats(),
+            "llm_cache": get_cache().stats()
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -195,9 +261,14 @@ def clean_cache_endpoint():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/sentiment_flow/<filename>', methods=['GET'])
+@limited('sentiment_flow', SENTIMENT_MAX_CONCURRENT)
 def sentiment_flow(filename):
-    """Return per-sentence sentiment scores for user and AI sentences (0-10)."""
-    return jsonify(get_sentiment_flow(filename))
+    """Return per-sentence sentiment scores for user and AI sentences (0-10).
+    202 while the call is still being scored; poll again."""
+    flow = get_sentiment_flow(filename)
+    if flow is None:
+        return pending_response()
+    return jsonify(flow)
 
 @app.route('/pivot_data', methods=['GET'])
 def get_pivot_data():
@@ -210,5 +281,11 @@ def get_pivot_data():
     except FileNotFoundError:
         return jsonify({"error": "pivot_data.csv not found."}), 404
 
+@app.route('/limits/status', methods=['GET'])
+def limits_status():
+    """Admitted / rejected requests per limited endpoint and background job pools"""
+    return jsonify(get_limit_stats())
+
 if __name__ == '__main__':
+    # Development server; in production run `gunicorn -c gunicorn.conf.py wsgi:app`
     app.run(debug=True, port=5000)
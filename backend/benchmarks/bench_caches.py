@@ -0,0 +1,123 @@
+"""Benchmark: miss vs hit paths of the LLM response, analysis and sentiment flow caches.
+
+    python -m benchmarks.bench_caches --entries 200 --latency 0.01
+
+Misses pay FakeLLMClient latency; hits should cost microseconds (memory) or
+one small read (disk). Everything lives in a temp directory.
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from routes.llm_cache import LLMCache, make_key
+from routes.analysis_cache import AnalysisCache
+from routes.sentiment_flow import SentimentFlowCache, content_version
+from routes.fileio import atomic_write_json
+from routes import llm_client
+from benchmarks.fake_llm import FakeLLMClient
+from benchmarks.bench_normalizer import synthetic_turns
+
+
+def _per_op_us(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return round((time.perf_counter() - start) / max(1, len(items)) * 1e6, 1)
+
+
+def bench_llm_cache(root, entries, client):
+    prompts = [f"prompt {i}: " + "x" * 200 for i in range(entries)]
+    keys = [make_key("fake", p) for p in prompts]
+    cache = LLMCache(path=os.path.join(root, "llm_cache.sqlite3"), memory_entries=entries)
+    miss = _per_op_us(lambda i: cache.get_or_compute(keys[i], lambda: client.generate(prompts[i])), range(entries))
+    memory = _per_op_us(lambda i: cache.get_or_compute(keys[i], lambda: client.generate(prompts[i])), range(entries))
+    cold = LLMCache(path=cache.path, memory_entries=entries)  # new process: nothing in memory yet
+    disk = _per_op_us(lambda i: cold.get_or_compute(keys[i], lambda: client.generate(prompts[i])), range(entries))
+    cache.max_age_seconds = -1  # everything is now past max age, memory copies included
+    assert all(cache.get(key) is None for key in keys)
+    return {"miss_us": miss, "memory_hit_us": memory, "disk_hit_us": disk}
+
+
+def bench_analysis_cache(root, entries, client):
+    paths = []
+    for i in range(entries):
+        path = os.path.join(root, f"transcript_{i}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Villager: call {i} mein khaad ki dikkat hai\nAgent: hum dekhenge\n" * 20)
+        paths.append(path)
+
+    def compute(filepath, workspace):
+        client.generate(f"extract {filepath}")
+        return {"concerns": [os.path.basename(filepath)]}
+
+    cache = AnalysisCache(cache_dir=os.path.join(root, "analysis_cache"))
+    miss = _per_op_us(lambda p: cache.get_or_compute(p, compute), paths)
+    stat_hit = _per_op_us(lambda p: cache.get_or_compute(p, compute), paths)
+    for path in paths:
+        os.utime(path)  # same bytes, new mtime: re-hashed once, still a hit
+    hash_hit = _per_op_us(lambda p: cache.get_or_compute(p, compute), paths)
+    return {"miss_us": miss, "stat_hit_us": stat_hit, "hash_hit_us": hash_hit, "counters": cache.stats()}
+
+
+def bench_sentiment_cache(root, entries, client, turns=40):
+    convo_dir = os.path.join(root, "convoJson")
+    os.makedirs(convo_dir)
+    names = []
+    for i in range(entries):
+        texts = synthetic_turns(turns, random.Random(i))
+        name = f"call_{i}.json"
+        atomic_write_json(os.path.join(convo_dir, name), {"summary": {}, "conversation": [
+            {"speaker": "user" if t % 2 else "ai", "text": text} for t, text in enumerate(texts)]})
+        names.append(name)
+
+    previous_client, previous_key = llm_client._client, os.environ.get("GEMINI_API_KEY")
+    llm_client.set_client(client)
+    os.environ["GEMINI_API_KEY"] = previous_key or "benchmark"
+    try:
+        cache = SentimentFlowCache(cache_dir=os.path.join(convo_dir, "_sentiment_cache"), convo_dir=convo_dir,
+                                   memory_entries=entries, stage_workers=4)
+        miss = _per_op_us(lambda n: cache.get(n), names)
+        memory = _per_op_us(lambda n: cache.get(n), names)
+        cold = SentimentFlowCache(cache_dir=cache.cache_dir, convo_dir=convo_dir, memory_entries=entries)
+        disk = _per_op_us(lambda n: cold.get(n), names)
+        # stage path: precomputed at ingest, so the first view is already a hit
+        for name in names:
+            path = os.path.join(convo_dir, name)
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            atomic_write_json(path, data)
+            cache.precompute(path, data)
+        start = time.perf_counter()
+        for name in names:
+            cache.get(name)
+        drain_seconds = time.perf_counter() - start
+        assert all(cold._read_disk(n, content_version(os.path.join(convo_dir, n))) for n in names)
+    finally:
+        llm_client.set_client(previous_client)
+        if previous_key is None:
+            os.environ.pop("GEMINI_API_KEY", None)
+    return {"miss_us": miss, "memory_hit_us": memory, "disk_hit_us": disk,
+            "precomputed_drain_seconds": round(drain_seconds, 3)}
+
+
+def run(entries=200, latency=0.01):
+    client = FakeLLMClient(latency=latency)
+    with tempfile.TemporaryDirectory() as root:
+        return {
+            "entries": entries,
+            "latency": latency,
+            "llm_cache": bench_llm_cache(root, entries, client),
+            "analysis_cache": bench_analysis_cache(root, entries, client),
+            "sentiment_cache": bench_sentiment_cache(root, entries, client),
+        }
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--entries", type=int, default=200, help="distinct keys / files per cache")
+    cli.add_argument("--latency", type=float, default=0.01, help="fake seconds per model call on a miss")
+    args = cli.parse_args()
+    print(json.dumps(run(args.entries, args.latency), indent=2))
@@ -0,0 +1,116 @@
+"""Benchmark: dashboard endpoint latency vs corpus size.
+
+    python -m benchmarks.bench_dashboard --sizes 1000,10000,100000
+
+For each size a temp convoJson of that many small synthetic calls is written
+and indexed, then the read endpoints are timed through the app.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+os.environ.setdefault("INGEST_INTERVAL_SECONDS", "0")
+os.environ.setdefault("LIVE_TAIL_INTERVAL_SECONDS", "0")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")  # analysis.py refuses to import without one
+
+from routes import convo_index, dashboard, aggregates
+from routes.cursors import encode_cursor
+
+ENDPOINTS = ["/dashboard_with_convo", "/logs", "/logs?fields=summary&limit=50", "/top_concerns?top=10",
+             "/state_stats", "/district_stats?state=bihar"]
+_DISTRICTS = ["Banka", "Saran", "Khagaria", "Bhagalpur", "Gaya", "Purnia", "Siwan", "Nalanda"]
+_CONCERNS = ["loan repayment", "fertilizer shortage", "khaad ki kami", "sadak kharab", "paani ki dikkat",
+             "bijli nahi", "school teacher absent", "hospital door", "ration card", "crop insurance"]
+_SENTIMENTS = ["positive", "neutral", "negative"]
+
+
+def write_corpus(directory, calls, turns=8, seed=0):
+    rng = random.Random(seed)
+    for i in range(calls):
+        name = f"custom_transcript_{i}_{_DISTRICTS[i % len(_DISTRICTS)]}"
+        data = {
+            "summary": {
+                "filename": name + ".txt",
+                "call_started": f"2025-08-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00",
+                "duration_seconds": rng.randint(60, 900),
+                "average_ai_response_latency": round(rng.uniform(0.5, 3.0), 2),
+                "sentiment": rng.choice(_SENTIMENTS),
+                "concerns": rng.sample(_CONCERNS, 3),
+            },
+            "conversation": [{"speaker": "ai" if t % 2 else "user", "text": f"turn {t} of call {i}"}
+                             for t in range(turns)],
+        }
+        with open(os.path.join(directory, name + ".json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+
+def _latency_ms(client, path, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path)
+        times.append(time.perf_counter() - start)
+        assert response.status_code == 200, (path, response.status_code)
+    times.sort()
+    return {"p50_ms": round(times[len(times) // 2] * 1000, 3), "max_ms": round(times[-1] * 1000, 3)}
+
+
+def _middle_cursor(size):
+    """Cursor of the call halfway down the listing, as if paged there"""
+    conn = convo_index.get_connection()
+    try:
+        row = conn.execute("SELECT mtime, filename FROM conversations ORDER BY mtime DESC, filename DESC "
+                           "LIMIT 1 OFFSET ?", (size // 2,)).fetchone()
+    finally:
+        conn.close()
+    return encode_cursor([row["mtime"], row["filename"]])
+
+
+def run(sizes=(1000, 10000, 100000), repeat=20):
+    import app
+    client = app.app.test_client()
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            write_corpus(tmp, size)
+            write_seconds = time.perf_counter() - start
+
+            convo_index.CONVO_DIR = dashboard.CONVO_DIR = tmp
+            convo_index.INDEX_PATH = os.path.join(tmp, "_index.sqlite3")
+            convo_index._bootstrapped = False
+            start = time.perf_counter()
+            convo_index.rebuild_index()
+            index_seconds = time.perf_counter() - start
+            aggregates.store.invalidate()
+
+            # first request per endpoint is reported apart: it may build a snapshot
+            first = {}
+            for path in ENDPOINTS:
+                start = time.perf_counter()
+                client.get(path)
+                first[path] = round((time.perf_counter() - start) * 1000, 3)
+            endpoints = {path: _latency_ms(client, path, repeat) for path in ENDPOINTS}
+            # a page deep in history should cost what the first one does
+            endpoints["/logs?fields=summary&limit=50 (middle page)"] = _latency_ms(
+                client, f"/logs?fields=summary&limit=50&cursor={_middle_cursor(size)}", repeat)
+            results[str(size)] = {
+                "write_seconds": round(write_seconds, 2),
+                "index_seconds": round(index_seconds, 2),
+                "first_request_ms": first,
+                "endpoints": endpoints,
+            }
+    return {"repeat": repeat, "sizes": results}
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--sizes", default="1000,10000,100000", help="comma-separated corpus sizes (calls)")
+    cli.add_argument("--repeat", type=int, default=20)
+    args = cli.parse_args()
+    json.dump(run(tuple(int(s) for s in args.sizes.split(",")), args.repeat), sys.stdout, indent=2)
+    print()
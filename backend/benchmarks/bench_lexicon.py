@@ -0,0 +1,86 @@
+"""Benchmark: heuristic sentiment as a per-word substring loop vs the compiled lexicon scorer.
+
+    python -m benchmarks.bench_lexicon --terms 10000 --calls 50 --turns 200
+"""
+import json
+import time
+import random
+import argparse
+
+from routes.lexicon import LexiconScorer
+from benchmarks.bench_normalizer import synthetic_turns, _WORDS
+
+_SYLLABLES = ["ka", "kha", "ga", "cha", "ja", "ta", "da", "na", "pa", "ba", "ma", "ya", "ra", "la",
+              "va", "sha", "sa", "ha", "ki", "ku", "ro", "ne", "mi", "dh", "bh", "ai", "ee", "oo"]
+
+
+def synthetic_lexicon(n, rng):
+    """n made-up Hinglish-looking terms, half negative, about a tenth prefixes"""
+    weights = {}
+    while len(weights) < n:
+        term = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if rng.random() < 0.1:
+            term += "*"
+        weights[term] = rng.choice((-1.0, 1.0))
+    # and the words the synthetic turns are made of, so there are hits to count
+    for word in _WORDS:
+        weights[word] = rng.choice((-1.0, 1.0))
+    return weights
+
+
+def naive_score(text, neg_words, pos_words):
+    # Old behaviour: one substring scan of the sentence per lexicon word
+    t = text.lower()
+    neg = sum(1 for w in neg_words if w in t)
+    pos = sum(1 for w in pos_words if w in t)
+    if neg == 0 and pos == 0:
+        return 5.0
+    return max(0.0, min(10.0, 5.0 + (pos - neg) * 1.2))
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(terms, calls, turns, naive_sample=200, seed=0):
+    rng = random.Random(seed)
+    weights = synthetic_lexicon(terms, rng)
+    conversations = [[{"speaker": "user", "text": t} for t in synthetic_turns(turns, rng)] for _ in range(calls)]
+    sentences = [turn["text"] for c in conversations for turn in c]
+
+    compile_seconds = _timed(lambda: LexiconScorer(weights))
+    scorer = LexiconScorer(weights)
+    results = {}
+
+    # the naive loop is slow enough at this size that a sample stands in for the corpus
+    neg = {w.rstrip("*") for w, v in weights.items() if v < 0}
+    pos = {w.rstrip("*") for w, v in weights.items() if v > 0}
+    sample = sentences[:naive_sample]
+    elapsed = _timed(lambda: [naive_score(t, neg, pos) for t in sample])
+    results["naive_substring"] = {"sentences": len(sample), "seconds": round(elapsed, 4),
+                                  "sentences_per_second": round(len(sample) / elapsed)}
+
+    elapsed = _timed(lambda: [scorer.score(t) for t in sentences])
+    results["scorer_per_sentence"] = {"sentences": len(sentences), "seconds": round(elapsed, 4),
+                                      "sentences_per_second": round(len(sentences) / elapsed)}
+
+    elapsed = _timed(lambda: scorer.score_conversations(conversations))
+    results["scorer_batch"] = {"sentences": len(sentences), "seconds": round(elapsed, 4),
+                               "sentences_per_second": round(len(sentences) / elapsed)}
+
+    agree = sum(1 for t in sample if scorer.score(t) == scorer.score_many([t])[0])
+    return {"terms": len(scorer), "calls": calls, "turns": turns,
+            "compile_seconds": round(compile_seconds, 4), "batch_matches_single": agree == len(sample),
+            "results": results}
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--terms", type=int, default=10000, help="lexicon size")
+    cli.add_argument("--calls", type=int, default=50)
+    cli.add_argument("--turns", type=int, default=200, help="sentences per call")
+    cli.add_argument("--naive-sample", type=int, default=200, help="sentences timed with the old loop")
+    args = cli.parse_args()
+    print(json.dumps(run(args.terms, args.calls, args.turns, args.naive_sample), indent=2))
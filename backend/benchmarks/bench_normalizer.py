@@ -0,0 +1,58 @@
+"""Offline benchmark: per-turn vs batched user-turn normalization.
+
+    python -m benchmarks.bench_normalizer --turns 40 --calls 5 --latency 0.2
+"""
+import json
+import time
+import random
+import argparse
+
+from routes.normalizer import normalize_user_turns, normalize_calls
+from benchmarks.fake_llm import FakeLLMClient
+
+_WORDS = ["kisan", "loan", "byaaj", "fasal", "paani", "nahar", "bijli", "sadak",
+          "school", "dawai", "hamra", "gaon", "mein", "bahut", "dikkat", "ba", "hai"]
+
+
+def synthetic_turns(n, rng):
+    return [" ".join(rng.choice(_WORDS) for _ in range(rng.randint(4, 20))) for _ in range(n)]
+
+
+def per_turn(client, turns):
+    # Old behaviour: one blocking request per user turn
+    return [client.generate(f"Fix grammar and punctuations in the hindi text and then convert it to latin hindi, "
+                            f"and then return just the text without any formatting or explanation: {t}")
+            for t in turns]
+
+
+def run(turns, calls, latency, workers, seed=0):
+    rng = random.Random(seed)
+    corpus = [synthetic_turns(turns, rng) for _ in range(calls)]
+    client = FakeLLMClient(latency=latency)
+    results = {}
+
+    def measure(name, fn):
+        client.reset()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "wall_seconds": round(elapsed, 4),
+            "llm_calls": client.calls,
+            "calls_per_transcript": round(client.calls / calls, 2),
+        }
+
+    measure("per_turn", lambda: [per_turn(client, c) for c in corpus])
+    measure("batched_per_call", lambda: [normalize_user_turns(c, client=client, max_workers=workers) for c in corpus])
+    measure("batched_multi_call", lambda: normalize_calls(corpus, client=client, max_workers=workers))
+    return {"turns_per_call": turns, "calls": calls, "latency": latency, "workers": workers, "results": results}
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--turns", type=int, default=40)
+    cli.add_argument("--calls", type=int, default=5)
+    cli.add_argument("--latency", type=float, default=0.2, help="fake LLM round-trip seconds")
+    cli.add_argument("--workers", type=int, default=4)
+    args = cli.parse_args()
+    print(json.dumps(run(args.turns, args.calls, args.latency, args.workers), indent=2))
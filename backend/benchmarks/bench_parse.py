@@ -0,0 +1,73 @@
+"""Offline benchmark: parse_all_logs throughput (tokenize, normalize, summarize, write, index).
+
+    python -m benchmarks.bench_parse --calls 40 --turns 60 --latency 0.05 --workers 1,4
+
+Synthetic logs in the processed_logs format go through the real parser with
+FakeLLMClient standing in for Gemini; outputs land in a temp convoJson.
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+
+from routes import parser, convo_index, sentiment_flow, llm_client
+from benchmarks.fake_llm import FakeLLMClient
+from benchmarks.synthetic import write_log
+
+
+def _point_at(root):
+    """Send parser, index and sentiment cache output under root"""
+    parser.INPUT_FOLDER = os.path.join(root, "processed_logs")
+    parser.OUTPUT_FOLDER = convo_index.CONVO_DIR = os.path.join(root, "convoJson")
+    convo_index.INDEX_PATH = os.path.join(root, "convoJson", "_index.sqlite3")
+    sentiment_flow._cache = sentiment_flow.SentimentFlowCache(
+        cache_dir=os.path.join(root, "convoJson", "_sentiment_cache"), convo_dir=parser.OUTPUT_FOLDER)
+    os.makedirs(parser.INPUT_FOLDER)
+
+
+def run(calls=40, turns=60, latency=0.05, workers=(1, 4), seed=0):
+    client = FakeLLMClient(latency=latency)
+    previous_client = llm_client._client
+    stages = parser.POST_WRITE_STAGES
+    # parse only: sentiment scoring at ingest has its own benchmark
+    parser.POST_WRITE_STAGES = [parser._invalidate_sentiment]
+    llm_client.set_client(client)
+    results = {}
+    try:
+        for n in workers:
+            with tempfile.TemporaryDirectory() as tmp:
+                _point_at(tmp)
+                total_bytes = 0
+                for i in range(calls):
+                    total_bytes += write_log(os.path.join(parser.INPUT_FOLDER, f"custom_transcript_{i}_Banka.txt"),
+                                             turns=turns, seed=seed + i)
+                client.reset()
+                start = time.perf_counter()
+                outcome = parser.parse_all_logs(workers=n)
+                elapsed = time.perf_counter() - start
+                parsed = sum(1 for r in outcome.values() if r["status"] == "parsed")
+                results[str(n)] = {
+                    "parsed": parsed,
+                    "failed": len(outcome) - parsed,
+                    "seconds": round(elapsed, 3),
+                    "calls_per_second": round(parsed / elapsed, 2),
+                    "mb_per_second": round(total_bytes / elapsed / 1024 / 1024, 3),
+                    "llm_calls": client.calls,
+                    "llm_prompt_chars": client.prompt_chars,
+                }
+    finally:
+        parser.POST_WRITE_STAGES = stages
+        llm_client.set_client(previous_client)
+    return {"calls": calls, "turns": turns, "latency": latency, "workers": results}
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--calls", type=int, default=40, help="synthetic logs to parse")
+    cli.add_argument("--turns", type=int, default=60, help="turns per call")
+    cli.add_argument("--latency", type=float, default=0.05, help="fake seconds per model call")
+    cli.add_argument("--workers", default="1,4", help="comma-separated PARSE_WORKERS values to compare")
+    args = cli.parse_args()
+    print(json.dumps(run(args.calls, args.turns, args.latency,
+                         tuple(int(w) for w in args.workers.split(","))), indent=2))
@@ -0,0 +1,103 @@
+"""Benchmark: stdlib jsonify vs orjson, and bytes on the wire with gzip/brotli, per endpoint.
+
+    python -m benchmarks.bench_responses --calls 50 --turns 200
+
+Serves a synthetic convoJson directory (conversations tokenized from
+generated logs, Devanagari and Latin Hindi mixed) through the real app.
+"""
+import os
+import sys
+import json
+import time
+import gzip
+import argparse
+import tempfile
+
+os.environ.setdefault("INGEST_INTERVAL_SECONDS", "0")
+os.environ.setdefault("LIVE_TAIL_INTERVAL_SECONDS", "0")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")  # analysis.py refuses to import without one
+
+from routes import jsoncodec, convo_index, dashboard, responses
+from routes.log_tokenizer import tokenize_file
+from benchmarks.synthetic import write_log
+
+ENDPOINTS = ["/logs", "/dashboard_with_convo", "/top_concerns?top=10", "/state_stats", "/district_stats?state=bihar"]
+_CONCERNS = ["loan repayment", "बिजली की कमी", "fertilizer shortage", "sadak kharab", "paani ki dikkat", "school"]
+
+
+def build_corpus(directory, calls, turns):
+    for i in range(calls):
+        log_path = os.path.join(directory, f"custom_transcript_{i}_Banka.txt")
+        write_log(log_path, turns=turns, seed=i)
+        collected = tokenize_file(log_path)
+        os.unlink(log_path)
+        data = {
+            "summary": {
+                "filename": os.path.basename(log_path),
+                "call_started": collected["call_start"],
+                "duration_seconds": 300 + i,
+                "average_ai_response_latency": 1.5,
+                "sentiment": "neutral",
+                "concerns": [_CONCERNS[(i + k) % len(_CONCERNS)] for k in range(3)],
+            },
+            "conversation": collected["sentences"],
+        }
+        with open(os.path.join(directory, f"custom_transcript_{i}_Banka.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+
+def _best_ms(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 3)
+
+
+def measure(client, path, repeat):
+    obj = json.loads(client.get(path, headers={"Accept-Encoding": "identity"}).data)
+    stdlib_body = json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(",", ":")).encode()
+    fast_body = jsoncodec.dumps(obj, sort_keys=True)
+    result = {
+        "stdlib_ms": _best_ms(lambda: json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(",", ":")), repeat),
+        "fast_ms": _best_ms(lambda: jsoncodec.dumps(obj, sort_keys=True), repeat),
+        "stdlib_bytes": len(stdlib_body),
+        "utf8_bytes": len(fast_body),
+        "gzip_bytes": len(gzip.compress(fast_body, compresslevel=responses.GZIP_LEVEL)),
+        "gzip_ms": _best_ms(lambda: gzip.compress(fast_body, compresslevel=responses.GZIP_LEVEL), repeat),
+        "request_identity_ms": _best_ms(lambda: client.get(path, headers={"Accept-Encoding": "identity"}), repeat),
+        "request_gzip_ms": _best_ms(lambda: client.get(path, headers={"Accept-Encoding": "gzip"}), repeat),
+    }
+    if responses.brotli is not None:
+        result["br_bytes"] = len(responses.brotli.compress(fast_body, quality=responses.BROTLI_QUALITY))
+        result["br_ms"] = _best_ms(lambda: responses.brotli.compress(fast_body, quality=responses.BROTLI_QUALITY), repeat)
+        result["request_br_ms"] = _best_ms(lambda: client.get(path, headers={"Accept-Encoding": "br"}), repeat)
+    return result
+
+
+def run(calls=50, turns=200, repeat=20):
+    with tempfile.TemporaryDirectory() as tmp:
+        build_corpus(tmp, calls, turns)
+        convo_index.CONVO_DIR = dashboard.CONVO_DIR = tmp
+        convo_index.INDEX_PATH = os.path.join(tmp, "_index.sqlite3")
+        convo_index.rebuild_index()
+
+        import app
+        client = app.app.test_client()
+        return {
+            "orjson": jsoncodec.orjson is not None,
+            "brotli": responses.brotli is not None,
+            "endpoints": {path: measure(client, path, repeat) for path in ENDPOINTS},
+        }
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--calls", type=int, default=50, help="synthetic conversations to serve")
+    cli.add_argument("--turns", type=int, default=200, help="turns per conversation")
+    cli.add_argument("--repeat", type=int, default=20)
+    args = cli.parse_args()
+    json.dump(run(args.calls, args.turns, args.repeat), sys.stdout, indent=2)
+    print()
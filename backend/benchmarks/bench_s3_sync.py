@@ -0,0 +1,93 @@
+"""Offline benchmark for routes.s3_downloader.sync_logs against moto's in-process S3.
+
+    python -m benchmarks.bench_s3_sync --keys 1500 --latency 0.02 --workers 8
+
+The client is the one sync_logs builds (make_client), so listing runs through
+boto3's real list_objects_v2 paginator (1000 keys a page) and errors come
+back as botocore exceptions. --latency is added to every GetObject with a
+botocore event hook. The incremental pass rewrites some objects and deletes
+one between listing and download, which must surface in failed_keys.
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+
+import boto3
+from moto import mock_aws
+
+from routes.s3_downloader import make_client, sync_logs
+from benchmarks.synthetic import generate_log_lines
+
+BUCKET = "bench"
+PREFIX = "transcripts/"
+
+
+def _key(i):
+    return f"{PREFIX}call_{i:06d}.txt"
+
+
+def run(keys=1500, latency=0.02, workers=8, changed=10):
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws(), tempfile.TemporaryDirectory() as local_dir:
+        admin = boto3.client("s3", region_name="us-east-1")
+        admin.create_bucket(Bucket=BUCKET)
+        # sync_logs reads anonymously, like the public transcripts bucket
+        admin.put_bucket_policy(Bucket=BUCKET, Policy=json.dumps({"Statement": [
+            {"Effect": "Allow", "Principal": "*", "Action": "s3:GetObject",
+             "Resource": f"arn:aws:s3:::{BUCKET}/*"},
+            {"Effect": "Allow", "Principal": "*", "Action": "s3:ListBucket",
+             "Resource": f"arn:aws:s3:::{BUCKET}"},
+        ]}))
+        for i in range(keys):
+            admin.put_object(Bucket=BUCKET, Key=_key(i), Body="".join(generate_log_lines(turns=20, seed=i)))
+
+        client = make_client()
+        calls = {"list_pages": 0, "get_object": 0}
+        vanishing = set()
+
+        def count_pages(**kwargs):
+            calls["list_pages"] += 1
+
+        def before_get(params, **kwargs):
+            calls["get_object"] += 1
+            if params["Key"] in vanishing:
+                admin.delete_object(Bucket=BUCKET, Key=params["Key"])
+
+        def slow_get(**kwargs):
+            if latency:
+                time.sleep(latency)
+
+        client.meta.events.register("before-call.s3.ListObjectsV2", count_pages)
+        client.meta.events.register("before-parameter-build.s3.GetObject", before_get)
+        client.meta.events.register("before-send.s3.GetObject", slow_get)
+
+        invalidated = []
+
+        def sync():
+            calls.update(list_pages=0, get_object=0)
+            result = sync_logs(client=client, bucket=BUCKET, prefix=PREFIX, local_dir=local_dir,
+                               workers=workers, on_changed=invalidated.append)
+            return {**result, "list_pages": calls["list_pages"], "get_object_calls": calls["get_object"]}
+
+        cold = sync()
+        warm = sync()
+        for i in range(changed):
+            admin.put_object(Bucket=BUCKET, Key=_key(i), Body="".join(generate_log_lines(turns=20, seed=keys + i)))
+        vanishing.add(_key(changed))
+        os.unlink(os.path.join(local_dir, os.path.basename(_key(changed))))
+        incremental = sync()
+
+    return {"keys": keys, "latency": latency, "workers": workers,
+            "cold": cold, "warm": warm, f"after_{changed}_changed": incremental,
+            "reparse_queued": len(invalidated)}
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--keys", type=int, default=1500)
+    cli.add_argument("--latency", type=float, default=0.02, help="added per-GET latency in seconds")
+    cli.add_argument("--workers", type=int, default=8)
+    args = cli.parse_args()
+    print(json.dumps(run(args.keys, args.latency, args.workers), indent=2))
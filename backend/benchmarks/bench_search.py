@@ -0,0 +1,172 @@
+"""Benchmark: /search query latency over a synthetic full-text index.
+
+    python -m benchmarks.bench_search --turns 1000000 --turns-per-call 100
+
+Builds a temp search index of that many turns (a few very common words plus
+a Zipf-like tail, so some terms match half the corpus and others a handful
+of turns), then times typical queries, a second page and the incremental
+re-index of one conversation. Also checks that paging a ranked query while
+calls are being indexed neither skips nor repeats hits.
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import itertools
+
+from routes import search
+
+_COMMON = ["hai", "ki", "mein", "kisan", "paani", "gaon", "bahut", "dikkat", "nahi", "sadak"]
+_DISTRICTS = ["Banka", "Saran", "Khagaria", "Bhagalpur", "Gaya", "Purnia", "Siwan", "Nalanda"]
+_SENTIMENTS = ["positive", "neutral", "negative"]
+
+QUERIES = {
+    "common_term": {"q": "hai"},
+    "common_and": {"q": "paani dikkat"},
+    "mid_term_or": {"q": "khaad OR urea"},
+    "rare_term": {"q": "w4999"},
+    "phrase": {"q": '"paani ki dikkat"'},
+    "prefix": {"q": "kis*"},
+    "district_filter": {"q": "khaad OR urea", "district": "Bhagalpur", "speaker": "user"},
+    "date_range": {"q": "khaad", "since": "2025-08-10", "until": "2025-08-17"},
+    "common_recent": {"q": "hai", "sort": "recent"},
+    "turn_filters": {"q": "khaad", "speaker": "user", "turn_sentiment": "negative"},
+    "call_filters": {"q": "paani", "district": "Gaya", "sentiment": "negative"},
+}
+
+
+def _vocabulary(size):
+    words = _COMMON + ["khaad", "urea"] + [f"w{i}" for i in range(size)]
+    # Zipf: the k-th word is 1/k as frequent as the first
+    weights = list(itertools.accumulate(1.0 / (k + 1) for k in range(len(words))))
+    return words, weights
+
+
+def _call(i, turns_per_call, rng, words, weights):
+    day = 1 + i % 28
+    return {
+        "district": _DISTRICTS[i % len(_DISTRICTS)],
+        "call_started": f"2025-08-{day:02d}T10:00:00",
+        "sentiment": _SENTIMENTS[i % 3],
+        "turns": [{"speaker": "user" if t % 2 else "ai",
+                   "text": " ".join(rng.choices(words, cum_weights=weights, k=rng.randint(4, 20))),
+                   "timestamp": f"2025-08-{day:02d}T10:{t // 60 % 60:02d}:{t % 60:02d}"}
+                  for t in range(turns_per_call)],
+    }
+
+
+def build(turns, turns_per_call, vocabulary=5000, seed=0):
+    rng = random.Random(seed)
+    words, weights = _vocabulary(vocabulary)
+    conn = search.get_connection()
+    started = time.perf_counter()
+    calls = max(1, turns // turns_per_call)
+    try:
+        for i in range(calls):
+            search._insert(conn, "convo", f"call_{i}.json", 0.0, 0, _call(i, turns_per_call, rng, words, weights))
+            if i % 500 == 499:
+                conn.commit()
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+        conn.commit()
+        conn.execute("INSERT INTO turns (turns) VALUES ('optimize')")
+        conn.commit()
+    finally:
+        conn.close()
+    return calls, time.perf_counter() - started
+
+
+def _timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    times.sort()
+    return result, round(times[len(times) // 2] * 1000, 2)
+
+
+def check_rank_paging(params, turns_per_call, added_calls=2, limit=20, seed=1):
+    """Page through a ranked query twice, the second time indexing added_calls
+    new calls after the first page; both walks must return the same hits,
+    each exactly once"""
+    rng = random.Random(seed)
+    words, weights = _vocabulary(5000)
+
+    def add_calls():
+        conn = search.get_connection()
+        try:
+            with conn:
+                for i in range(added_calls):
+                    search._insert(conn, "convo", f"added_{seed}_{i}.json", 0.0, 0,
+                                   _call(i, turns_per_call, rng, words, weights))
+        finally:
+            conn.close()
+
+    def walk(after_first_page=None):
+        hits, cursor, pages = [], None, 0
+        while True:
+            result = search.search(**params, limit=limit, cursor=cursor)
+            hits += [(h["filename"], h["turn"]) for h in result["hits"]]
+            pages += 1
+            if pages == 1 and after_first_page:
+                after_first_page()
+            cursor = result["next_cursor"]
+            if not cursor:
+                return hits, pages
+
+    undisturbed, pages = walk()
+    disturbed, _ = walk(add_calls)
+    assert len(set(disturbed)) == len(disturbed), "ranked pages repeated hits"
+    assert disturbed == undisturbed, (
+        f"ranked pages changed while indexing: {len(disturbed)} hits, {len(undisturbed)} expected")
+    return {"hits": len(undisturbed), "pages": pages, "calls_indexed_between_pages": added_calls}
+
+
+def run(turns=1000000, turns_per_call=100, repeat=5, seed=0):
+    previous = search.INDEX_PATH, search._bootstrapped
+    with tempfile.TemporaryDirectory() as tmp:
+        search.INDEX_PATH = os.path.join(tmp, "_search.sqlite3")
+        search._bootstrapped = True
+        try:
+            calls, build_seconds = build(turns, turns_per_call, seed=seed)
+            queries = {}
+            for name, params in QUERIES.items():
+                first, first_ms = _timed(lambda: search.search(**params), repeat)
+                entry = {"first_page_ms": first_ms, "hits": len(first["hits"])}
+                if first["next_cursor"]:
+                    _, entry["second_page_ms"] = _timed(
+                        lambda: search.search(**params, cursor=first["next_cursor"]), repeat)
+                queries[name] = entry
+
+            # one conversation re-written by the parser
+            path = os.path.join(tmp, "call_0.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"summary": {"filename": "custom_transcript_0_Banka.txt"},
+                           "conversation": [{"speaker": "user", "text": "khaad nahi mila"}] * turns_per_call}, f)
+            _, reindex_ms = _timed(lambda: search.index_conversation_turns(path), repeat)
+            size = sum(os.path.getsize(os.path.join(tmp, n)) for n in os.listdir(tmp)
+                       if n.startswith("_search.sqlite3"))
+            paging = check_rank_paging(QUERIES["mid_term_or"], turns_per_call)
+        finally:
+            search.INDEX_PATH, search._bootstrapped = previous
+    return {
+        "turns": calls * turns_per_call,
+        "calls": calls,
+        "build_seconds": round(build_seconds, 2),
+        "build_turns_per_second": round(calls * turns_per_call / build_seconds),
+        "index_bytes": size,
+        "queries": queries,
+        "reindex_call_ms": reindex_ms,
+        "rank_paging": paging,
+    }
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--turns", type=int, default=1000000, help="turns in the synthetic index")
+    cli.add_argument("--turns-per-call", type=int, default=100)
+    cli.add_argument("--repeat", type=int, default=5, help="runs per query; the median is reported")
+    args = cli.parse_args()
+    print(json.dumps(run(args.turns, args.turns_per_call, args.repeat), indent=2))
@@ -0,0 +1,58 @@
+"""Offline benchmark: one sentiment prompt per call vs windowed, concurrent scoring.
+
+    python -m benchmarks.bench_sentiment --turns 1200 --latency 0.3 --max-output 150
+"""
+import json
+import time
+import random
+import argparse
+
+from routes.sentiment_flow import score_sentences
+from benchmarks.fake_llm import FakeLLMClient
+from benchmarks.bench_normalizer import synthetic_turns
+
+
+def single_prompt(client, conversation):
+    # Old behaviour: every sentence, truncated to 500 chars, in one numbered prompt
+    def numbered(speaker):
+        texts = [c["text"][:500] for c in conversation if c["speaker"] == speaker]
+        return "\n".join(f"{i}. {t}" for i, t in enumerate(texts, start=1))
+    prompt = ("You are a precise sentiment scoring engine.\n\nUser sentences:\n" + numbered("user")
+              + "\n\nAI sentences:\n" + numbered("ai") + "\n\nReturn ONLY JSON. No markdown.\n")
+    parsed = json.loads(client.generate(prompt))
+    return len(parsed["user"]) + len(parsed["ai"])
+
+
+def run(turns, latency, latency_per_kchar, max_output, workers, budget, seed=0):
+    rng = random.Random(seed)
+    texts = synthetic_turns(turns, rng)
+    conversation = [{"speaker": "user" if i % 2 else "ai", "text": t} for i, t in enumerate(texts)]
+    client = FakeLLMClient(latency=latency, latency_per_kchar=latency_per_kchar, max_output_items=max_output)
+    results = {}
+
+    start = time.perf_counter()
+    scored = single_prompt(client, conversation)
+    results["single_prompt"] = {"wall_seconds": round(time.perf_counter() - start, 3), "llm_calls": client.calls,
+                                "coverage": round(scored / turns, 4)}
+
+    client.reset()
+    start = time.perf_counter()
+    items = [(i, c["speaker"], c["text"]) for i, c in enumerate(conversation)]
+    scores, stats = score_sentences(items, client=client, max_workers=workers, budget=budget)
+    results["windowed"] = {"wall_seconds": round(time.perf_counter() - start, 3), "llm_calls": client.calls,
+                           "coverage": round(len(scores) / turns, 4), **stats}
+    return {"turns": turns, "latency": latency, "latency_per_kchar": latency_per_kchar,
+            "max_output_items": max_output, "workers": workers, "window_tokens": budget, "results": results}
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--turns", type=int, default=1200, help="sentences in the call (~1 hour)")
+    cli.add_argument("--latency", type=float, default=0.3, help="fixed seconds per model call")
+    cli.add_argument("--latency-per-kchar", type=float, default=0.01, help="extra seconds per 1000 prompt chars")
+    cli.add_argument("--max-output", type=int, default=150, help="most scores the model returns per call")
+    cli.add_argument("--workers", type=int, default=4)
+    cli.add_argument("--window-tokens", type=int, default=2000)
+    args = cli.parse_args()
+    print(json.dumps(run(args.turns, args.latency, args.latency_per_kchar, args.max_output, args.workers,
+                         args.window_tokens), indent=2))
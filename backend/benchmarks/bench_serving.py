@@ -0,0 +1,156 @@
+"""Load test: /analyze under the shipped gunicorn config, with a stubbed LLM.
+
+    python -m benchmarks.bench_serving --latency 5 --duration 10
+
+Starts `gunicorn -c gunicorn.conf.py` (gthread, GUNICORN_THREADS threads per
+worker) on benchmarks.serving_app, where the LangExtract step is one
+FakeLLMClient call of the given latency; limits, job pools and timeouts are
+the app's defaults (override them through the environment as in production).
+Every request asks for a transcript not analysed yet, so each one waits on
+the upstream. Per concurrency level, reports requests/sec, latency
+percentiles, how many /analyze requests were answered 200, 202 (still
+running) or 503 (endpoint full), and the latency of /dashboard_with_convo
+polled alongside, which must stay low while /analyze is saturated.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIGHT_ENDPOINT = "/dashboard_with_convo"
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1)
+
+
+def _get(url):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=120) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - started
+
+
+def load(base_url, names, concurrency, duration):
+    """Closed loop: each client sends its next request as soon as the last one
+    returns. One more client polls LIGHT_ENDPOINT for the same duration."""
+    statuses, latencies, light = Counter(), [], []
+    lock = threading.Lock()
+    next_name = iter(names)
+    deadline = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            with lock:
+                name = next(next_name, None)
+            if name is None:
+                return
+            status, elapsed = _get(f"{base_url}/analyze/{name}")
+            with lock:
+                statuses[status] += 1
+                latencies.append(elapsed)
+
+    def light_client():
+        while time.perf_counter() < deadline:
+            light.append(_get(base_url + LIGHT_ENDPOINT)[1])
+            time.sleep(0.05)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency + 1) as pool:
+        pool.submit(light_client)
+        for _ in range(concurrency):
+            pool.submit(client)
+    wall = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / wall, 1),
+        "p50_ms": _percentile(latencies, 0.5),
+        "p95_ms": _percentile(latencies, 0.95),
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "light_p50_ms": _percentile(light, 0.5),
+        "light_p95_ms": _percentile(light, 0.95),
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(base_url, server, seconds=60):
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {server.returncode}")
+        try:
+            with urllib.request.urlopen(base_url + "/limits/status", timeout=10) as response:
+                return json.loads(response.read())
+        except OSError:  # not listening yet, or workers still importing
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start")
+
+
+def run(latency=0.5, duration=5.0, levels=(1, 10, 100)):
+    with tempfile.TemporaryDirectory() as tmp:
+        # enough distinct transcripts that no request is a cache hit
+        count = int(max(levels) * duration / min(latency, 3.0) * 2 + max(levels) * 4)
+        names = [f"load_{i}.txt" for i in range(count)]
+        for name in names:
+            with open(os.path.join(tmp, name), "w", encoding="utf-8") as f:
+                f.write(f"Villager: {name} mein paani ki dikkat hai\nAgent: hum dekhenge\n")
+
+        port = _free_port()
+        env = {**os.environ, "BENCH_DATA_DIR": tmp, "BENCH_LLM_LATENCY": str(latency),
+               "INGEST_INTERVAL_SECONDS": "0", "LIVE_TAIL_INTERVAL_SECONDS": "0",
+               "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "benchmark")}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}",
+             "--access-logfile", "/dev/null", "benchmarks.serving_app:app"],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=sys.stderr)
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            limits = _wait_until_up(base_url, server)
+            results = {}
+            offset = 0
+            for level in levels:
+                results[str(level)] = load(base_url, names[offset:], level, duration)
+                offset += results[str(level)]["requests"]
+                time.sleep(latency)  # let jobs left running by 202s drain
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+        # one worker's view; every worker has the same configuration
+        return {"latency": latency, "duration": duration,
+                "analyze_limit": limits["endpoints"]["analyze"]["max_concurrent"],
+                "analyze_workers": limits["jobs"]["analyze"]["max_workers"],
+                "concurrency": results}
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--latency", type=float, default=0.5, help="seconds per stubbed LLM call")
+    cli.add_argument("--duration", type=float, default=5.0, help="seconds of load per concurrency level")
+    cli.add_argument("--levels", default="1,10,100", help="comma-separated concurrent clients")
+    args = cli.parse_args()
+    levels = tuple(int(x) for x in args.levels.split(","))
+    json.dump(run(args.latency, args.duration, levels), sys.stdout, indent=2)
+    print()
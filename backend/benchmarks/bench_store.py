@@ -0,0 +1,113 @@
+"""Benchmark: binary conversation store vs convoJson, size on disk and read latency.
+
+    python -m benchmarks.bench_store --calls 50 --turns 400
+
+Writes a synthetic convoJson directory (conversations tokenized from generated
+logs, as the parser writes them) plus a .cvb copy per codec, then times the
+reads the app does: the summary, the last few turns, a range from the middle
+and the whole call. "json" is the stdlib load every reader used before;
+"json_orjson" is the store's fallback when no current binary copy exists.
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+from routes import convo_store
+from routes.fileio import atomic_write_json
+from routes.log_tokenizer import tokenize_file
+from benchmarks.synthetic import write_log
+
+TAIL_TURNS = 6
+RANGE_TURNS = 10
+
+
+def build_corpus(directory, calls, turns):
+    paths = []
+    for i in range(calls):
+        log_path = os.path.join(directory, f"custom_transcript_{i}_Banka.txt")
+        write_log(log_path, turns=turns, seed=i)
+        collected = tokenize_file(log_path)
+        os.unlink(log_path)
+        path = os.path.join(directory, f"custom_transcript_{i}_Banka.json")
+        atomic_write_json(path, {
+            "summary": {"filename": os.path.basename(log_path), "call_started": collected["call_start"],
+                        "duration_seconds": 300 + i, "average_ai_response_latency": 1.5,
+                        "sentiment": "neutral", "concerns": ["paani ki dikkat", "बिजली की कमी"]},
+            "conversation": collected["sentences"],
+        })
+        paths.append(path)
+    return paths
+
+
+def _per_read_us(fn, paths, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            fn(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best / len(paths) * 1e6, 1)
+
+
+def _json_reads(load):
+    def full(path):
+        with open(path, "rb") as f:
+            return load(f.read())
+    return {
+        "summary": lambda p: full(p)["summary"],
+        "tail": lambda p: full(p)["conversation"][-TAIL_TURNS:],
+        "range": lambda p: (lambda c: c[len(c) // 2:len(c) // 2 + RANGE_TURNS])(full(p)["conversation"]),
+        "full": full,
+    }
+
+
+def _store_reads():
+    def middle(path):
+        with convo_store.open_stored(path) as stored:
+            start = stored.turn_count // 2
+            return stored.turns(start, start + RANGE_TURNS)
+    return {
+        "summary": convo_store.read_summary,
+        "tail": lambda p: convo_store.read_turns(p, -TAIL_TURNS),
+        "range": middle,
+        "full": convo_store.read_conversation,
+    }
+
+
+def run(calls=50, turns=400, repeat=5):
+    codecs = ["raw", "zlib"] + (["zstd"] if convo_store.zstandard is not None else [])
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = build_corpus(tmp, calls, turns)
+        json_bytes = sum(os.path.getsize(p) for p in paths)
+        results = {
+            "json": {"bytes": json_bytes, **{f"{name}_us": _per_read_us(fn, paths, repeat)
+                                              for name, fn in _json_reads(json.loads).items()}},
+            "json_orjson": {"bytes": json_bytes, **{f"{name}_us": _per_read_us(fn, paths, repeat)
+                                                     for name, fn in _json_reads(convo_store.jsoncodec.loads).items()}},
+        }
+        for codec in codecs:
+            start = time.perf_counter()
+            convo_store.convert_all(tmp, codec=codec, force=True)
+            convert_seconds = time.perf_counter() - start
+            results[codec] = {
+                "bytes": sum(os.path.getsize(convo_store.store_path(p)) for p in paths),
+                "convert_seconds": round(convert_seconds, 3),
+                **{f"{name}_us": _per_read_us(fn, paths, repeat) for name, fn in _store_reads().items()},
+            }
+            shutil.rmtree(os.path.join(tmp, convo_store.STORE_SUBDIR))
+    for codec in codecs:
+        results[codec]["size_vs_json"] = round(results[codec]["bytes"] / json_bytes, 3)
+    return {"calls": calls, "turns_per_call": turns, "formats": results}
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--calls", type=int, default=50)
+    cli.add_argument("--turns", type=int, default=400, help="turns per synthetic call")
+    cli.add_argument("--repeat", type=int, default=5, help="passes over the corpus; the best is reported")
+    args = cli.parse_args()
+    print(json.dumps(run(args.calls, args.turns, args.repeat), indent=2))
@@ -0,0 +1,106 @@
+"""Micro-benchmark: legacy readlines/regex/strptime turn assembly vs the streaming tokenizer.
+
+    python -m benchmarks.bench_tokenizer --mb 8
+"""
+import os
+import re
+import json
+import time
+import argparse
+import tempfile
+from datetime import datetime
+
+from routes.log_tokenizer import tokenize_file
+from benchmarks.synthetic import write_log
+
+
+def legacy_collect(filepath):
+    # The deterministic half of parse_log_file as it was before the tokenizer
+    with open(filepath, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+
+    call_start = None
+    sentences = []
+    current_ai_sentence, current_user_sentence = [], []
+    last_timestamp, latencies = None, []
+    noise_count = 0
+
+    for line in lines:
+        line = line.strip()
+        if line.startswith("Call started at:"):
+            call_start = line.replace("Call started at:", "").strip()
+            continue
+        match = re.match(r"\[(\d{2}:\d{2}:\d{2})\] (.+?): (.+)", line)
+        if match:
+            timestamp_str, speaker_type, text = match.groups()
+            full_timestamp_str = f"{call_start.split('T')[0]}T{timestamp_str}"
+            timestamp = datetime.strptime(timestamp_str, "%H:%M:%S")
+            if "AI (chunk)" in speaker_type:
+                if current_user_sentence:
+                    sentences.append({"speaker": "user", "text": "".join(current_user_sentence), "timestamp": last_user_timestamp})
+                    current_user_sentence = []
+                if last_timestamp and (timestamp - last_timestamp).seconds > 2:
+                    if current_ai_sentence:
+                        sentences.append({"speaker": "ai", "text": " ".join(current_ai_sentence), "timestamp": last_ai_timestamp})
+                        current_ai_sentence = []
+                if not current_ai_sentence:
+                    last_ai_timestamp = full_timestamp_str
+                current_ai_sentence.append(text.strip())
+                if last_timestamp:
+                    latencies.append((timestamp - last_timestamp).total_seconds())
+                last_timestamp = timestamp
+            elif "User" in speaker_type:
+                if current_ai_sentence:
+                    sentences.append({"speaker": "ai", "text": " ".join(current_ai_sentence), "timestamp": last_ai_timestamp})
+                    current_ai_sentence = []
+                user_text = text.strip()
+                if "<noise>" in user_text.lower():
+                    noise_count += 1
+                if not current_user_sentence:
+                    last_user_timestamp = full_timestamp_str
+                current_user_sentence.append(user_text)
+
+    if current_ai_sentence:
+        sentences.append({"speaker": "ai", "text": " ".join(current_ai_sentence), "timestamp": last_ai_timestamp})
+    if current_user_sentence:
+        sentences.append({"speaker": "user", "text": "".join(current_user_sentence), "timestamp": last_user_timestamp})
+    return {"sentences": sentences, "latencies": latencies, "noise_count": noise_count}
+
+
+def _best_of(fn, path, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(mb=8.0, repeat=3):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic_call.txt")
+        size = write_log(path, target_bytes=int(mb * 1024 * 1024))
+        with open(path, "rb") as f:
+            line_count = sum(1 for _ in f)
+
+        legacy_seconds, legacy = _best_of(legacy_collect, path, repeat)
+        new_seconds, new = _best_of(tokenize_file, path, repeat)
+        assert legacy["sentences"] == new["sentences"], "tokenizer output diverged from legacy parser"
+
+    return {
+        "bytes": size,
+        "lines": line_count,
+        "turns": len(new["sentences"]),
+        "legacy": {"seconds": round(legacy_seconds, 4), "lines_per_second": int(line_count / legacy_seconds)},
+        "streaming": {"seconds": round(new_seconds, 4), "lines_per_second": int(line_count / new_seconds)},
+        "speedup": round(legacy_seconds / new_seconds, 2),
+    }
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--mb", type=float, default=8.0, help="size of the synthetic log")
+    cli.add_argument("--repeat", type=int, default=3)
+    args = cli.parse_args()
+    print(json.dumps(run(args.mb, args.repeat), indent=2))
@@ -0,0 +1,78 @@
+import re
+import json
+import time
+import zlib
+import threading
+
+
+class FakeRateLimit(Exception):
+    """Mimics the SDK's 429 so retry/backoff paths get exercised"""
+    code = 429
+
+
+class FakeLLMClient:
+    """Deterministic stand-in for routes.llm_client.GeminiClient.
+    Echoes indexed normalization batches back, scores sentiment items from a
+    hash of their text, returns a canned call analysis for summary prompts,
+    and counts calls so stages can be benchmarked offline.
+    latency_per_kchar adds prompt-size-dependent latency; max_output_items
+    truncates indexed answers the way a real model runs out of output."""
+
+    def __init__(self, latency=0.0, rate_limit_every=0, latency_per_kchar=0.0, max_output_items=None):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.latency_per_kchar = latency_per_kchar
+        self.max_output_items = max_output_items
+        self.calls = 0
+        self.prompt_chars = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.prompt_chars = 0
+
+    def generate(self, prompt, model=None):
+        with self._lock:
+            self.calls += 1
+            call_no = self.calls
+            self.prompt_chars += len(prompt)
+        delay = self.latency + self.latency_per_kchar * len(prompt) / 1000
+        if delay:
+            time.sleep(delay)
+        if self.rate_limit_every and call_no % self.rate_limit_every == 0:
+            raise FakeRateLimit("429 Resource has been exhausted (fake)")
+        return self._respond(prompt)
+
+    def _respond(self, prompt):
+        items = re.search(r"Input:\s*(\[[\s\S]*\])\s*$", prompt)
+        if items:
+            parsed = json.loads(items.group(1))[:self.max_output_items]
+            if "sentiment scoring engine" in prompt:
+                # Stable pseudo-score per sentence text
+                return json.dumps([{"i": it["i"], "score": zlib.crc32(it["text"].encode("utf-8")) % 101 / 10}
+                                   for it in parsed])
+            # Batched normalization: echo each indexed item back
+            return json.dumps([{"i": it["i"], "text": it["text"].strip()} for it in parsed], ensure_ascii=False)
+        if "User sentences:" in prompt:
+            # Single-prompt sentiment (pre-windowing): numbered user and AI blocks
+            user_block, ai_block = prompt.split("User sentences:", 1)[1].split("AI sentences:", 1)
+            scored, budget = {}, self.max_output_items
+            for key, block in (("user", user_block), ("ai", ai_block)):
+                lines = re.findall(r"^(\d+)\. (.*)$", block, re.MULTILINE)
+                if budget is not None:
+                    lines, budget = lines[:budget], max(0, budget - len(lines))
+                scored[key] = [{"index": int(n), "score": zlib.crc32(t.encode("utf-8")) % 101 / 10}
+                               for n, t in lines]
+            return json.dumps(scored)
+        if "sentiment_score" in prompt:
+            return json.dumps({
+                "sentiment": "neutral",
+                "concerns": ["loan repayment", "crop loss"],
+                "overview": "Synthetic call analysis.",
+                "user_tone": "calm",
+                "emotion": "neutral",
+                "sentiment_score": 5.0,
+            })
+        # Legacy single-turn prompt: return the text after the last colon
+        return prompt.rsplit(":", 1)[-1].strip()
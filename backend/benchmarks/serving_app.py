@@ -0,0 +1,28 @@
+"""WSGI entry for bench_serving: the real app with the LangExtract step stubbed.
+
+    gunicorn -c gunicorn.conf.py benchmarks.serving_app:app
+
+Only the upstream is replaced (one FakeLLMClient call of BENCH_LLM_LATENCY
+seconds per analysis) and the data directories are pointed at
+BENCH_DATA_DIR; limits, job pools and timeouts are the shipped defaults.
+"""
+import os
+
+from benchmarks.fake_llm import FakeLLMClient
+import analysis
+import app as app_module
+from routes import analysis_cache
+
+_data_dir = os.environ["BENCH_DATA_DIR"]
+_llm = FakeLLMClient(latency=float(os.getenv("BENCH_LLM_LATENCY", "0.5")))
+
+
+def _fake_analysis(filepath, workspace):
+    _llm.generate(f"extract concerns from {os.path.basename(filepath)}")
+    return {"concerns": [], "action_items": [], "emotions": [], "summary_metrics": {}}
+
+
+analysis._run_analysis = _fake_analysis
+analysis_cache._cache = analysis_cache.AnalysisCache(cache_dir=os.path.join(_data_dir, "cache"))
+app_module.TRANSCRIPT_DIR = _data_dir
+app = app_module.app
@@ -0,0 +1,154 @@
+"""Run the offline benchmarks and write one JSON report, optionally compared to an earlier one.
+
+    python -m benchmarks.suite --out bench-$(git rev-parse --short HEAD).json
+    python -m benchmarks.suite --quick --compare bench-abc1234.json
+
+Nothing here touches Gemini or S3: model calls go to FakeLLMClient, S3 to
+FakeS3Client and all data to temp directories. Benchmarks' own progress
+output goes to stderr so stdout stays valid JSON.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import contextlib
+
+os.environ.setdefault("INGEST_INTERVAL_SECONDS", "0")
+os.environ.setdefault("LIVE_TAIL_INTERVAL_SECONDS", "0")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")  # analysis.py refuses to import without one
+
+from benchmarks import (bench_parse, bench_dashboard, bench_caches, bench_tokenizer, bench_s3_sync,
+                        bench_normalizer, bench_sentiment, bench_lexicon, bench_responses, bench_serving,
+                        bench_search, bench_store)
+
+# name -> (run function, full-size kwargs, --quick kwargs)
+BENCHMARKS = {
+    "parse": (bench_parse.run, {"calls": 40, "turns": 60, "latency": 0.05, "workers": (1, 4)},
+              {"calls": 8, "turns": 30, "latency": 0.01, "workers": (1, 4)}),
+    "dashboard": (bench_dashboard.run, {"sizes": (1000, 10000, 100000)}, {"sizes": (1000, 10000), "repeat": 10}),
+    "caches": (bench_caches.run, {"entries": 200, "latency": 0.01}, {"entries": 50, "latency": 0.005}),
+    "tokenizer": (bench_tokenizer.run, {"mb": 8.0}, {"mb": 1.0, "repeat": 1}),
+    "s3_sync": (bench_s3_sync.run, {"keys": 1500, "latency": 0.02, "workers": 8},
+                {"keys": 100, "latency": 0.005, "workers": 8}),
+    "normalizer": (bench_normalizer.run, {"turns": 40, "calls": 5, "latency": 0.2, "workers": 4},
+                   {"turns": 20, "calls": 3, "latency": 0.02, "workers": 4}),
+    "sentiment": (bench_sentiment.run, {"turns": 1200, "latency": 0.3, "latency_per_kchar": 0.01, "max_output": 150,
+                                        "workers": 4, "budget": 2000},
+                  {"turns": 300, "latency": 0.02, "latency_per_kchar": 0.0, "max_output": 150,
+                   "workers": 4, "budget": 2000}),
+    "lexicon": (bench_lexicon.run, {"terms": 10000, "calls": 50, "turns": 200},
+                {"terms": 2000, "calls": 10, "turns": 100}),
+    "responses": (bench_responses.run, {"calls": 50, "turns": 200}, {"calls": 10, "turns": 50, "repeat": 5}),
+    "serving": (bench_serving.run, {"latency": 5.0, "duration": 8.0}, {"latency": 0.1, "duration": 1.0}),
+    "search": (bench_search.run, {"turns": 1000000}, {"turns": 50000, "repeat": 3}),
+    "store": (bench_store.run, {"calls": 50, "turns": 400}, {"calls": 10, "turns": 200, "repeat": 3}),
+}
+
+# Suffixes of numeric result keys and which direction is better
+_LOWER_IS_BETTER = ("seconds", "_ms", "_us", "bytes")
+_HIGHER_IS_BETTER = ("per_second", "speedup", "hit_rate", "coverage")
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    from routes import jsoncodec, responses
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "orjson": jsoncodec.orjson is not None,
+        "brotli": responses.brotli is not None,
+    }
+
+
+def run(names=None, quick=False):
+    report = {"environment": environment(), "quick": quick, "results": {}, "wall_seconds": {}}
+    for name in names or BENCHMARKS:
+        fn, full, small = BENCHMARKS[name]
+        print(f"Running {name}...", file=sys.stderr)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stderr):
+            try:
+                report["results"][name] = fn(**(small if quick else full))
+            except Exception as e:
+                report["results"][name] = {"error": f"{type(e).__name__}: {e}"}
+        report["wall_seconds"][name] = round(time.perf_counter() - start, 2)
+    return report
+
+
+def _flatten(obj, prefix=""):
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            yield from _flatten(value, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        yield prefix, obj
+
+
+def _direction(path):
+    leaf = path.rsplit(".", 1)[-1]
+    if leaf.endswith(_HIGHER_IS_BETTER):
+        return 1
+    if leaf.endswith(_LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(baseline, current, threshold=1.2):
+    """Metrics present in both reports whose ratio moved past threshold in
+    either direction, as {"regressions": [...], "improvements": [...]}"""
+    before = dict(_flatten(baseline.get("results", {})))
+    after = dict(_flatten(current.get("results", {})))
+    out = {"regressions": [], "improvements": []}
+    for path, old in before.items():
+        new, direction = after.get(path), _direction(path)
+        if new is None or not direction or old <= 0 or new <= 0:
+            continue
+        ratio = new / old
+        worse = ratio > threshold if direction < 0 else ratio < 1 / threshold
+        better = ratio < 1 / threshold if direction < 0 else ratio > threshold
+        if worse or better:
+            out["regressions" if worse else "improvements"].append(
+                {"metric": path, "before": old, "after": new, "ratio": round(ratio, 3)})
+    return out
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--only", default=None, help=f"comma-separated subset of: {','.join(BENCHMARKS)}")
+    cli.add_argument("--quick", action="store_true", help="small sizes, for a check in well under a minute")
+    cli.add_argument("--out", default=None, help="write the report here as well as to stdout")
+    cli.add_argument("--compare", default=None, help="earlier report to diff against")
+    cli.add_argument("--threshold", type=float, default=1.2, help="ratio that counts as a change")
+    cli.add_argument("--fail-on-regression", action="store_true", help="exit 1 if anything regressed")
+    args = cli.parse_args()
+
+    names = args.only.split(",") if args.only else None
+    unknown = set(names or ()) - set(BENCHMARKS)
+    if unknown:
+        cli.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    report = run(names, args.quick)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["comparison"] = {"baseline_commit": baseline.get("environment", {}).get("commit"),
+                                "threshold": args.threshold, **compare(baseline, report, args.threshold)}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    if args.fail_on_regression and report.get("comparison", {}).get("regressions"):
+        sys.exit(1)
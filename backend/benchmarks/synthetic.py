@@ -0,0 +1,55 @@
+import random
+from datetime import datetime, timedelta
+
+_AI_WORDS = ["Haan", "ji,", "aapka", "chinta", "bilkul", "sahi", "ba.", "Kisan", "Bhaiya", "log", "ke",
+             "liye", "sarkar", "yojana", "laaye", "hain.", "Verma", "ji", "bahut", "kaam", "karat", "hain."]
+_USER_WORDS = ["हमरा", "गाँव", "में", "बिजली", "नहीं", "है", "kisan", "loan", "byaaj", "fasal", "paani",
+               "nahar", "sadak", "school", "dawai", "bahut", "dikkat", "ba"]
+
+
+def generate_log_lines(turns=40, ai_chunks_per_turn=30, seed=0, start=None):
+    """Yield lines in the processed_logs format: header, then alternating
+    AI turns streamed one token per `AI (chunk)` line and short User turns."""
+    rng = random.Random(seed)
+    clock = start or datetime(2025, 8, 3, 20, 32, 16, 229427)
+    yield f"Call started at: {clock.isoformat()}\n"
+    yield f"Stream SID: {rng.getrandbits(128):032x}\n"
+    for turn in range(turns):
+        if turn % 2 == 0:
+            for _ in range(ai_chunks_per_turn):
+                clock += timedelta(milliseconds=rng.randint(50, 400))
+                yield f"[{clock:%H:%M:%S}] AI (chunk): {rng.choice(_AI_WORDS)}\n"
+            clock += timedelta(seconds=rng.randint(3, 8))
+        else:
+            words = " ".join(rng.choice(_USER_WORDS) for _ in range(rng.randint(3, 15)))
+            if rng.random() < 0.05:
+                words += " <noise>"
+            yield f"[{clock:%H:%M:%S}] User: {words}\n"
+            clock += timedelta(seconds=rng.randint(1, 3))
+    yield f"Call ended at: {clock.isoformat()}\n"
+
+
+def write_log(path, target_bytes=None, **kwargs):
+    """Write one synthetic log; with target_bytes, keep adding turns until that size"""
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        if target_bytes is None:
+            for line in generate_log_lines(**kwargs):
+                f.write(line)
+                written += len(line.encode("utf-8"))
+            return written
+        turns = 200
+        lines = list(generate_log_lines(turns=turns, **kwargs))
+        body, footer = lines[:-1], lines[-1]
+        for line in body:
+            f.write(line)
+            written += len(line.encode("utf-8"))
+        # repeat the body's turn lines (not the header) until the target size
+        turn_lines = body[2:]
+        while written < target_bytes:
+            for line in turn_lines:
+                f.write(line)
+                written += len(line.encode("utf-8"))
+        f.write(footer)
+        written += len(footer.encode("utf-8"))
+    return written
@@ -0,0 +1,41 @@
+# gunicorn settings for production: gunicorn -c gunicorn.conf.py wsgi:app
+import os
+import glob
+import multiprocessing
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Threaded workers: request threads mostly wait on Gemini or on the job pools
+# in app.py (ANALYZE_WORKERS, SENTIMENT_STAGE_WORKERS), and /stream/calls
+# keeps one thread per open SSE client. The app reads GUNICORN_THREADS too:
+# /analyze, /sentiment_flow and /stream/calls (LIVE_MAX_SUBSCRIBERS) each
+# admit a quarter of them by default, leaving the last quarter for reads.
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", min(4, multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv("GUNICORN_THREADS", "64"))
+
+# Slow LLM requests answer 202 after ANALYZE_TIMEOUT_SECONDS (3 s), well inside this
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# The app starts its ingest scheduler and live tail threads at import; those
+# do not survive fork, so each worker imports the app itself. Ingest runs
+# are serialized across workers by convoJson/_ingest.lock, and one worker at a
+# time tails the logs (processed_logs/.live_tail.lock) while every worker
+# streams the shared event log to its own SSE clients.
+preload_app = False
+
+# Each worker keeps its own metrics; they share snapshots here so any worker's
+# /metrics reports the whole server (routes/metrics.py)
+METRICS_DIR = os.environ.setdefault("METRICS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".metrics"))
+
+
+def on_starting(server):
+    # counters start from zero with the server, not from the last run's workers
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        os.unlink(path)
+
+
+accesslog = "-"
+errorlog = "-"
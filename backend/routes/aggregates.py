@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from types import MappingProxyType
+from flask import Response
+
+from routes import jsoncodec
+from routes.responses import matching_etag
+from routes.convo_index import get_district_version, get_district_view
+
+# Baseline figures; live counts from ingested calls are added on top
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'district_stats.json')
+
+# How often the live district view in the index is polled for changes
+LIVE_REFRESH_SECONDS = float(os.getenv("DISTRICT_REFRESH_SECONDS", "2"))
+# State that ingested districts missing from the baseline file are filed under
+LIVE_DEFAULT_STATE = os.getenv("LIVE_DEFAULT_STATE", "Bihar")
+
+# Common alias tokens (without spaces) -> canonical spaced name
+ALIASES = {
+    'andhrapradesh': 'andhra pradesh',
+    'arunachalpradesh': 'arunachal pradesh',
+    'madhyapradesh': 'madhya pradesh',
+    'uttarpradesh': 'uttar pradesh',
+    'jammukashmir': 'jammu and kashmir',
+    'tamilnadu': 'tamil nadu'
+}
+
+STATE_TOP_CONCERNS = 5
+
+
+def normalize_state_name(name: str) -> str:
+    return (name or '').strip().lower().replace('_', ' ')
+
+
+def encode_body(obj):
+    """Serialized JSON body plus its strong ETag"""
+    body = jsoncodec.dumps(obj, sort_keys=True)
+    return body, hashlib.sha1(body).hexdigest()
+
+
+def json_body_response(body, etag, status=200):
+    """Send a pre-serialized body, or 304 when the client already has it"""
+    matched = matching_etag(etag) if status == 200 else None
+    if matched:
+        response = Response(status=304)
+        response.set_etag(matched)
+    else:
+        response = Response(body, status=status, mimetype='application/json')
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _state_rollup(districts):
+    total_calls = sum(d.get('calls', 0) for d in districts.values())
+    # Count concern frequency across districts; ties keep first-seen order
+    concern_counts = {}
+    for district in districts.values():
+        for concern in district.get('top_concerns', []):
+            concern_counts[concern] = concern_counts.get(concern, 0) + 1
+    top_concerns = sorted(concern_counts.items(), key=lambda x: x[1], reverse=True)[:STATE_TOP_CONCERNS]
+    return {'calls': total_calls, 'top_concerns': [concern for concern, _ in top_concerns]}
+
+
+def merge_live(raw, live):
+    """Overlay the live district view on the baseline data: call counts are
+    added, and a district's top concerns become its most frequent ingested
+    ones once it has any. Returns a new dict; raw is not modified."""
+    merged = {state: dict(districts) if isinstance(districts, dict) else districts
+              for state, districts in raw.items()}
+    where = {}
+    for state, districts in merged.items():
+        if isinstance(districts, dict):
+            for district in districts:
+                where[district.strip().lower()] = (state, district)
+
+    for district, counts in live.items():
+        found = where.get(district.strip().lower())
+        if found is None:
+            state = next((k for k in merged if normalize_state_name(k) == normalize_state_name(LIVE_DEFAULT_STATE)),
+                         LIVE_DEFAULT_STATE)
+            if not isinstance(merged.get(state), dict):
+                merged[state] = {}
+            found = where[district.strip().lower()] = (state, district)
+        state, key = found
+        base = merged[state].get(key) or {"calls": 0, "top_concerns": ["Nil"]}
+        labels = [label for label, _ in counts["top_concerns"]]
+        merged[state][key] = {**base, "calls": base.get("calls", 0) + counts["calls"],
+                              "top_concerns": labels or base.get("top_concerns", [])}
+    return merged
+
+
+class Snapshot:
+    """Immutable aggregates of one version of the district data, with every
+    response body serialized once up front"""
+
+    def __init__(self, raw, version=None):
+        self.version = version
+        # Normalize top-level state keys to a canonical lowercase-with-spaces form
+        # e.g. "Bihar" -> "bihar"; on collisions the later key wins
+        districts_by_state = {}
+        for original_key, value in raw.items():
+            districts_by_state[normalize_state_name(original_key)] = value
+        self.states = tuple(sorted(districts_by_state))
+
+        # Every spelling a client may send -> canonical key, resolved once
+        lookup = {}
+        for canon in self.states:
+            lookup[canon.replace(' ', '')] = canon
+        for alias, canon in ALIASES.items():
+            if canon in districts_by_state:
+                lookup.setdefault(alias, canon)
+        self._lookup = MappingProxyType(lookup)
+
+        state_stats = {}
+        for state_name, districts in raw.items():
+            if isinstance(districts, dict) and districts:
+                state_stats[state_name] = _state_rollup(districts)
+        self.state_stats = MappingProxyType(state_stats)
+        self.state_stats_body = encode_body({'states': state_stats})
+
+        district_bodies = {}
+        for canon, data in districts_by_state.items():
+            total_calls = sum(d.get('calls', 0) for d in data.values()) if isinstance(data, dict) else 0
+            district_bodies[canon] = encode_body({'state': canon, 'total_calls': total_calls, 'districts': data})
+        self._district_bodies = MappingProxyType(district_bodies)
+
+    def resolve_state(self, name):
+        norm = normalize_state_name(name)
+        if norm in self._district_bodies:
+            return norm
+        return self._lookup.get(norm.replace(' ', ''))
+
+    def district_body(self, canon):
+        return self._district_bodies.get(canon)
+
+
+class AggregateStore:
+    """Serves the current Snapshot of DATA_PATH merged with the live district
+    view, rebuilding it (off to the side, then swapped in with one assignment)
+    when the file's mtime or size or the view's version changes. Readers never
+    see a half-built snapshot and never block on a rebuild that is already in
+    progress elsewhere."""
+
+    def __init__(self, path=DATA_PATH, live=True, refresh_seconds=LIVE_REFRESH_SECONDS):
+        self.path = path
+        self.live = live
+        self.refresh_seconds = refresh_seconds
+        self._snapshot = None
+        self._build_lock = threading.Lock()
+        self._live_version = None
+        self._live_checked = 0.0
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _live_signature(self):
+        # The index is polled at most every refresh_seconds; in between the
+        # last known version stands
+        if not self.live:
+            return None
+        now = time.monotonic()
+        if now - self._live_checked >= self.refresh_seconds:
+            self._live_checked = now
+            try:
+                self._live_version = get_district_version()
+            except sqlite3.Error as e:
+                print(f"Error reading district view: {e}")
+        return self._live_version
+
+    def _signature(self):
+        return (self._file_signature(), self._live_signature())
+
+    def invalidate(self):
+        """Re-check the live view on the next request (e.g. right after an ingest)"""
+        self._live_checked = 0.0
+
+    def _build(self, signature):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Error loading district stats: {e}")
+            raw = {}
+        if self.live:
+            try:
+                live_version, view = get_district_view()
+                raw = merge_live(raw, view)
+                # the view may have moved on since it was polled; label what was read
+                signature = (signature[0], live_version)
+                self._live_version = live_version
+            except sqlite3.Error as e:
+                print(f"Error reading district view: {e}")
+        return Snapshot(raw, version=signature)
+
+    def get(self):
+        snapshot = self._snapshot
+        signature = self._signature()
+        if snapshot is not None and snapshot.version == signature:
+            return snapshot
+        # Only one thread rebuilds; the rest keep serving the old snapshot meanwhile
+        if not self._build_lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            if self._snapshot is None or self._snapshot.version != signature:
+                self._snapshot = self._build(signature)
+            return self._snapshot
+        finally:
+            self._build_lock.release()
+
+
+store = AggregateStore()
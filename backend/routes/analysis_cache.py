@@ -0,0 +1,256 @@
+import os
+import re
+import gzip
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from routes.fileio import atomic_write_json
+from routes.metrics import timed_stage
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "../langextract_cache")
+# Hidden, so list_entries / clean never treat it as an entry
+STAT_INDEX_NAME = ".stat_index.json"
+RESULT_NAME = "analysis_result.json"
+HTML_NAME = "visualization.html"
+# Precompressed copy served to clients that accept gzip
+HTML_GZ_NAME = HTML_NAME + ".gz"
+JSONL_NAME = "extraction_results.jsonl"
+
+# Part of every key: bump when the prompt, examples or result shape change
+ANALYSIS_VERSION = "2"
+
+_HASH_CHUNK = 1024 * 1024
+_KEY_RE = re.compile(r"^[0-9a-f]{64}-v\w+$")
+
+
+def _stat_signature(st):
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+
+def hash_file(filepath):
+    """sha256 of the file contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """Disk cache of LangExtract analyses keyed by transcript content.
+    A stat index (mtime, size, inode -> content hash) lets unchanged files skip
+    hashing; a touched file is re-hashed once and still hits. Each analysis
+    runs in its own temp workspace and its entry is renamed into place whole.
+    Concurrent requests for the same content wait for a single extraction
+    (a thread lock per key plus a flock, so separate worker processes share it;
+    both are released and removed once the extraction is done)."""
+
+    def __init__(self, cache_dir=CACHE_DIR, version=ANALYSIS_VERSION):
+        self.cache_dir = cache_dir
+        self.version = version
+        self.stat_index_path = os.path.join(cache_dir, STAT_INDEX_NAME)
+        self._lock = threading.Lock()
+        # key -> [thread lock, holders]; dropped when the last holder leaves
+        self._key_locks = {}
+        self._stat_index = None
+        self.counters = {"stat_hits": 0, "hash_hits": 0, "misses": 0, "coalesced": 0, "errors": 0,
+                         "hash_seconds": 0.0, "compute_seconds": 0.0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _load_stat_index(self):
+        if self._stat_index is None:
+            try:
+                with open(self.stat_index_path, "r", encoding="utf-8") as f:
+                    self._stat_index = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._stat_index = {}
+        return self._stat_index
+
+    def key_for(self, filepath):
+        """Returns (key, from_stat): from_stat is True when no hashing was needed"""
+        path = os.path.abspath(filepath)
+        signature = _stat_signature(os.stat(path))
+        with self._lock:
+            known = self._load_stat_index().get(path)
+        if known and known["stat"] == signature:
+            return f"{known['sha256']}-v{self.version}", True
+
+        started = time.perf_counter()
+        content_hash = hash_file(path)
+        elapsed = time.perf_counter() - started
+        self._count("hash_seconds", elapsed)
+        timed_stage("analysis.hash", elapsed)
+        with self._lock:
+            index = self._load_stat_index()
+            index[path] = {"stat": signature, "sha256": content_hash}
+            snapshot = dict(index)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        atomic_write_json(self.stat_index_path, snapshot, indent=None)
+        return f"{content_hash}-v{self.version}", False
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def visualization_path(self, key, gzipped=False):
+        """Path of the cached visualization for key, or None (also for malformed keys)"""
+        if not _KEY_RE.match(key or ""):
+            return None
+        path = os.path.join(self._entry_dir(key), HTML_GZ_NAME if gzipped else HTML_NAME)
+        return path if os.path.exists(path) else None
+
+    def _with_visualization(self, key, result):
+        # The HTML itself stays on disk; clients fetch it by id when they show it
+        if os.path.exists(os.path.join(self._entry_dir(key), HTML_NAME)):
+            result["visualization_id"] = key
+            result["visualization_url"] = f"/visualization/{key}"
+        return result
+
+    def load(self, key):
+        try:
+            with open(os.path.join(self._entry_dir(key), RESULT_NAME), "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        result.pop("visualization_html", None)  # entries written before the HTML moved out
+        return self._with_visualization(key, result)
+
+    def _store(self, key, result, workspace):
+        """Write the entry into the workspace, then rename the directory into place"""
+        entry = self._entry_dir(key)
+        with open(os.path.join(workspace, RESULT_NAME), "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        html_path = os.path.join(workspace, HTML_NAME)
+        if os.path.exists(html_path):
+            with open(html_path, "rb") as src, gzip.open(os.path.join(workspace, HTML_GZ_NAME), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        staged = tempfile.mkdtemp(dir=self.cache_dir, prefix=f".{key}.")
+        for name in (RESULT_NAME, HTML_NAME, HTML_GZ_NAME, JSONL_NAME):
+            src = os.path.join(workspace, name)
+            if os.path.exists(src):
+                shutil.copy2(src, os.path.join(staged, name))
+        try:
+            os.rename(staged, entry)
+        except OSError:
+            # another process stored the same key first; its copy is equivalent
+            shutil.rmtree(staged, ignore_errors=True)
+
+    @contextmanager
+    def _key_lock(self, key):
+        """Exclusive per key across threads and processes. Nothing outlives the
+        holders: the thread lock is dropped by the last one, and the lock
+        file is removed on release (a waiter that then locks the unlinked
+        file notices the inode changed and locks the current one)."""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                path = os.path.join(self.cache_dir, f".{key}.lock")
+                while True:
+                    lock_file = open(path, "a")
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    try:
+                        if os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                            break
+                    except FileNotFoundError:
+                        pass
+                    lock_file.close()
+                try:
+                    yield
+                finally:
+                    os.unlink(path)
+                    lock_file.close()
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+
+    def get_or_compute(self, filepath, compute):
+        """Cached analysis of filepath, or compute(filepath, workspace) once.
+        compute writes any scratch files (JSONL, visualization.html) into
+        workspace, a private temp directory, and returns the result dict.
+        Results carrying an "error" key are returned but not cached."""
+        key, from_stat = self.key_for(filepath)
+        cached = self.load(key)
+        if cached is not None:
+            self._count("stat_hits" if from_stat else "hash_hits")
+            return cached
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._key_lock(key):
+            # whoever held the lock before us may have just stored it
+            cached = self.load(key)
+            if cached is not None:
+                self._count("coalesced")
+                return cached
+            self._count("misses")
+            started = time.perf_counter()
+            with tempfile.TemporaryDirectory(prefix="langextract-") as workspace:
+                result = compute(filepath, workspace)
+                if "error" in result:
+                    self._count("errors")
+                else:
+                    self._store(key, result, workspace)
+                    result = self._with_visualization(key, result)
+            elapsed = time.perf_counter() - started
+            self._count("compute_seconds", elapsed)
+            timed_stage("analysis.compute", elapsed)
+            return result
+
+    def list_entries(self):
+        try:
+            return sorted(d for d in os.listdir(self.cache_dir)
+                          if not d.startswith(".") and os.path.isdir(os.path.join(self.cache_dir, d)))
+        except FileNotFoundError:
+            return []
+
+    def clean(self, max_age_days=7):
+        """Remove entries older than max_age_days and stat index rows for deleted files"""
+        cutoff = time.time() - max_age_days * 24 * 60 * 60
+        removed = []
+        for entry in self.list_entries():
+            path = self._entry_dir(entry)
+            if os.path.getctime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(entry)
+        with self._lock:
+            index = self._load_stat_index()
+            for path in [p for p in index if not os.path.exists(p)]:
+                del index[path]
+            snapshot = dict(index)
+        if os.path.isdir(self.cache_dir):
+            atomic_write_json(self.stat_index_path, snapshot, indent=None)
+        return removed
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        hits = counters["stat_hits"] + counters["hash_hits"] + counters["coalesced"]
+        lookups = hits + counters["misses"]
+        return {
+            **counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "entries": len(self.list_entries()),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnalysisCache()
+        return _cache
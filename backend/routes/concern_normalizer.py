@@ -0,0 +1,190 @@
+import re
+import unicodedata
+
+try:
+    import numpy as np
+except ImportError:  # clustering is optional; canonical keys alone still work
+    np = None
+
+# Devanagari -> Latin, close to how callers write Hindi in Latin script
+_CONSONANTS = {
+    "क": "k", "ख": "kh", "ग": "g", "घ": "gh", "ङ": "n", "च": "ch", "छ": "chh", "ज": "j", "झ": "jh",
+    "ञ": "n", "ट": "t", "ठ": "th", "ड": "d", "ढ": "dh", "ण": "n", "त": "t", "थ": "th", "द": "d",
+    "ध": "dh", "न": "n", "प": "p", "फ": "ph", "ब": "b", "भ": "bh", "म": "m", "य": "y", "र": "r",
+    "ल": "l", "व": "v", "श": "sh", "ष": "sh", "स": "s", "ह": "h",
+}
+_VOWELS = {
+    "अ": "a", "आ": "aa", "इ": "i", "ई": "i", "उ": "u", "ऊ": "u", "ऋ": "ri", "ए": "e", "ऐ": "ai",
+    "ओ": "o", "औ": "au",
+}
+_MATRAS = {
+    "ा": "aa", "ि": "i", "ी": "i", "ु": "u", "ू": "u", "ृ": "ri", "े": "e", "ै": "ai", "ो": "o", "ौ": "au",
+}
+_NASAL = {"ं": "n", "ँ": "n", "ः": "h"}
+_VIRAMA = "्"
+_NUKTA = "\u093c"
+# NFKC splits क़/ज़/फ़... into base + nukta, so the dot is applied to the previous consonant
+_NUKTA_FORMS = {"k": "q", "kh": "kh", "g": "g", "j": "z", "d": "r", "dh": "rh", "ph": "f"}
+_INHERENT = "a"
+
+# Hinglish / English words folded onto one concept
+SYNONYMS = {
+    "karz": "loan", "karza": "loan", "karj": "loan", "rin": "loan", "udhar": "loan", "debt": "loan",
+    "byaj": "interest", "sud": "interest",
+    "khad": "fertilizer", "fertiliser": "fertilizer", "urvarak": "fertilizer",
+    "bijli": "electricity", "power": "electricity",
+    "pani": "water", "jal": "water",
+    "sadak": "road",
+    "badh": "flood", "flooding": "flood",
+    "fasal": "crop", "kheti": "farming", "agricultural": "farming", "agriculture": "farming",
+    "kisan": "farmer",
+    "naukri": "job", "rozgar": "employment", "berozgari": "unemployment",
+    "dawai": "medicine", "aspatal": "hospital",
+    "mehngai": "inflation",
+    "sinchai": "irrigation",
+}
+
+STOPWORDS = {
+    "a", "an", "the", "of", "and", "or", "for", "to", "in", "on", "with", "about", "due", "by", "from",
+    "at", "lack", "issue", "issues", "problem", "problems", "concern", "concerns",
+    "ka", "ki", "ke", "ko", "me", "mein", "hai", "hain", "se", "aur", "ya", "bhi", "ek", "samasya",
+}
+
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+_REPEATS = re.compile(r"(.)\1+")
+
+
+def _syllables_to_latin(units):
+    # units: [consonant, vowel] pairs; vowel is _INHERENT, a matra, or "" after a virama.
+    # Hindi schwa deletion: drop the inherent vowel at the end of a word and
+    # between two full syllables (VC_CV), e.g. बिजली -> bijli, not bijali.
+    last = len(units) - 1
+    for i, unit in enumerate(units):
+        if unit[1] != _INHERENT or not unit[0]:
+            continue
+        if i == last and i > 0:
+            unit[1] = ""
+        elif 0 < i < last and units[i - 1][1] and units[i + 1][1] and units[i + 1][0]:
+            unit[1] = ""
+    return "".join(c + v + n for c, v, n in units)
+
+
+def transliterate(text):
+    """Rough Devanagari -> Latin transliteration in the spelling callers use"""
+    if not any("\u0900" <= ch <= "\u097f" for ch in text):
+        return text
+    out, units = [], []
+
+    def flush():
+        if units:
+            out.append(_syllables_to_latin(units))
+            units.clear()
+
+    for ch in text:
+        if ch in _CONSONANTS:
+            units.append([_CONSONANTS[ch], _INHERENT, ""])
+        elif ch in _MATRAS and units:
+            units[-1][1] = _MATRAS[ch]
+        elif ch == _VIRAMA and units:
+            units[-1][1] = ""
+        elif ch == _NUKTA and units:
+            units[-1][0] = _NUKTA_FORMS.get(units[-1][0], units[-1][0])
+        elif ch in _NASAL and units:
+            units[-1][2] = _NASAL[ch]
+        elif ch in _VOWELS:
+            units.append(["", _VOWELS[ch], ""])
+        else:
+            flush()
+            out.append(ch)
+    flush()
+    return "".join(out)
+
+
+def _stem(token):
+    # Spelling variance in Latin Hindi ("paani"/"pani", "maaf"/"maf") is folded
+    # by collapsing repeated letters; synonyms are checked around each step
+    token = SYNONYMS.get(token, token)
+    token = _REPEATS.sub(r"\1", token)
+    token = SYNONYMS.get(token, token)
+    if len(token) > 4:
+        if token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif token.endswith("ing") and len(token) > 5:
+            token = token[:-3]
+        elif token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+    token = SYNONYMS.get(token, token)
+    return _REPEATS.sub(r"\1", token)
+
+
+def canonicalize(concern):
+    """Order-insensitive key for a concern string, e.g. 'repayment of loans',
+    'Loan repayment' and 'loans repayment' all map to 'loan repayment'."""
+    text = unicodedata.normalize("NFKC", str(concern or "")).strip()
+    text = transliterate(text).lower()
+    text = _NON_WORD.sub(" ", text)
+    tokens = []
+    for raw in text.split():
+        if raw in STOPWORDS:
+            continue
+        token = _stem(raw)
+        if token and token not in STOPWORDS:
+            tokens.append(token)
+    if not tokens:
+        return text.strip()
+    return " ".join(sorted(set(tokens)))
+
+
+def _char_ngrams(text, n=3):
+    padded = f" {text} "
+    return [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+
+# The similarity matrix is N x N: beyond this many keys the rest pass through unmerged
+MAX_CLUSTER_ITEMS = 500
+
+
+def cluster_counts(items, threshold=0.75):
+    """Merge near-duplicate canonical keys by character-trigram TF-IDF cosine.
+    items: [(canonical, count, label)], most frequent first -> same shape,
+    merged and re-sorted. Only the first MAX_CLUSTER_ITEMS are merged.
+    Returns items unchanged when numpy is unavailable."""
+    if np is None or len(items) < 2:
+        return items
+    items, rest = items[:MAX_CLUSTER_ITEMS], items[MAX_CLUSTER_ITEMS:]
+
+    vocab = {}
+    rows = []
+    for canonical, _, _ in items:
+        grams = _char_ngrams(canonical)
+        rows.append([vocab.setdefault(g, len(vocab)) for g in grams])
+    tf = np.zeros((len(items), len(vocab)), dtype=np.float32)
+    for i, cols in enumerate(rows):
+        np.add.at(tf[i], cols, 1.0)
+    df = (tf > 0).sum(axis=0)
+    tfidf = tf * np.log((1 + len(items)) / (1 + df) + 1)
+    tfidf /= np.linalg.norm(tfidf, axis=1, keepdims=True) + 1e-9
+    similar = (tfidf @ tfidf.T) >= threshold
+
+    # union-find over the similarity graph; the most frequent member wins the label
+    parent = list(range(len(items)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(*np.nonzero(np.triu(similar, k=1))):
+        ri, rj = find(int(i)), find(int(j))
+        if ri != rj:
+            keep, drop = (ri, rj) if items[ri][1] >= items[rj][1] else (rj, ri)
+            parent[drop] = keep
+
+    merged = {}
+    for i, (canonical, count, label) in enumerate(items):
+        root = find(i)
+        if root not in merged:
+            merged[root] = [items[root][0], 0, items[root][2]]
+        merged[root][1] += count
+    return sorted([*(tuple(v) for v in merged.values()), *rest], key=lambda x: (-x[1], x[0]))
@@ -0,0 +1,545 @@
+import os
+import re
+import json
+import glob
+import sqlite3
+import argparse
+import threading
+
+from routes.concern_normalizer import canonicalize
+from routes.cursors import encode_cursor, decode_cursor
+from routes.convo_store import read_turns
+
+CONVO_DIR = os.path.join(os.path.dirname(__file__), "../convoJson")
+INDEX_PATH = os.path.join(CONVO_DIR, "_index.sqlite3")
+
+# Number of trailing turns kept in the index for the /logs feed
+TAIL_TURNS = 6
+
+# Projections accepted by list_conversations
+FIELDS = ("summary", "tail", "full")
+
+SENTIMENT_MAP = {"positive": 1, "neutral": 0, "negative": -1}
+
+# Bumped whenever _SCHEMA changes shape; an older index is dropped and rebuilt
+SCHEMA_VERSION = 4
+
+# "custom_transcript_3_West_Champaran (1).txt.json" -> "West Champaran"
+_DISTRICT_RE = re.compile(r"_\d+_([A-Za-z][A-Za-z_ ]*?)(?: \(\d+\))?(?:\.\w+)*$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    filename TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    call_started TEXT,
+    duration_seconds REAL,
+    average_ai_response_latency REAL,
+    sentiment_value INTEGER,
+    district TEXT,
+    summary TEXT NOT NULL,
+    tail TEXT NOT NULL
+);
+-- listing order (newest first); keyset pages seek straight into it
+CREATE INDEX IF NOT EXISTS idx_conversations_mtime ON conversations (mtime DESC, filename DESC);
+CREATE INDEX IF NOT EXISTS idx_conversations_call_started ON conversations (call_started);
+CREATE INDEX IF NOT EXISTS idx_conversations_district ON conversations (district COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS concerns (
+    filename TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    concern TEXT NOT NULL,
+    canonical TEXT NOT NULL,
+    -- copied from the conversation so triggers still see it once that row is gone
+    district TEXT,
+    PRIMARY KEY (filename, position)
+);
+CREATE INDEX IF NOT EXISTS idx_concerns_canonical ON concerns (canonical);
+
+-- Incremental concern counters; label is the first wording seen for a canonical
+-- key and is the display label wherever that concern is shown
+CREATE TABLE IF NOT EXISTS concern_counts (
+    canonical TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0,
+    label TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_concern_counts_count ON concern_counts (count DESC);
+
+-- Materialized per-district view: call counts and concern frequencies
+CREATE TABLE IF NOT EXISTS district_calls (
+    district TEXT PRIMARY KEY COLLATE NOCASE,
+    calls INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS district_concerns (
+    district TEXT NOT NULL COLLATE NOCASE,
+    canonical TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    label TEXT NOT NULL,
+    PRIMARY KEY (district, canonical)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+-- Bumped by every change to the district view, so readers can poll it cheaply
+INSERT OR IGNORE INTO meta (key, value) VALUES ('district_version', 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_concerns_insert AFTER INSERT ON concerns
+BEGIN
+    INSERT OR IGNORE INTO concern_counts (canonical, count, label) VALUES (NEW.canonical, 0, NEW.concern);
+    UPDATE concern_counts SET count = count + 1 WHERE canonical = NEW.canonical;
+    INSERT OR IGNORE INTO district_concerns (district, canonical, count, label)
+        SELECT NEW.district, NEW.canonical, 0, NEW.concern WHERE NEW.district IS NOT NULL;
+    UPDATE district_concerns SET count = count + 1
+        WHERE district = NEW.district AND canonical = NEW.canonical;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_concerns_delete AFTER DELETE ON concerns
+BEGIN
+    UPDATE concern_counts SET count = count - 1 WHERE canonical = OLD.canonical;
+    DELETE FROM concern_counts WHERE canonical = OLD.canonical AND count <= 0;
+    UPDATE district_concerns SET count = count - 1
+        WHERE district = OLD.district AND canonical = OLD.canonical;
+    DELETE FROM district_concerns
+        WHERE district = OLD.district AND canonical = OLD.canonical AND count <= 0;
+END;
+
+-- Running aggregates so dashboard metrics never scan the conversations table
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total_calls INTEGER NOT NULL DEFAULT 0,
+    duration_sum REAL NOT NULL DEFAULT 0,
+    duration_count INTEGER NOT NULL DEFAULT 0,
+    sentiment_sum REAL NOT NULL DEFAULT 0,
+    sentiment_count INTEGER NOT NULL DEFAULT 0,
+    latency_sum REAL NOT NULL DEFAULT 0,
+    latency_count INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO totals (id) VALUES (1);
+
+CREATE TRIGGER IF NOT EXISTS trg_conversations_insert AFTER INSERT ON conversations
+BEGIN
+    UPDATE totals SET
+        total_calls = total_calls + 1,
+        duration_sum = duration_sum + COALESCE(NEW.duration_seconds, 0),
+        duration_count = duration_count + (NEW.duration_seconds IS NOT NULL),
+        sentiment_sum = sentiment_sum + COALESCE(NEW.sentiment_value, 0),
+        sentiment_count = sentiment_count + (NEW.sentiment_value IS NOT NULL),
+        latency_sum = latency_sum + COALESCE(NEW.average_ai_response_latency, 0),
+        latency_count = latency_count + (NEW.average_ai_response_latency IS NOT NULL)
+    WHERE id = 1;
+    INSERT OR IGNORE INTO district_calls (district, calls)
+        SELECT NEW.district, 0 WHERE NEW.district IS NOT NULL;
+    UPDATE district_calls SET calls = calls + 1 WHERE district = NEW.district;
+    UPDATE meta SET value = value + 1 WHERE key = 'district_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_conversations_delete AFTER DELETE ON conversations
+BEGIN
+    UPDATE totals SET
+        total_calls = total_calls - 1,
+        duration_sum = duration_sum - COALESCE(OLD.duration_seconds, 0),
+        duration_count = duration_count - (OLD.duration_seconds IS NOT NULL),
+        sentiment_sum = sentiment_sum - COALESCE(OLD.sentiment_value, 0),
+        sentiment_count = sentiment_count - (OLD.sentiment_value IS NOT NULL),
+        latency_sum = latency_sum - COALESCE(OLD.average_ai_response_latency, 0),
+        latency_count = latency_count - (OLD.average_ai_response_latency IS NOT NULL)
+    WHERE id = 1;
+    DELETE FROM concerns WHERE filename = OLD.filename;
+    UPDATE district_calls SET calls = calls - 1 WHERE district = OLD.district;
+    DELETE FROM district_calls WHERE district = OLD.district AND calls <= 0;
+    UPDATE meta SET value = value + 1 WHERE key = 'district_version';
+END;
+"""
+
+_bootstrapped = False
+# Index paths whose schema this process has created or migrated; creating it
+# writes (INSERT OR IGNORE seeds), so it must not run on every read
+_schema_ready = set()
+_schema_lock = threading.Lock()
+# Serializes the first-use build, so concurrent first requests rebuild once
+_build_lock = threading.Lock()
+
+
+def _migrate(conn):
+    # The index is derived data, so an old layout is simply dropped; the
+    # missing 'built' flag then makes _ensure_built re-index everything
+    if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+        return
+    objects = conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    for kind, name in sorted(objects, key=lambda o: o[0] != "trigger"):
+        conn.execute(f'DROP {kind.upper()} IF EXISTS "{name}"')
+    conn.executescript(_SCHEMA)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def get_connection(readonly=False):
+    """Open a connection to the index. The schema is created or migrated the
+    first time this process opens INDEX_PATH; readonly connections refuse
+    writes, so a request never queues behind ingest for the write lock."""
+    if INDEX_PATH not in _schema_ready:
+        with _schema_lock:
+            if INDEX_PATH not in _schema_ready:
+                os.makedirs(CONVO_DIR, exist_ok=True)
+                conn = sqlite3.connect(INDEX_PATH, timeout=30)
+                try:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    _migrate(conn)
+                    conn.executescript(_SCHEMA)
+                finally:
+                    conn.close()
+                _schema_ready.add(INDEX_PATH)
+    conn = sqlite3.connect(INDEX_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if readonly:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+def _list_convo_files():
+    # "_"-prefixed files are the app's own bookkeeping (_ingest_status.json), not calls
+    return [p for p in glob.glob(os.path.join(CONVO_DIR, "*.json"))
+            if not os.path.basename(p).startswith("_")]
+
+
+def district_for(filename, summary=None):
+    """District of a call: from the summary if the model gave one, else from the
+    transcript name (custom_transcript_<n>_<District>.txt)"""
+    if isinstance(summary, dict) and summary.get("district"):
+        name = str(summary["district"])
+    else:
+        match = _DISTRICT_RE.search(os.path.basename(filename))
+        name = match.group(1) if match else ""
+    # one spelling per district, so "banka" and "Banka" count together
+    name = " ".join(name.replace("_", " ").split()).title()
+    return name or None
+
+
+def _row_from_data(json_path, data):
+    summary = data.get("summary")
+    if not isinstance(summary, dict):
+        return None
+    st = os.stat(json_path)
+    sentiment = summary.get("sentiment", "neutral")
+    sentiment_value = SENTIMENT_MAP.get(sentiment.lower()) if isinstance(sentiment, str) else None
+    conversation = data.get("conversation") or []
+    concerns = summary.get("concerns") or []
+    if not isinstance(concerns, list):
+        concerns = [concerns]
+    return {
+        "filename": os.path.basename(json_path),
+        "mtime": st.st_mtime,
+        "size": st.st_size,
+        "call_started": summary.get("call_started"),
+        "duration_seconds": summary.get("duration_seconds"),
+        "average_ai_response_latency": summary.get("average_ai_response_latency"),
+        "sentiment_value": sentiment_value,
+        "district": district_for(summary.get("filename") or json_path, summary),
+        "summary": json.dumps(summary, ensure_ascii=False),
+        "tail": json.dumps(conversation[-TAIL_TURNS:], ensure_ascii=False),
+        "concerns": [str(c) for c in concerns],
+    }
+
+
+def _upsert(conn, row):
+    conn.execute("DELETE FROM conversations WHERE filename = ?", (row["filename"],))
+    conn.execute(
+        """INSERT INTO conversations
+           (filename, mtime, size, call_started, duration_seconds,
+            average_ai_response_latency, sentiment_value, district, summary, tail)
+           VALUES (:filename, :mtime, :size, :call_started, :duration_seconds,
+                   :average_ai_response_latency, :sentiment_value, :district, :summary, :tail)""",
+        row,
+    )
+    conn.executemany(
+        "INSERT INTO concerns (filename, position, concern, canonical, district) VALUES (?, ?, ?, ?, ?)",
+        [(row["filename"], i, c, canonicalize(c), row["district"]) for i, c in enumerate(row["concerns"])],
+    )
+
+
+def index_conversation(json_path, data=None):
+    """Add or refresh a single conversation in the index.
+    Called by the parser right after it writes a convoJson file, so `data`
+    is usually already in memory and the file is not read back."""
+    if data is None:
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    row = _row_from_data(json_path, data)
+    conn = get_connection()
+    try:
+        with conn:
+            if row is None:
+                conn.execute("DELETE FROM conversations WHERE filename = ?", (os.path.basename(json_path),))
+            else:
+                _upsert(conn, row)
+    finally:
+        conn.close()
+
+
+def remove_conversation(filename):
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute("DELETE FROM conversations WHERE filename = ?", (os.path.basename(filename),))
+    finally:
+        conn.close()
+
+
+def rebuild_index():
+    """Drop all entries and re-index every file in convoJson"""
+    conn = get_connection()
+    indexed = 0
+    try:
+        with conn:
+            conn.execute("DELETE FROM conversations")
+            conn.execute("DELETE FROM concerns")
+            conn.execute("DELETE FROM concern_counts")
+            conn.execute("DELETE FROM district_calls")
+            conn.execute("DELETE FROM district_concerns")
+            conn.execute(
+                "UPDATE totals SET total_calls = 0, duration_sum = 0, duration_count = 0, "
+                "sentiment_sum = 0, sentiment_count = 0, latency_sum = 0, latency_count = 0"
+            )
+            for file_path in _list_convo_files():
+                try:
+                    with open(file_path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except (json.JSONDecodeError, OSError):
+                    print(f"Warning: Could not decode JSON from {file_path}")
+                    continue
+                row = _row_from_data(file_path, data)
+                if row is not None:
+                    _upsert(conn, row)
+                    indexed += 1
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+    finally:
+        conn.close()
+    print(f"Indexed {indexed} conversations")
+    return indexed
+
+
+def check_index(fix=False):
+    """Compare the index against the convoJson directory.
+    Returns the filenames that are missing from the index, stale (mtime or
+    size changed on disk) or orphaned (indexed but deleted on disk).
+    With fix=True the inconsistent entries are re-indexed or removed."""
+    on_disk = {}
+    for file_path in _list_convo_files():
+        st = os.stat(file_path)
+        on_disk[os.path.basename(file_path)] = (st.st_mtime, st.st_size)
+
+    conn = get_connection(readonly=True)
+    try:
+        indexed = {r["filename"]: (r["mtime"], r["size"])
+                   for r in conn.execute("SELECT filename, mtime, size FROM conversations")}
+    finally:
+        conn.close()
+
+    report = {
+        "missing": sorted(f for f in on_disk if f not in indexed),
+        "stale": sorted(f for f in on_disk if f in indexed and indexed[f] != on_disk[f]),
+        "orphaned": sorted(f for f in indexed if f not in on_disk),
+    }
+
+    if fix:
+        for fname in report["missing"] + report["stale"]:
+            try:
+                index_conversation(os.path.join(CONVO_DIR, fname))
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"Warning: Could not index {fname}: {e}")
+        for fname in report["orphaned"]:
+            remove_conversation(fname)
+
+    report["consistent"] = not (report["missing"] or report["stale"] or report["orphaned"])
+    return report
+
+
+def _ensure_built(conn):
+    """Build the index on first use so existing convoJson files show up"""
+    global _bootstrapped
+    if _bootstrapped:
+        return
+    with _build_lock:
+        # another request may have built it while this one waited
+        if _bootstrapped:
+            return
+        built = conn.execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+        if built is None:
+            rebuild_index()
+        _bootstrapped = True
+
+
+def get_totals():
+    conn = get_connection(readonly=True)
+    try:
+        _ensure_built(conn)
+        return dict(conn.execute("SELECT * FROM totals WHERE id = 1").fetchone())
+    finally:
+        conn.close()
+
+
+def get_latest_filename():
+    conn = get_connection(readonly=True)
+    try:
+        _ensure_built(conn)
+        row = conn.execute(
+            "SELECT filename FROM conversations ORDER BY mtime DESC, filename DESC LIMIT 1"
+        ).fetchone()
+        return row["filename"] if row else None
+    finally:
+        conn.close()
+
+
+def get_recent(n=10):
+    """Summaries and trailing turns of the n most recently written conversations"""
+    return list_conversations(limit=n)[0]
+
+
+def _read_conversation(filename, start=0):
+    """conversation[start:] of a call; the binary store reads only those turns"""
+    try:
+        return read_turns(os.path.join(CONVO_DIR, filename), start)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Warning: Could not read {filename}: {e}")
+        return []
+
+
+def list_conversations(limit=10, cursor=None, fields="tail", turns=TAIL_TURNS, since=None, until=None):
+    """One page of calls, newest written first, as (items, next_cursor).
+    fields: "summary" (index only), "tail" (summary plus the last `turns`
+    turns; read from the index up to TAIL_TURNS) or "full" (the whole
+    conversation, read from convoJson). since/until bound call_started (ISO).
+    next_cursor resumes after the last item; None on the last page."""
+    if fields not in FIELDS:
+        raise ValueError(f"fields must be one of {', '.join(FIELDS)}")
+    if turns < 0:
+        raise ValueError("turns must not be negative")
+    where, params = [], []
+    if cursor:
+        # keyset: the index seeks to this position, so page 100 costs what page 1 does
+        where.append("(mtime, filename) < (?, ?)")
+        params += decode_cursor(cursor, 2)
+    if since:
+        where.append("call_started >= ?")
+        params.append(since)
+    if until:
+        where.append("call_started < ?")
+        params.append(until)
+    columns = "filename, mtime, summary" + (", tail" if fields == "tail" and turns <= TAIL_TURNS else "")
+    conn = get_connection(readonly=True)
+    try:
+        _ensure_built(conn)
+        rows = conn.execute(
+            f"""SELECT {columns} FROM conversations {"WHERE " + " AND ".join(where) if where else ""}
+                ORDER BY mtime DESC, filename DESC LIMIT ?""",
+            (*params, limit + 1),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    items = []
+    for r in rows[:limit]:
+        item = {"summary": json.loads(r["summary"])}
+        if fields == "full":
+            item["conversation"] = _read_conversation(r["filename"])
+        elif fields == "tail":
+            if not turns:
+                item["conversation"] = []
+            elif "tail" in r.keys():
+                item["conversation"] = json.loads(r["tail"])[-turns:]
+            else:
+                item["conversation"] = _read_conversation(r["filename"], -turns)
+        items.append(item)
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor([last["mtime"], last["filename"]])
+    return items, next_cursor
+
+
+def get_concern_counts(limit=200, since=None, district=None):
+    """Most frequent canonical concerns as [(canonical, count, label)].
+    Unfiltered reads come straight from the incremental counters; `since`
+    (an ISO call_started lower bound) and `district` count over matching calls.
+    The label is concern_counts' either way, so filters never change it."""
+    conn = get_connection(readonly=True)
+    try:
+        _ensure_built(conn)
+        if since is None and district is None:
+            rows = conn.execute(
+                "SELECT canonical, count, label FROM concern_counts ORDER BY count DESC, canonical LIMIT ?",
+                (limit,),
+            ).fetchall()
+        else:
+            where, params = [], []
+            if since is not None:
+                where.append("c.call_started >= ?")
+                params.append(since)
+            if district is not None:
+                where.append("c.district = ? COLLATE NOCASE")
+                params.append(district)
+            rows = conn.execute(
+                f"""SELECT k.canonical, COUNT(*) AS count, l.label
+                    FROM concerns k JOIN conversations c ON c.filename = k.filename
+                    JOIN concern_counts l ON l.canonical = k.canonical
+                    WHERE {" AND ".join(where)}
+                    GROUP BY k.canonical ORDER BY count DESC, k.canonical LIMIT ?""",
+                (*params, limit),
+            ).fetchall()
+        return [(r["canonical"], r["count"], r["label"]) for r in rows]
+    finally:
+        conn.close()
+
+
+def get_district_version():
+    """Changes whenever any call is added to or removed from the district view"""
+    conn = get_connection(readonly=True)
+    try:
+        _ensure_built(conn)
+        return int(conn.execute("SELECT value FROM meta WHERE key = 'district_version'").fetchone()[0])
+    finally:
+        conn.close()
+
+
+def get_district_view(top=3):
+    """Live per-district rollup: (version, {district: {"calls", "top_concerns"}}),
+    top_concerns being [(label, count)] of the district's most frequent concerns"""
+    conn = get_connection(readonly=True)
+    try:
+        _ensure_built(conn)
+        # one read transaction, so the counts and the version agree
+        conn.execute("BEGIN")
+        version = int(conn.execute("SELECT value FROM meta WHERE key = 'district_version'").fetchone()[0])
+        view = {r["district"]: {"calls": r["calls"], "top_concerns": []}
+                for r in conn.execute("SELECT district, calls FROM district_calls")}
+        for r in conn.execute(
+            """SELECT d.district, COALESCE(l.label, d.label) AS label, d.count
+               FROM district_concerns d LEFT JOIN concern_counts l ON l.canonical = d.canonical
+               ORDER BY d.count DESC, d.canonical"""
+        ):
+            entry = view.setdefault(r["district"], {"calls": 0, "top_concerns": []})
+            if len(entry["top_concerns"]) < top:
+                entry["top_concerns"].append((r["label"], r["count"]))
+        conn.execute("COMMIT")
+        return version, view
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Maintain the convoJson summary index")
+    sub = cli.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="re-index every conversation from scratch")
+    check_cmd = sub.add_parser("check", help="compare the index with the convoJson directory")
+    check_cmd.add_argument("--fix", action="store_true", help="re-index inconsistent entries")
+    args = cli.parse_args()
+
+    if args.command == "rebuild":
+        rebuild_index()
+    else:
+        print(json.dumps(check_index(fix=args.fix), indent=2))
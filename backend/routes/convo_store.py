@@ -0,0 +1,240 @@
+import os
+import glob
+import mmap
+import zlib
+import struct
+import argparse
+
+from routes import jsoncodec
+from routes.fileio import atomic_write_bytes
+from routes.metrics import inc
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; zlib is always available
+    zstandard = None
+
+CONVO_DIR = os.path.join(os.path.dirname(__file__), "../convoJson")
+
+# Binary copies live in <convo dir>/_bin/<name>.cvb; the JSON stays canonical
+STORE_SUBDIR = "_bin"
+# Set CONVO_STORE_ENABLED=0 to stop writing binary copies at parse time
+ENABLED = os.getenv("CONVO_STORE_ENABLED", "1") != "0"
+# raw: records stored as is, a turn range is one slice of the file; zlib / zstd:
+# blocks of BLOCK_TURNS turns compressed together (a turn read inflates one block)
+CODEC = os.getenv("CONVO_STORE_CODEC", "raw")
+BLOCK_TURNS = int(os.getenv("CONVO_STORE_BLOCK_TURNS", "16"))
+
+MAGIC = b"CVB1"
+# magic, format version, codec, reserved, source mtime_ns, source size,
+# summary length, turn count, turns per compressed block (0 when raw)
+_HEADER = struct.Struct("<4sBBHQQIII")
+_OFFSET = struct.Struct("<Q")
+_CODECS = {"raw": 0, "zlib": 1, "zstd": 2}
+_CODEC_NAMES = {v: k for k, v in _CODECS.items()}
+
+
+def store_path(json_path):
+    directory, name = os.path.split(json_path)
+    return os.path.join(directory, STORE_SUBDIR, os.path.splitext(name)[0] + ".cvb")
+
+
+def _compress(codec, data):
+    if codec == "zlib":
+        return zlib.compress(data, 6)
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return data
+
+
+def _decompress(codec, data):
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd-compressed store but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def encode(data, source_stat=None, codec=CODEC):
+    """Binary form of a conversation: header, summary, turn offset table,
+    block offset table (compressed codecs only), then the turn records.
+    Each record is a turn's JSON followed by a comma, and the turn offsets
+    index the uncompressed record stream, so any range of turns is one
+    contiguous slice that decodes as a single JSON array."""
+    if codec == "zstd" and zstandard is None:
+        codec = "zlib"
+    if codec not in _CODECS:
+        raise ValueError(f"Unknown codec {codec!r}; use one of {', '.join(_CODECS)}")
+    summary = jsoncodec.dumps(data.get("summary") or {})
+    records = [jsoncodec.dumps(turn) + b"," for turn in data.get("conversation") or []]
+    turn_offsets = [0]
+    for record in records:
+        turn_offsets.append(turn_offsets[-1] + len(record))
+    per_block = 0
+    tables = [struct.pack(f"<{len(turn_offsets)}Q", *turn_offsets)]
+    blocks = records
+    if codec != "raw":
+        per_block = max(1, BLOCK_TURNS)
+        blocks = [_compress(codec, b"".join(records[i:i + per_block])) for i in range(0, len(records), per_block)]
+        block_offsets = [0]
+        for block in blocks:
+            block_offsets.append(block_offsets[-1] + len(block))
+        tables.append(struct.pack(f"<{len(block_offsets)}Q", *block_offsets))
+    header = _HEADER.pack(MAGIC, 1, _CODECS[codec], 0,
+                          source_stat.st_mtime_ns if source_stat else 0,
+                          source_stat.st_size if source_stat else 0,
+                          len(summary), len(records), per_block)
+    return b"".join([header, summary, *tables, *blocks])
+
+
+class StoredConversation:
+    """A memory-mapped .cvb file: the summary and any turn range are read
+    without decoding the rest"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, codec, _, self.source_mtime_ns, self.source_size,
+             summary_len, self.turn_count, self.block_turns) = _HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != 1 or codec not in _CODEC_NAMES:
+                raise ValueError(f"{path} is not a conversation store file")
+        except (ValueError, struct.error):
+            self._map.close()
+            raise
+        self.codec = _CODEC_NAMES[codec]
+        self._summary_start = _HEADER.size
+        self._turn_table = self._summary_start + summary_len
+        self._block_table = self._turn_table + 8 * (self.turn_count + 1)
+        self._data_start = self._block_table
+        if self.block_turns:
+            self._data_start += 8 * (-(-self.turn_count // self.block_turns) + 1)
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _offset(self, table, index):
+        return _OFFSET.unpack_from(self._map, table + 8 * index)[0]
+
+    @property
+    def summary(self):
+        return jsoncodec.loads(self._map[self._summary_start:self._turn_table])
+
+    def turns(self, start=0, stop=None):
+        """Turns [start:stop] with list slicing semantics (negative indexes count from the end)"""
+        start, stop, _ = slice(start, stop).indices(self.turn_count)
+        if start >= stop:
+            return []
+        begin, end = self._offset(self._turn_table, start), self._offset(self._turn_table, stop)
+        if not self.block_turns:
+            records = self._map[self._data_start + begin:self._data_start + end]
+        else:
+            first, last = start // self.block_turns, (stop - 1) // self.block_turns
+            chunks = []
+            for block in range(first, last + 1):
+                lo, hi = self._offset(self._block_table, block), self._offset(self._block_table, block + 1)
+                chunks.append(_decompress(self.codec, self._map[self._data_start + lo:self._data_start + hi]))
+            base = self._offset(self._turn_table, first * self.block_turns)
+            records = b"".join(chunks)[begin - base:end - base]
+        # drop the last record's trailing comma
+        return jsoncodec.loads(b"[" + records[:-1] + b"]")
+
+
+def open_stored(json_path):
+    """StoredConversation for json_path if its binary copy is current, else None.
+    A copy whose JSON was since rewritten is ignored; one whose JSON is gone is used."""
+    try:
+        stored = StoredConversation(store_path(json_path))
+    except (FileNotFoundError, ValueError, struct.error):
+        return None
+    try:
+        st = os.stat(json_path)
+    except FileNotFoundError:
+        return stored
+    if (st.st_mtime_ns, st.st_size) != (stored.source_mtime_ns, stored.source_size):
+        stored.close()
+        return None
+    return stored
+
+
+def _read_json(json_path):
+    inc("convo_store_reads_total", source="json")
+    with open(json_path, "rb") as f:
+        return jsoncodec.loads(f.read())
+
+
+def read_summary(json_path):
+    stored = open_stored(json_path)
+    if stored is None:
+        return _read_json(json_path).get("summary", {})
+    with stored:
+        inc("convo_store_reads_total", source="binary")
+        return stored.summary
+
+
+def read_turns(json_path, start=0, stop=None):
+    """conversation[start:stop] of a call, from the binary copy when current"""
+    stored = open_stored(json_path)
+    if stored is None:
+        return (_read_json(json_path).get("conversation") or [])[start:stop]
+    with stored:
+        inc("convo_store_reads_total", source="binary")
+        return stored.turns(start, stop)
+
+
+def read_conversation(json_path):
+    """{"summary", "conversation"} of a call, from the binary copy when current"""
+    stored = open_stored(json_path)
+    if stored is None:
+        return _read_json(json_path)
+    with stored:
+        inc("convo_store_reads_total", source="binary")
+        return {"summary": stored.summary, "conversation": stored.turns()}
+
+
+def store_conversation(json_path, parsed_json, codec=CODEC):
+    """Write the binary copy of a just-written convoJson file (a parser post-write stage)"""
+    atomic_write_bytes(store_path(json_path), encode(parsed_json, os.stat(json_path), codec))
+
+
+def convert_all(convo_dir=CONVO_DIR, codec=CODEC, force=False):
+    """Write binary copies for every convoJson file that lacks a current one"""
+    converted = skipped = failed = 0
+    for json_path in sorted(glob.glob(os.path.join(convo_dir, "*.json"))):
+        if os.path.basename(json_path).startswith("_"):
+            continue
+        stored = None if force else open_stored(json_path)
+        if stored is not None:
+            stored.close()
+            skipped += 1
+            continue
+        try:
+            with open(json_path, "rb") as f:
+                data = jsoncodec.loads(f.read())
+            if not isinstance(data, dict):
+                raise ValueError("not a conversation object")
+            store_conversation(json_path, data, codec)
+            converted += 1
+        except (ValueError, OSError) as e:
+            print(f"Warning: Could not convert {json_path}: {e}")
+            failed += 1
+    return {"converted": converted, "skipped": skipped, "failed": failed}
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Maintain binary copies of convoJson conversations")
+    sub = cli.add_subparsers(dest="command", required=True)
+    convert_cmd = sub.add_parser("convert", help="write .cvb copies of convoJson/*.json")
+    convert_cmd.add_argument("--codec", default=CODEC, choices=sorted(_CODECS))
+    convert_cmd.add_argument("--force", action="store_true", help="rewrite copies that are already current")
+    convert_cmd.add_argument("--dir", default=CONVO_DIR, help="conversation directory")
+    args = cli.parse_args()
+    print(convert_all(args.dir, args.codec, args.force))
@@ -0,0 +1,22 @@
+import json
+import base64
+
+
+def encode_cursor(values):
+    """Opaque pagination cursor for a list of JSON values (a keyset position)"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, length):
+    """Values of a cursor from encode_cursor; ValueError if it is not one of
+    ours, does not hold `length` values or holds anything but strings and
+    numbers (the only values a query can bind)"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError("Invalid cursor.")
+    if not all(isinstance(v, (str, int, float)) and not isinstance(v, bool) for v in values):
+        raise ValueError("Invalid cursor.")
+    return values
@@ -0,0 +1,49 @@
+import os
+import tempfile
+
+from routes import jsoncodec
+
+TMP_SUFFIX = ".partial"
+
+
+def atomic_write_bytes(path, data):
+    """Write to a temp file in the same directory and rename it into place,
+    so readers never see a half-written file even if the process dies."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".", suffix=TMP_SUFFIX)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_text(path, text, encoding="utf-8"):
+    atomic_write_bytes(path, text.encode(encoding))
+
+
+def atomic_write_json(path, obj, indent=2):
+    atomic_write_bytes(path, jsoncodec.dumps(obj, indent=indent))
+
+
+def remove_stale_partials(directory):
+    """Delete temp files left behind by a crashed writer"""
+    removed = 0
+    if not os.path.isdir(directory):
+        return removed
+    for fname in os.listdir(directory):
+        if fname.startswith(".") and fname.endswith(TMP_SUFFIX):
+            try:
+                os.unlink(os.path.join(directory, fname))
+                removed += 1
+            except OSError:
+                pass
+    return removed
@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import fcntl
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from flask import Blueprint, jsonify
+
+from routes.s3_downloader import download_logs
+from routes.parser import parse_all_logs, list_pending_logs, invalidate_parsed
+from routes.aggregates import store as aggregate_store
+from routes.sentiment_flow import get_sentiment_cache_stats
+from routes.search import check_index as check_search_index, ensure_built as ensure_search_built
+from routes.metrics import timer, inc
+
+bp_ingest = Blueprint('ingest', __name__)
+
+CONVO_DIR = os.path.join(os.path.dirname(__file__), "../convoJson")
+LOCK_PATH = os.path.join(CONVO_DIR, "_ingest.lock")
+STATUS_PATH = os.path.join(CONVO_DIR, "_ingest_status.json")
+
+# Seconds between background ingest runs inside the web process; 0 disables
+# the in-process scheduler (e.g. when `python -m routes.ingest --loop` runs separately)
+DEFAULT_INTERVAL = int(os.getenv("INGEST_INTERVAL_SECONDS", "60"))
+
+_thread_lock = threading.Lock()
+_scheduler_started = False
+
+
+def _read_status():
+    try:
+        with open(STATUS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"running": False, "last_run_started": None, "last_run_finished": None, "errors": {}}
+
+
+def _write_status(status):
+    os.makedirs(CONVO_DIR, exist_ok=True)
+    tmp_path = STATUS_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(status, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, STATUS_PATH)
+
+
+@contextmanager
+def ingest_lock(blocking=False):
+    """Hold the ingest lock (this process's thread lock plus a flock on
+    convoJson/_ingest.lock, shared with other processes); yields False
+    without holding it if another holder has it and blocking is off"""
+    if not _thread_lock.acquire(blocking=blocking):
+        yield False
+        return
+    try:
+        os.makedirs(CONVO_DIR, exist_ok=True)
+        with open(LOCK_PATH, "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        _thread_lock.release()
+
+
+def run_ingest():
+    """Sync from S3, parse new logs and index them.
+    Only one ingest runs at a time across threads and processes (see
+    ingest_lock); a call made while another run holds the lock returns None
+    immediately instead of waiting."""
+    with ingest_lock() as acquired:
+        if not acquired:
+            return None
+        return _run_locked()
+
+
+def _run_locked():
+    status = _read_status()
+    started = time.time()
+    status["running"] = True
+    status["last_run_started"] = datetime.now().isoformat()
+    _write_status(status)
+
+    results = {}
+    try:
+        # a first full build happens here, not in the first /search request
+        with timer("stage_seconds", stage="ingest.search_build"):
+            ensure_search_built()
+        with timer("stage_seconds", stage="ingest.s3_sync"):
+            status["last_sync"] = download_logs(on_changed=invalidate_parsed)
+        with timer("stage_seconds", stage="ingest.parse"):
+            results = parse_all_logs()
+        # new conversations are indexed as they are written; transcripts are
+        # dropped into transcripts/ by hand, so pick up any changes here
+        with timer("stage_seconds", stage="ingest.search_transcripts"):
+            check_search_index(fix=True, sources=("transcript",))
+        # newly indexed calls show up on the map without waiting for the next poll
+        aggregate_store.invalidate()
+    finally:
+        errors = status.get("errors", {})
+        for fname, result in results.items():
+            if result["status"] == "error":
+                errors[fname] = {"error": result.get("error"), "at": datetime.now().isoformat()}
+            else:
+                errors.pop(fname, None)
+            inc("ingest_files_total", outcome=result["status"])
+        status.update({
+            "running": False,
+            "last_run_finished": datetime.now().isoformat(),
+            "last_run_duration_seconds": round(time.time() - started, 2),
+            "last_run_parsed": sum(1 for r in results.values() if r["status"] == "parsed"),
+            "last_run_failed": sum(1 for r in results.values() if r["status"] == "error"),
+            "errors": errors,
+        })
+        _write_status(status)
+    return results
+
+
+def get_ingest_status():
+    status = _read_status()
+    status["queue_depth"] = len(list_pending_logs())
+    sentiment = get_sentiment_cache_stats()
+    status["sentiment_stage"] = {k: sentiment[k] for k in ("stage_workers", "in_flight", "computed", "failed")}
+    return status
+
+
+def _scheduler_loop(interval):
+    while True:
+        try:
+            run_ingest()
+        except Exception as e:
+            print(f"Ingest run failed: {e}")
+        time.sleep(interval)
+
+
+def start_ingest_scheduler(interval=DEFAULT_INTERVAL):
+    """Start the background ingest loop once per process"""
+    global _scheduler_started
+    if interval <= 0 or _scheduler_started:
+        return
+    _scheduler_started = True
+    threading.Thread(target=_scheduler_loop, args=(interval,), name="ingest-scheduler", daemon=True).start()
+
+
+@bp_ingest.route('/ingest/status', methods=['GET'])
+def ingest_status():
+    """Queue depth, last run times and per-file errors of the ingest worker"""
+    return jsonify(get_ingest_status())
+
+
+@bp_ingest.route('/ingest/run', methods=['POST'])
+def trigger_ingest():
+    """Kick off an ingest run in the background without waiting for it"""
+    threading.Thread(target=run_ingest, name="ingest-manual", daemon=True).start()
+    return jsonify({"accepted": True}), 202
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Sync, parse and index new call transcripts")
+    cli.add_argument("--loop", action="store_true", help="keep running every --interval seconds")
+    cli.add_argument("--interval", type=int, default=DEFAULT_INTERVAL or 60)
+    args = cli.parse_args()
+
+    if args.loop:
+        _scheduler_loop(args.interval)
+    else:
+        result = run_ingest()
+        if result is None:
+            print("Another ingest is already running")
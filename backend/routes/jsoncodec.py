@@ -0,0 +1,34 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder produces the same JSON, just slower
+    orjson = None
+
+
+def dumps(obj, indent=None, sort_keys=False, default=None):
+    """UTF-8 JSON bytes, via orjson when installed.
+    Non-ASCII text is written as-is (like ensure_ascii=False). orjson only
+    indents by 2, so any other indent goes through the stdlib."""
+    if orjson is not None and indent in (None, 2):
+        option = orjson.OPT_NON_STR_KEYS
+        if default is not None:
+            # as with the stdlib, a caller's default decides how these look
+            option |= orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if indent == 2:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except (orjson.JSONEncodeError, TypeError):
+            pass  # e.g. integers wider than 64 bits; the stdlib copes
+    separators = None if indent is not None else (",", ":")
+    return json.dumps(obj, indent=indent, sort_keys=sort_keys, default=default,
+                      ensure_ascii=False, separators=separators).encode("utf-8")
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
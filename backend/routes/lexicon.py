@@ -0,0 +1,171 @@
+import os
+import re
+import threading
+
+# One term per line: "<term>\t<weight>", where weight is + / - (±1) or a
+# number; "#" starts a comment. A trailing * makes the term a prefix
+# ("improv*" matches improve, improved, ...). Multi-word terms are allowed.
+LEXICON_PATH = os.getenv("SENTIMENT_LEXICON_PATH",
+                         os.path.join(os.path.dirname(__file__), "..", "sentiment_lexicon.tsv"))
+
+# Score moved per unit of net weight, around the neutral 5.0
+WEIGHT_STEP = 1.2
+
+# Python's \w leaves out Devanagari vowel signs and virama, so they are added
+# explicitly or "बिजल" would match inside "बिजली"
+_WORD_CHARS = r"\wऀ-ॿ"
+
+
+def load_lexicon(path=LEXICON_PATH):
+    """{term: weight} from a lexicon file; terms are lowercased"""
+    weights = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            parts = line.rsplit("\t", 1) if "\t" in line else line.rsplit(None, 1)
+            if len(parts) != 2:
+                raise ValueError(f"{path}:{line_no}: expected '<term>\\t<weight>'")
+            term, weight = parts[0].strip().lower(), parts[1].strip()
+            weights[" ".join(term.split())] = 1.0 if weight == "+" else -1.0 if weight == "-" else float(weight)
+    return weights
+
+
+def _trie_pattern(terms):
+    """Regex alternation for terms arranged as a trie, so the engine follows
+    one branch per character instead of trying every term at each position"""
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        end = node.get("") is True
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != ""]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:
+            # greedy: try the longer term first, fall back to the shorter one
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+class LexiconScorer:
+    """Lexical sentiment over a (possibly large) weighted term list.
+    All terms compile into one trie-shaped regex matched only at token
+    boundaries, so scoring is a single scan of the text whatever the lexicon
+    size. A term counts once per sentence however often it appears."""
+
+    def __init__(self, weights):
+        self.exact = {}
+        self.prefixes = {}
+        for term, weight in weights.items():
+            if term.endswith("*"):
+                self.prefixes[term[:-1]] = weight
+            else:
+                self.exact[term] = weight
+        exact = _trie_pattern(self.exact)
+        prefix = _trie_pattern(self.prefixes)
+        alternatives = ([f"(?P<exact>{exact})(?![{_WORD_CHARS}])"] if exact else []) + \
+                       ([f"(?P<prefix>{prefix})[{_WORD_CHARS}]*"] if prefix else [])
+        self._pattern = re.compile(f"(?<![{_WORD_CHARS}])(?:{'|'.join(alternatives)})") if alternatives else None
+        # multi-word terms are written with single spaces; texts are squeezed to match
+        self._spaces = re.compile(r"\s+")
+
+    @classmethod
+    def from_file(cls, path=LEXICON_PATH):
+        return cls(load_lexicon(path))
+
+    def __len__(self):
+        return len(self.exact) + len(self.prefixes)
+
+    def _prepare(self, text):
+        return self._spaces.sub(" ", (text or "").lower())
+
+    @staticmethod
+    def _to_score(net):
+        return max(0.0, min(10.0, 5.0 + net * WEIGHT_STEP))
+
+    def _nets(self, text, starts):
+        """Net weight per segment of text beginning at each offset in starts"""
+        nets = [0.0] * len(starts)
+        if self._pattern is None:
+            return nets
+        exact, prefixes = self.exact, self.prefixes
+        seen = set()
+        i, last = 0, len(starts) - 1
+        for m in self._pattern.finditer(text):
+            start = m.start()
+            if i < last and starts[i + 1] <= start:
+                while i < last and starts[i + 1] <= start:
+                    i += 1
+                seen.clear()
+            term = m.group(m.lastgroup)
+            if m.lastgroup == "exact":
+                if term in seen:
+                    continue
+                seen.add(term)
+                nets[i] += exact[term]
+            else:
+                if term + "*" in seen:
+                    continue
+                seen.add(term + "*")
+                nets[i] += prefixes[term]
+        return nets
+
+    def score(self, text):
+        """0-10 score for one sentence (5.0 when no term matches)"""
+        return self._to_score(self._nets(self._prepare(text), [0])[0])
+
+    def score_many(self, texts):
+        """Scores for a list of sentences in one scan over their concatenation"""
+        prepared = [self._prepare(t) for t in texts]
+        starts, offset = [], 0
+        for text in prepared:
+            starts.append(offset)
+            offset += len(text) + 1
+        if not prepared:
+            return []
+        # newline is never a word character, so no match spans two sentences
+        return [self._to_score(net) for net in self._nets("\n".join(prepared), starts)]
+
+    def score_conversations(self, conversations):
+        """Per-sentence scores for many conversations ([{"text": ...}, ...] each) at once"""
+        sizes = [len(c) for c in conversations]
+        flat = self.score_many([turn.get("text", "") for c in conversations for turn in c])
+        out, pos = [], 0
+        for size in sizes:
+            out.append(flat[pos:pos + size])
+            pos += size
+        return out
+
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def get_scorer(default_weights=None):
+    """Process-wide scorer over LEXICON_PATH, built on first use; falls back
+    to default_weights when the file is missing"""
+    global _scorer
+    with _scorer_lock:
+        if _scorer is None:
+            try:
+                _scorer = LexiconScorer.from_file()
+            except FileNotFoundError:
+                print(f"Sentiment lexicon {LEXICON_PATH} not found, using built-in terms")
+                _scorer = LexiconScorer(default_weights or {})
+        return _scorer
+
+
+def set_scorer(scorer):
+    """Swap the process-wide scorer (e.g. for a larger lexicon or a different model)"""
+    global _scorer
+    with _scorer_lock:
+        _scorer = scorer
@@ -0,0 +1,146 @@
+import os
+import threading
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from flask import jsonify
+
+from routes.profiling import follow
+
+# Seconds a client is told to wait before retrying a 202 / 503
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "2"))
+
+
+class EndpointLimit:
+    """At most max_concurrent requests inside an endpoint at once; a request
+    that cannot get in within queue_seconds is turned away"""
+
+    def __init__(self, name, max_concurrent, queue_seconds=0.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.queue_seconds = queue_seconds
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.counters = {"admitted": 0, "rejected": 0, "in_flight": 0}
+
+    def acquire(self):
+        if self.queue_seconds > 0:
+            admitted = self._slots.acquire(timeout=self.queue_seconds)
+        else:
+            admitted = self._slots.acquire(blocking=False)
+        if not admitted:
+            with self._lock:
+                self.counters["rejected"] += 1
+            return False
+        with self._lock:
+            self.counters["admitted"] += 1
+            self.counters["in_flight"] += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.counters["in_flight"] -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "max_concurrent": self.max_concurrent}
+
+
+class JobPool:
+    """Bounded pool for slow upstream work (LLM calls). Jobs are keyed: a
+    second request for a key whose job is still running waits on that job
+    instead of starting another. A request that gives up waiting leaves the
+    job running, so its result still lands in whatever cache it feeds."""
+
+    def __init__(self, name, max_workers):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=f"{name}-job")
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.counters = {"submitted": 0, "coalesced": 0, "timeouts": 0}
+
+    def submit(self, key, fn):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+                return future
+            # a profiled request's capture covers the job thread too
+            future = self._pool.submit(follow(fn))
+            self._inflight[key] = future
+            self.counters["submitted"] += 1
+        future.add_done_callback(lambda f: self._finished(key, f))
+        return future
+
+    def _finished(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def run(self, key, fn, timeout):
+        """(True, result) if the job for key finishes within timeout seconds,
+        else (False, None). Exceptions from fn propagate."""
+        future = self.submit(key, fn)
+        try:
+            return True, future.result(timeout=timeout)
+        except FutureTimeout:
+            with self._lock:
+                self.counters["timeouts"] += 1
+            return False, None
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "in_flight": len(self._inflight), "max_workers": self.max_workers}
+
+
+_limits = {}
+_pools = {}
+
+
+def limited(name, max_concurrent, queue_seconds=0.0):
+    """Route decorator: 503 with Retry-After once max_concurrent requests are
+    already being served by this endpoint"""
+    endpoint_limit = _limits[name] = EndpointLimit(name, max_concurrent, queue_seconds)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not endpoint_limit.acquire():
+                response = jsonify({"error": f"{name} is busy, retry shortly"})
+                response.status_code = 503
+                response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+                return response
+            try:
+                return view(*args, **kwargs)
+            finally:
+                endpoint_limit.release()
+        return wrapper
+    return decorator
+
+
+def endpoint_limit(name, max_concurrent, queue_seconds=0.0):
+    """An EndpointLimit reported with the others, for views that keep their
+    slot after returning (streams) and so cannot use @limited"""
+    limit = _limits[name] = EndpointLimit(name, max_concurrent, queue_seconds)
+    return limit
+
+
+def job_pool(name, max_workers):
+    pool = _pools[name] = JobPool(name, max_workers)
+    return pool
+
+
+def pending_response(**extra):
+    """202 for work that is still running; the client polls the same URL"""
+    response = jsonify({"pending": True, **extra})
+    response.status_code = 202
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response
+
+
+def get_limit_stats():
+    return {
+        "endpoints": {name: limit.stats() for name, limit in _limits.items()},
+        "jobs": {name: pool.stats() for name, pool in _pools.items()},
+    }
@@ -0,0 +1,304 @@
+import os
+import json
+import time
+import fcntl
+import queue
+import sqlite3
+import threading
+from flask import Blueprint, Response, request
+
+from routes.limits import endpoint_limit
+from routes.log_tokenizer import LogTokenizer
+from routes.parser import INPUT_FOLDER, OUTPUT_FOLDER, json_name_for
+
+bp_live = Blueprint('live', __name__)
+
+# Hidden (dot-files), so parse_all_logs / list_pending_logs never treat them as logs.
+# The database holds the tail offsets and the event log shared by every
+# worker process; the lock file elects the one process that tails.
+DB_PATH = os.path.join(INPUT_FOLDER, ".live_tail.sqlite3")
+LOCK_PATH = os.path.join(INPUT_FOLDER, ".live_tail.lock")
+# Written by earlier versions; imported once if the database has no state yet
+LEGACY_STATE_PATH = os.path.join(INPUT_FOLDER, ".tail_state.json")
+
+# Seconds between polls of processed_logs; 0 disables live tailing
+DEFAULT_INTERVAL = float(os.getenv("LIVE_TAIL_INTERVAL_SECONDS", "1"))
+HEARTBEAT_SECONDS = 15
+# Events a reconnecting client can resume from (Last-Event-ID), and events kept on disk
+REPLAY_EVENTS = 500
+RETAIN_EVENTS = int(os.getenv("LIVE_TAIL_RETAIN_EVENTS", "10000"))
+# Each open stream holds a server thread until the client goes away; like
+# /analyze and /sentiment_flow, streams get at most a quarter of them
+MAX_SUBSCRIBERS = int(os.getenv("LIVE_MAX_SUBSCRIBERS", max(1, int(os.getenv("GUNICORN_THREADS", "64")) // 4)))
+# Seconds a client turned away because the streams are full waits to reconnect
+FULL_RETRY_SECONDS = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+-- AUTOINCREMENT: ids are never reused after pruning, so they stay valid
+-- Last-Event-IDs across restarts and across worker processes
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event TEXT NOT NULL
+);
+"""
+
+
+def get_connection(db_path=DB_PATH, check_same_thread=True):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+class LogTailer:
+    """Parses only the bytes appended to each log since the last poll.
+    Per-file byte offsets and tokenizer state are saved in the same
+    transaction as the events they produced, so a restart resumes mid-call
+    without losing or repeating events. Only complete lines are consumed; a
+    partial line at the end of a file is left for the next poll. On first
+    start every existing log is taken as already seen (tailing begins at EOF)."""
+
+    def __init__(self, input_folder=INPUT_FOLDER, db_path=DB_PATH):
+        self.input_folder = input_folder
+        self.conn = get_connection(db_path)
+        self.files = self._load_state()
+
+    def _load_state(self):
+        row = self.conn.execute("SELECT value FROM state WHERE key = 'files'").fetchone()
+        if row is not None:
+            return json.loads(row[0])
+        try:
+            with open(LEGACY_STATE_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        files = {}
+        if os.path.isdir(self.input_folder):
+            for fname in os.listdir(self.input_folder):
+                path = os.path.join(self.input_folder, fname)
+                if not fname.startswith(".") and os.path.isfile(path):
+                    files[fname] = {"offset": os.path.getsize(path), "done": True, "turns": 0, "tokenizer": None}
+        self._commit([], files)
+        return files
+
+    def _commit(self, events, files):
+        with self.conn:
+            self.conn.executemany("INSERT INTO events (event) VALUES (?)",
+                                  [(json.dumps(e, ensure_ascii=False),) for e in events])
+            self.conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('files', ?)",
+                              (json.dumps(files, ensure_ascii=False),))
+            if events:
+                self.conn.execute("DELETE FROM events WHERE id <= (SELECT MAX(id) FROM events) - ?",
+                                  (RETAIN_EVENTS,))
+
+    def _new_entry(self, fname, size):
+        # Calls that were already parsed before we started watching are not replayed
+        if os.path.exists(os.path.join(OUTPUT_FOLDER, json_name_for(fname))):
+            return {"offset": size, "done": True, "turns": 0, "tokenizer": None}
+        return {"offset": 0, "done": False, "turns": 0, "tokenizer": LogTokenizer().to_state()}
+
+    def _read_new_lines(self, path, entry, size):
+        with open(path, "rb") as f:
+            f.seek(entry["offset"])
+            chunk = f.read(size - entry["offset"])
+        end = chunk.rfind(b"\n")
+        if end == -1:
+            return []
+        entry["offset"] += end + 1
+        return chunk[:end + 1].decode("utf-8", errors="replace").splitlines()
+
+    def poll(self):
+        """Consume appended bytes from every log and store the new events;
+        returns them"""
+        events = []
+        if not os.path.isdir(self.input_folder):
+            return events
+        changed = False
+        for fname in sorted(os.listdir(self.input_folder)):
+            path = os.path.join(self.input_folder, fname)
+            if fname.startswith(".") or not os.path.isfile(path):
+                continue
+            size = os.path.getsize(path)
+            entry = self.files.get(fname)
+            if entry is None or size < entry["offset"]:
+                # new file, or the log was rewritten from scratch (e.g. re-synced)
+                entry = self.files[fname] = self._new_entry(fname, size)
+                changed = True
+                if not entry["done"]:
+                    events.append({"type": "call_started", "file": fname})
+            if entry["done"] or size == entry["offset"]:
+                continue
+
+            tokenizer = LogTokenizer.from_state(entry["tokenizer"])
+            lines = self._read_new_lines(path, entry, size)
+            if not lines:
+                continue
+            changed = True
+            turns = []
+            for line in lines:
+                turns.extend(tokenizer.feed(line))
+            if tokenizer.call_end:
+                turns.extend(tokenizer.close())
+            for turn in turns:
+                events.append({"type": "turn", "file": fname, "index": entry["turns"], "turn": turn})
+                entry["turns"] += 1
+            if tokenizer.call_end:
+                entry["done"] = True
+                events.append({"type": "call_ended", "file": fname, "call_ended": tokenizer.call_end,
+                               "noise_count": tokenizer.noise_count})
+            entry["tokenizer"] = None if entry["done"] else tokenizer.to_state()
+
+        if changed:
+            try:
+                self._commit(events, self.files)
+            except sqlite3.Error:
+                # nothing was stored: rewind to the saved offsets and retry next poll
+                self.files = self._load_state()
+                raise
+        return events
+
+
+class EventHub:
+    """Fan-out of stored tail events to this process's SSE subscribers.
+    Every worker follows the events table, whichever process tails, and a
+    reconnecting client resumes from Last-Event-ID out of the same table."""
+
+    def __init__(self, db_path=DB_PATH, replay=REPLAY_EVENTS):
+        self.db_path = db_path
+        self.replay = replay
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._last_id = None
+        self._conn = None
+
+    def _execute(self, query, params=()):
+        # called with self._lock held, from the tail thread and request threads
+        if self._conn is None:
+            self._conn = get_connection(self.db_path, check_same_thread=False)
+        return self._conn.execute(query, params)
+
+    def _rows(self, query, params):
+        return [{**json.loads(event), "id": event_id} for event_id, event in self._execute(query, params)]
+
+    def catch_up(self):
+        """Publish events stored since the last call (the first call starts at the end)"""
+        with self._lock:
+            if self._last_id is None:
+                self._last_id = self._execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+                return
+            events = self._rows("SELECT id, event FROM events WHERE id > ? ORDER BY id", (self._last_id,))
+            if not events:
+                return
+            self._last_id = events[-1]["id"]
+            subscribers = list(self._subscribers)
+        for event in events:
+            for q in subscribers:
+                try:
+                    q.put_nowait(event)
+                except queue.Full:
+                    pass  # slow client; it can catch up via Last-Event-ID on reconnect
+
+    def subscribe(self, last_event_id=None):
+        q = queue.Queue(maxsize=1000)
+        with self._lock:
+            if last_event_id is not None and self._last_id is not None:
+                missed = self._rows(
+                    "SELECT id, event FROM events WHERE id > ? AND id <= ? ORDER BY id DESC LIMIT ?",
+                    (last_event_id, self._last_id, self.replay))
+                for event in reversed(missed):
+                    q.put_nowait(event)
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+
+hub = EventHub()
+_tail_started = False
+
+
+def _tail_loop(interval):
+    """Every process follows the event log; the one holding LOCK_PATH also
+    tails the logs. If that process exits its flock is released and another
+    worker takes over on its next poll."""
+    os.makedirs(INPUT_FOLDER, exist_ok=True)
+    lock_file = open(LOCK_PATH, "a")
+    tailer = None
+    while True:
+        try:
+            if tailer is None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    tailer = LogTailer()
+                except BlockingIOError:
+                    pass  # another process is tailing
+            if tailer is not None:
+                tailer.poll()
+            hub.catch_up()
+        except Exception as e:
+            print(f"Live tail poll failed: {e}")
+        time.sleep(interval)
+
+
+def start_live_tail(interval=DEFAULT_INTERVAL):
+    """Start the tail loop once per process"""
+    global _tail_started
+    if interval <= 0 or _tail_started:
+        return
+    _tail_started = True
+    hub.catch_up()  # events stored before this process started are not replayed as live
+    threading.Thread(target=_tail_loop, args=(interval,), name="live-tail", daemon=True).start()
+
+
+def _format_sse(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+_streams = endpoint_limit("live_stream", MAX_SUBSCRIBERS)
+
+
+@bp_live.route('/stream/calls', methods=['GET'])
+def stream_calls():
+    """Server-Sent Events feed of turns from in-progress calls. 503 (with a
+    retry: delay) once MAX_SUBSCRIBERS streams are open in this process."""
+    if not _streams.acquire():
+        return Response(f"retry: {FULL_RETRY_SECONDS * 1000}\n\n", status=503, mimetype='text/event-stream',
+                        headers={'Retry-After': str(FULL_RETRY_SECONDS), 'Cache-Control': 'no-cache'})
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    try:
+        q = hub.subscribe(last_event_id)
+    except BaseException:
+        _streams.release()
+        raise
+
+    def generate():
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                yield _format_sse(q.get(timeout=HEARTBEAT_SECONDS))
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+
+    def close():
+        # runs when the server closes the response, even if the body was never read
+        hub.unsubscribe(q)
+        _streams.release()
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    response.call_on_close(close)
+    return response
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(__file__), "../llm_cache.sqlite3"))
+MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024
+MAX_AGE_SECONDS = int(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30")) * 24 * 60 * 60
+MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+
+# Eviction is checked every this many stores rather than on each one
+_EVICT_EVERY = 50
+# last_access is only rewritten when it is older than this, so hits stay read-only
+_TOUCH_AFTER_SECONDS = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access);
+CREATE INDEX IF NOT EXISTS idx_responses_created ON responses (created);
+"""
+
+
+def make_key(model, prompt, **params):
+    """Content address of a request: hash of model, prompt and parameters"""
+    payload = json.dumps({"model": model, "prompt": prompt, "params": params},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """On-disk (SQLite) response store shared by every module that calls the
+    model, with an in-process LRU in front and size/age-based eviction."""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES, max_age_seconds=MAX_AGE_SECONDS,
+                 memory_entries=MEMORY_ENTRIES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stores_since_evict = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0,
+                         "upstream_calls": 0, "upstream_seconds": 0.0, "lookup_seconds": 0.0}
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, value, created):
+        if self.memory_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = (value, created)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def get(self, key):
+        started = time.perf_counter()
+        try:
+            with self._lock:
+                entry = self._memory.get(key)
+                if entry is not None:
+                    # Same age rule as disk hits, so a long-lived worker does
+                    # not keep serving what eviction already dropped
+                    if time.time() - entry[1] <= self.max_age_seconds:
+                        self._memory.move_to_end(key)
+                        self.counters["memory_hits"] += 1
+                        return entry[0]
+                    del self._memory[key]
+            conn = self._conn()
+            row = conn.execute("SELECT value, created, last_access FROM responses WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is None or now - row[1] > self.max_age_seconds:
+                self._count("misses")
+                return None
+            if now - row[2] > _TOUCH_AFTER_SECONDS:
+                with conn:
+                    conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._count("disk_hits")
+            self._remember(key, row[0], row[1])
+            return row[0]
+        finally:
+            self._count("lookup_seconds", time.perf_counter() - started)
+
+    def put(self, key, value, model=None):
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, value, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, value, len(value.encode("utf-8")), now, now),
+            )
+        self._remember(key, value, now)
+        with self._lock:
+            self.counters["stores"] += 1
+            self._stores_since_evict += 1
+            due = self._stores_since_evict >= _EVICT_EVERY
+            if due:
+                self._stores_since_evict = 0
+        if due:
+            self.evict()
+
+    def get_or_compute(self, key, compute, model=None):
+        """Return the cached text for key, or call compute() (the upstream
+        request) and store its result. Failures are not cached."""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        started = time.perf_counter()
+        value = compute()
+        self._count("upstream_calls")
+        self._count("upstream_seconds", time.perf_counter() - started)
+        if isinstance(value, str):
+            self.put(key, value, model=model)
+        return value
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        conn = self._conn()
+        removed = 0
+        with conn:
+            removed += conn.execute("DELETE FROM responses WHERE created < ?",
+                                    (time.time() - self.max_age_seconds,)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                freed = 0
+                doomed = []
+                for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+                    doomed.append((key,))
+                    freed += size
+                    if freed >= excess:
+                        break
+                conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+                removed += len(doomed)
+        if removed:
+            with self._lock:
+                self._memory.clear()
+                self.counters["evictions"] += removed
+        return removed
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM responses")
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            memory_size = len(self._memory)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        row = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            **counters,
+            "hit_rate": round((counters["memory_hits"] + counters["disk_hits"]) / lookups, 4) if lookups else None,
+            "avg_lookup_ms": round(counters["lookup_seconds"] * 1000 / lookups, 3) if lookups else None,
+            "avg_upstream_ms": round(counters["upstream_seconds"] * 1000 / counters["upstream_calls"], 1)
+            if counters["upstream_calls"] else None,
+            "memory_entries": memory_size,
+            "disk_entries": row[0],
+            "disk_bytes": row[1],
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
@@ -0,0 +1,116 @@
+import os
+import time
+import random
+import threading
+from dotenv import load_dotenv
+from routes.llm_cache import get_cache, make_key
+from routes.metrics import inc, mark_call_source, record_llm_call
+
+load_dotenv()
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+# Exception class names the Gemini SDK / google-api-core raise for throttling
+# and transient upstream trouble; these are retried with backoff.
+_RETRYABLE_ERRORS = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+                     "DeadlineExceeded", "InternalServerError"}
+
+
+def is_retryable(error):
+    if type(error).__name__ in _RETRYABLE_ERRORS:
+        return True
+    if getattr(error, "code", None) in (429, 500, 503):
+        return True
+    message = str(error)
+    return "429" in message or "rate limit" in message.lower() or "quota" in message.lower()
+
+
+def call_with_retry(fn, retries=4, base_delay=1.0, max_delay=30.0, site="unknown"):
+    """Call fn(), retrying rate-limit/transient errors with jittered exponential backoff"""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+            inc("llm_retries_total", site=site, error=type(e).__name__)
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            time.sleep(delay * (0.5 + random.random() / 2))
+            attempt += 1
+
+
+class GeminiClient:
+    """Thin wrapper over google.generativeai so callers (and test doubles)
+    only depend on generate(prompt, model) -> text"""
+
+    def __init__(self):
+        # Imported here so offline tooling can run with a fake client and no SDK
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self._genai = genai
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, name):
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = self._genai.GenerativeModel(name)
+            return self._models[name]
+
+    def generate(self, prompt, model=DEFAULT_MODEL, **params):
+        # params (temperature etc.) map onto the SDK's generation_config
+        return self._model(model).generate_content(prompt, generation_config=params or None).text
+
+
+class CachingClient:
+    """Serves identical (model, prompt, params) requests from the shared
+    LLM response cache and only forwards misses to the wrapped client"""
+
+    def __init__(self, inner, cache=None):
+        self.inner = inner
+        self.cache = cache or get_cache()
+
+    def generate(self, prompt, model=DEFAULT_MODEL, **params):
+        key = make_key(model, prompt, **params)
+        upstream = []
+
+        def compute():
+            upstream.append(True)
+            return self.inner.generate(prompt, model=model, **params)
+
+        value = self.cache.get_or_compute(key, compute, model=model)
+        mark_call_source("upstream" if upstream else "cache")
+        return value
+
+
+def generate(client, prompt, model=DEFAULT_MODEL, site="unknown", **params):
+    """client.generate with retries, timed and counted per (model, call site).
+    Every model call in the pipeline goes through here so /metrics can tell
+    the call sites apart."""
+    started = time.perf_counter()
+    try:
+        response = call_with_retry(lambda: client.generate(prompt, model=model, **params), site=site)
+    except Exception as e:
+        record_llm_call(model, site, time.perf_counter() - started, prompt, error=e)
+        raise
+    record_llm_call(model, site, time.perf_counter() - started, prompt, response)
+    return response
+
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = GeminiClient()
+        if os.getenv("LLM_CACHE_DISABLED") != "1":
+            _client = CachingClient(_client)
+    return _client
+
+
+def set_client(client):
+    """Swap the process-wide LLM client (e.g. for a fake in benchmarks)"""
+    global _client
+    _client = client
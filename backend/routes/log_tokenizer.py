@@ -0,0 +1,152 @@
+import os
+import re
+
+# Full pattern, only used when the fixed-offset fast path does not apply
+_LINE_RE = re.compile(r"\[(\d{2}):(\d{2}):(\d{2})\] (.+?): (.+)")
+
+_HEADERS = (
+    ("Call started at:", "call_start"),
+    ("Call ended at:", "call_end"),
+    ("Stream SID:", "stream_sid"),
+)
+
+# A gap longer than this between AI chunks starts a new AI turn
+AI_TURN_GAP_SECONDS = 2
+
+
+def _split_line(line):
+    """Return (seconds_of_day, hh:mm:ss, speaker, text) or None.
+    Lines look like `[20:32:19] AI (chunk): word`; the timestamp sits at a
+    fixed offset, so slicing + int() replaces regex + strptime per line."""
+    if len(line) > 13 and line[0] == "[" and line[9] == "]" and line[10] == " " \
+            and line[3] == ":" and line[6] == ":":
+        hh, mm, ss = line[1:3], line[4:6], line[7:9]
+        if (hh + mm + ss).isdigit():
+            sep = line.find(": ", 12)
+            if sep != -1 and sep + 2 < len(line):
+                return int(hh) * 3600 + int(mm) * 60 + int(ss), line[1:9], line[11:sep], line[sep + 2:]
+            return None
+    match = _LINE_RE.match(line)
+    if not match:
+        return None
+    hh, mm, ss, speaker, text = match.groups()
+    return int(hh) * 3600 + int(mm) * 60 + int(ss), f"{hh}:{mm}:{ss}", speaker, text
+
+
+class LogTokenizer:
+    """Streaming, LLM-free turn assembler for processed_logs files.
+    feed() takes one line at a time and returns the turns it completed;
+    close() flushes whatever turn is still open."""
+
+    def __init__(self):
+        self.call_start = None
+        self.call_end = None
+        self.stream_sid = None
+        self.noise_count = 0
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.lines = 0
+        self._date = ""
+        self._ai_chunks = []
+        self._ai_timestamp = None
+        self._user_chunks = []
+        self._user_timestamp = None
+        self._last_ai_seconds = None
+
+    def _flush_ai(self, out):
+        if self._ai_chunks:
+            out.append({"speaker": "ai", "text": " ".join(self._ai_chunks), "timestamp": self._ai_timestamp})
+            self._ai_chunks = []
+
+    def _flush_user(self, out):
+        if self._user_chunks:
+            out.append({"speaker": "user", "text": "".join(self._user_chunks), "timestamp": self._user_timestamp})
+            self._user_chunks = []
+
+    def feed(self, line):
+        self.lines += 1
+        out = []
+        line = line.strip()
+        if not line:
+            return out
+
+        if line[0] != "[":
+            for prefix, attr in _HEADERS:
+                if line.startswith(prefix):
+                    value = line[len(prefix):].strip()
+                    setattr(self, attr, value)
+                    if attr == "call_start":
+                        self._date = value.split("T")[0]
+                    return out
+
+        parsed = _split_line(line)
+        if parsed is None:
+            return out
+        seconds, clock, speaker_type, text = parsed
+        timestamp = f"{self._date}T{clock}" if self._date else clock
+
+        if "AI (chunk)" in speaker_type:
+            self._flush_user(out)
+            last = self._last_ai_seconds
+            # (t - last) % 1 day mirrors timedelta.seconds across midnight
+            if last is not None and (seconds - last) % 86400 > AI_TURN_GAP_SECONDS:
+                self._flush_ai(out)
+            if not self._ai_chunks:
+                self._ai_timestamp = timestamp
+            self._ai_chunks.append(text.strip())
+            if last is not None:
+                self.latency_sum += seconds - last
+                self.latency_count += 1
+            self._last_ai_seconds = seconds
+
+        elif "User" in speaker_type:
+            self._flush_ai(out)
+            user_text = text.strip()
+            if "<noise>" in user_text.lower():
+                self.noise_count += 1
+            if not self._user_chunks:
+                self._user_timestamp = timestamp
+            self._user_chunks.append(user_text)
+
+        return out
+
+    def to_state(self):
+        """JSON-serializable snapshot, so a tail can resume mid-call after a restart"""
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_state(cls, state):
+        tokenizer = cls()
+        tokenizer.__dict__.update(state)
+        return tokenizer
+
+    def close(self):
+        out = []
+        self._flush_ai(out)
+        self._flush_user(out)
+        return out
+
+
+def iter_turns(lines, tokenizer=None):
+    """Lazily yield completed turns from any iterable of lines"""
+    tokenizer = tokenizer or LogTokenizer()
+    for line in lines:
+        yield from tokenizer.feed(line)
+    yield from tokenizer.close()
+
+
+def tokenize_file(filepath):
+    """Assemble a whole log into turns + deterministic metrics, reading it lazily"""
+    tokenizer = LogTokenizer()
+    with open(filepath, "r", encoding="utf-8") as f:
+        sentences = list(iter_turns(f, tokenizer))
+    return {
+        "filename": os.path.basename(filepath),
+        "call_start": tokenizer.call_start,
+        "call_end": tokenizer.call_end,
+        "stream_sid": tokenizer.stream_sid,
+        "sentences": sentences,
+        "latency_sum": tokenizer.latency_sum,
+        "latency_count": tokenizer.latency_count,
+        "noise_count": tokenizer.noise_count,
+    }
@@ -0,0 +1,377 @@
+import os
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from flask import Blueprint, Response, jsonify, request, g
+
+from routes.fileio import atomic_write_json
+
+bp_metrics = Blueprint('metrics', __name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Set METRICS_DISABLED=1 to make every record call a no-op
+ENABLED = os.getenv("METRICS_DISABLED") != "1"
+
+# Numbers are kept per process. Under gunicorn (gunicorn.conf.py sets
+# METRICS_DIR) each worker also writes a snapshot to METRICS_DIR every
+# FLUSH_SECONDS and on scrape, and /metrics merges them: counters and
+# histograms are summed over every worker since the server started (exited
+# ones included, so totals never go backwards); collector gauges are per
+# live worker, labelled worker="<pid>". Without METRICS_DIR (flask dev
+# server, scripts) /metrics reports this process alone.
+SHARED_DIR = os.getenv("METRICS_DIR") or None
+FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+HELP = {
+    "stage_seconds": "Duration of a pipeline stage",
+    "llm_call_seconds": "Duration of a model call as seen by its caller (cache hits included)",
+    "llm_calls_total": "Model calls by outcome and source (upstream or cache)",
+    "llm_prompt_chars_total": "Prompt characters sent, by source",
+    "llm_response_chars_total": "Response characters received, by source",
+    "llm_prompt_tokens_total": "Estimated prompt tokens sent upstream",
+    "llm_response_tokens_total": "Estimated response tokens received from upstream",
+    "llm_retries_total": "Retried model calls (rate limits, transient errors)",
+    "http_request_seconds": "Request latency by route, method and status",
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_collectors = {}
+_call_source = threading.local()
+_flusher_pid = None
+# (pid, snapshot file) of this process; reset after a fork
+_snapshot_file = (None, None)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, seconds, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {"buckets": [0] * (len(BUCKETS) + 1), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+                break
+        else:
+            hist["buckets"][-1] += 1
+        hist["sum"] += seconds
+        hist["count"] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    """Observe the duration of the block under name; an exception adds error=<type>"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        labels["error"] = type(e).__name__
+        raise
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def timed_stage(stage, seconds):
+    observe("stage_seconds", seconds, stage=stage)
+
+
+def register_collector(prefix, fn):
+    """fn() -> flat {name: number}, exported as gauges <prefix>_<name> on each scrape"""
+    _collectors[prefix] = fn
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for Latin text, ~1 per Devanagari character
+    return len((text or "").encode("utf-8")) // 4 + 1
+
+
+def mark_call_source(source):
+    """Called by the LLM client layer: 'cache' or 'upstream' for the call in flight on this thread"""
+    _call_source.value = source
+
+
+def record_llm_call(model, site, seconds, prompt, response=None, error=None, source=None):
+    """One model call from a caller's point of view"""
+    source = source or getattr(_call_source, "value", None) or "upstream"
+    _call_source.value = None
+    outcome = "error" if error is not None else "ok"
+    observe("llm_call_seconds", seconds, model=model, site=site, source=source)
+    inc("llm_calls_total", model=model, site=site, source=source, outcome=outcome)
+    inc("llm_prompt_chars_total", len(prompt or ""), model=model, site=site, source=source)
+    if response is not None:
+        inc("llm_response_chars_total", len(response), model=model, site=site, source=source)
+    if source == "upstream":
+        inc("llm_prompt_tokens_total", estimate_tokens(prompt), model=model, site=site)
+        if response is not None:
+            inc("llm_response_tokens_total", estimate_tokens(response), model=model, site=site)
+
+
+def _quantile(hist, q):
+    """Estimate from bucket counts, interpolating inside the bucket"""
+    if not hist["count"]:
+        return None
+    rank, seen, lower = q * hist["count"], 0, 0.0
+    for i, count in enumerate(hist["buckets"]):
+        upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+        if seen + count >= rank and count:
+            return round(lower + (upper - lower) * (rank - seen) / count, 4)
+        seen += count
+        lower = upper
+    return BUCKETS[-1]
+
+
+def _local_snapshot():
+    """This process's counters, histograms and collector gauges"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: {"buckets": list(v["buckets"]), "sum": v["sum"], "count": v["count"]}
+                      for k, v in _histograms.items()}
+    gauges = {}
+    for prefix, fn in list(_collectors.items()):
+        try:
+            values = fn()
+        except Exception as e:
+            print(f"Metrics collector {prefix} failed: {e}")
+            continue
+        for name, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauges[(f"{prefix}_{name}", ())] = value
+    return counters, histograms, gauges
+
+
+def _own_snapshot_path():
+    global _snapshot_file
+    pid = os.getpid()
+    if _snapshot_file[0] != pid:
+        # pid plus start time: a later process reusing the pid gets its own file
+        _snapshot_file = (pid, os.path.join(SHARED_DIR, f"{pid}-{int(time.time() * 1000)}.json"))
+    return _snapshot_file[1]
+
+
+def flush():
+    """Write this process's snapshot to METRICS_DIR for the other workers' scrapes"""
+    if SHARED_DIR is None:
+        return
+    counters, histograms, gauges = _local_snapshot()
+    atomic_write_json(_own_snapshot_path(), {
+        "pid": os.getpid(),
+        "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+        "histograms": [[name, labels, hist] for (name, labels), hist in histograms.items()],
+        "gauges": [[name, value] for (name, _), value in gauges.items()],
+    }, indent=None)
+
+
+def _flush_quietly():
+    try:
+        flush()
+    except OSError as e:
+        print(f"Could not write metrics snapshot: {e}")
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _labels_key(labels):
+    return tuple(tuple(pair) for pair in labels)
+
+
+def _shared_snapshot():
+    """Every worker's snapshot in METRICS_DIR, merged"""
+    _flush_quietly()
+    counters, histograms, gauges = {}, {}, {}
+    try:
+        names = [n for n in os.listdir(SHARED_DIR) if n.endswith(".json")]
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        try:
+            with open(os.path.join(SHARED_DIR, name), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        for metric, labels, value in data["counters"]:
+            key = (metric, _labels_key(labels))
+            counters[key] = counters.get(key, 0) + value
+        for metric, labels, hist in data["histograms"]:
+            key = (metric, _labels_key(labels))
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = hist
+                continue
+            merged["buckets"] = [a + b for a, b in zip(merged["buckets"], hist["buckets"])]
+            merged["sum"] += hist["sum"]
+            merged["count"] += hist["count"]
+        if _alive(data["pid"]):
+            for metric, value in data["gauges"]:
+                gauges[(metric, (("worker", str(data["pid"])),))] = value
+    return counters, histograms, gauges
+
+
+def _snapshot():
+    if SHARED_DIR is None:
+        return _local_snapshot()
+    return _shared_snapshot()
+
+
+def _labels_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+
+    def escape(value):
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format"""
+    counters, histograms, gauges = _snapshot()
+    lines = []
+
+    def header(name, kind):
+        if name in HELP:
+            lines.append(f"# HELP {name} {HELP[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for name in sorted({k[0] for k in counters}):
+        header(name, "counter")
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{name}{_labels_text(labels)} {value}")
+    for name in sorted({k[0] for k in histograms}):
+        header(name, "histogram")
+        for (n, labels), hist in sorted(histograms.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            for i, count in enumerate(hist["buckets"]):
+                cumulative += count
+                le = str(BUCKETS[i]) if i < len(BUCKETS) else "+Inf"
+                lines.append(f"{name}_bucket{_labels_text(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{_labels_text(labels)} {round(hist['sum'], 6)}")
+            lines.append(f"{name}_count{_labels_text(labels)} {hist['count']}")
+    for name in sorted({k[0] for k in gauges}):
+        lines.append(f"# TYPE {name} gauge")
+        for (n, labels), value in sorted(gauges.items()):
+            if n == name:
+                lines.append(f"{name}{_labels_text(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    """JSON-friendly view: per-series count/avg/p50/p95 and where model time goes"""
+    counters, histograms, gauges = _snapshot()
+    timings = {}
+    for (name, labels), hist in sorted(histograms.items()):
+        timings.setdefault(name, []).append({
+            "labels": dict(labels),
+            "count": hist["count"],
+            "total_seconds": round(hist["sum"], 4),
+            "avg_seconds": round(hist["sum"] / hist["count"], 4) if hist["count"] else None,
+            "p50_seconds": _quantile(hist, 0.5),
+            "p95_seconds": _quantile(hist, 0.95),
+        })
+    counts = {}
+    for (name, labels), value in sorted(counters.items()):
+        counts.setdefault(name, []).append({"labels": dict(labels), "value": value})
+    gauge_values = {}
+    for (name, labels), value in sorted(gauges.items()):
+        gauge_values.setdefault(name, []).append({"labels": dict(labels), "value": value})
+
+    # Upstream model time per call site, largest first
+    by_site = {}
+    for (name, labels), hist in histograms.items():
+        labels = dict(labels)
+        if name == "llm_call_seconds" and labels.get("source") == "upstream":
+            site = by_site.setdefault((labels.get("site"), labels.get("model")), {"calls": 0, "seconds": 0.0})
+            site["calls"] += hist["count"]
+            site["seconds"] += hist["sum"]
+    total = sum(s["seconds"] for s in by_site.values())
+    llm_time = [{"site": site, "model": model, "calls": s["calls"], "seconds": round(s["seconds"], 3),
+                 "share": round(s["seconds"] / total, 4) if total else None}
+                for (site, model), s in sorted(by_site.items(), key=lambda x: -x[1]["seconds"])]
+    return {"timings": timings, "counters": counts, "gauges": gauge_values, "llm_time_by_site": llm_time}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _start_request_timer():
+    g._metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = getattr(g, "_metrics_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        observe("http_request_seconds", time.perf_counter() - started,
+                route=route, method=request.method, status=response.status_code)
+    return response
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_SECONDS)
+        _flush_quietly()
+
+
+def start_flusher():
+    """Keep this process's snapshot in METRICS_DIR current; once per process"""
+    global _flusher_pid
+    if SHARED_DIR is None or _flusher_pid == os.getpid():
+        return
+    _flusher_pid = os.getpid()
+    os.makedirs(SHARED_DIR, exist_ok=True)
+    threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+    atexit.register(_flush_quietly)
+
+
+def init_app(app):
+    """Time every request by route template (not raw path, to keep label sets small)"""
+    if ENABLED:
+        app.before_request(_start_request_timer)
+        app.after_request(_record_request)
+        start_flusher()
+
+
+@bp_metrics.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@bp_metrics.route('/metrics/summary', methods=['GET'])
+def metrics_summary():
+    """Same data as /metrics, summarized as JSON"""
+    return jsonify(summary())
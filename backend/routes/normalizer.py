@@ -0,0 +1,88 @@
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from routes.llm_client import get_client, generate
+
+NORMALIZER_MODEL = "gemini-2.5-flash"
+
+# Turns per request; keeps each structured response well inside the output limit
+MAX_BATCH_TURNS = 25
+MAX_BATCH_CHARS = 6000
+MAX_WORKERS = 4
+
+_PROMPT = """Each item below is one thing a caller said on a phone call, in Hindi (Devanagari or Latin script).
+For every item, fix grammar and punctuation and then convert it to Latin-script Hindi.
+Return ONLY a JSON array with one object per input item, in the form
+[{{"i": <index from input>, "text": "<corrected latin hindi>"}}, ...]
+Keep every index from the input. No markdown, no explanation.
+
+Input:
+{items}
+"""
+
+
+def _batches(indexed_texts):
+    batch, chars = [], 0
+    for i, text in indexed_texts:
+        if batch and (len(batch) >= MAX_BATCH_TURNS or chars + len(text) > MAX_BATCH_CHARS):
+            yield batch
+            batch, chars = [], 0
+        batch.append((i, text))
+        chars += len(text)
+    if batch:
+        yield batch
+
+
+def _parse_indexed(text):
+    match = re.search(r"\[[\s\S]*\]", text)
+    items = json.loads(match.group(0) if match else text)
+    out = {}
+    for item in items:
+        if isinstance(item, dict) and isinstance(item.get("text"), str):
+            try:
+                out[int(item["i"])] = item["text"].strip()
+            except (KeyError, TypeError, ValueError):
+                continue
+    return out
+
+
+def _normalize_batch(client, batch):
+    items = json.dumps([{"i": i, "text": t} for i, t in batch], ensure_ascii=False)
+    try:
+        response = generate(client, _PROMPT.format(items=items), model=NORMALIZER_MODEL, site="parser.grammar_fix")
+        return _parse_indexed(response)
+    except Exception as e:
+        print(f"Normalization batch failed, keeping raw text: {e}")
+        return {}
+
+
+def normalize_user_turns(texts, client=None, max_workers=MAX_WORKERS):
+    """Grammar-fix and transliterate user turns in batched, indexed requests.
+    Batches run concurrently; any turn the model drops (or a failed batch)
+    falls back to its raw text, so the result always lines up with `texts`."""
+    client = client or get_client()
+    indexed = [(i, t) for i, t in enumerate(texts) if t and t.strip()]
+    if not indexed:
+        return list(texts)
+
+    batches = list(_batches(indexed))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as pool:
+        results = list(pool.map(lambda b: _normalize_batch(client, b), batches))
+
+    fixed = {}
+    for result in results:
+        fixed.update(result)
+    return [fixed.get(i) or text for i, text in enumerate(texts)]
+
+
+def normalize_calls(calls, client=None, max_workers=MAX_WORKERS):
+    """Normalize the user turns of several calls together (fewer, fuller batches).
+    `calls` is a list of turn-text lists; returns the same shape."""
+    flat = [text for texts in calls for text in texts]
+    fixed = normalize_user_turns(flat, client=client, max_workers=max_workers)
+    out, pos = [], 0
+    for texts in calls:
+        out.append(fixed[pos:pos + len(texts)])
+        pos += len(texts)
+    return out
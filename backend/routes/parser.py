@@ -1,14 +1,21 @@
 import os
 import re
 import json
+import time
+import argparse
 from datetime import datetime
-from statistics import mean
-from dotenv import load_dotenv
-import google.generativeai as genai
-import glob
-
-load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from routes.convo_index import index_conversation, get_recent
+from routes.llm_client import get_client, generate
+from routes.metrics import timer, timed_stage
+from routes.normalizer import normalize_user_turns
+from routes.log_tokenizer import tokenize_file
+from routes.fileio import atomic_write_json, remove_stale_partials
+from routes.sentiment_flow import invalidate_sentiment_flow, precompute_sentiment_flow, STAGE_WORKERS
+from routes.search import index_conversation_turns
+from routes.convo_store import store_conversation, ENABLED as STORE_ENABLED
+
+PARSER_MODEL = "gemini-2.5-flash"
 
 def strip_basic_markdown(text):
         text = re.sub(r'```[\s\S]*?```', '', text)  # Remove code blocks
@@ -19,94 +26,31 @@ def strip_basic_markdown(text):
         text = re.sub(r'^[#>]+\s*', '', text, flags=re.MULTILINE)  # Remove headers/quotes
         return text.strip()
     
-def parse_log_file(filepath):
-    gemini_model = genai.GenerativeModel("gemini-2.5-flash")
-    
-    with open(filepath, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    call_start, call_end, stream_sid = None, None, None
-    sentences = []
-    current_ai_sentence, current_user_sentence = [], []
-    last_timestamp, latencies = None, []
-    noise_count = 0
-
-    for line in lines:
-        line = line.strip()
-
-        if line.startswith("Call started at:"):
-            call_start = line.replace("Call started at:", "").strip()
-            continue
-        elif line.startswith("Call ended at:"):
-            call_end = line.replace("Call ended at:", "").strip()
-            continue
-        elif line.startswith("Stream SID:"):
-            stream_sid = line.replace("Stream SID:", "").strip()
-            continue
-
-        match = re.match(r"\[(\d{2}:\d{2}:\d{2})\] (.+?): (.+)", line)
-        if match:
-            timestamp_str, speaker_type, text = match.groups()
-            # Combine with call_start date to form a full timestamp
-            full_timestamp_str = f"{call_start.split('T')[0]}T{timestamp_str}"
-
-            timestamp = datetime.strptime(timestamp_str, "%H:%M:%S")
-
-            if "AI (chunk)" in speaker_type:
-                if current_user_sentence:
-                    # Apply grammar correction to every user message before appending
-                    user_text_raw = "".join(current_user_sentence)
-                    user_text_response = gemini_model.generate_content(f"Fix grammar and punctuations in the hindi text and then convert it to latin hindi, and then return just the text without any formatting or explanation: {user_text_raw}")
-                    cleaned_user_text = strip_basic_markdown(user_text_response.text)
-                    print(cleaned_user_text)
-                    sentences.append({"speaker": "user", "text": cleaned_user_text, "timestamp": last_user_timestamp})
-                    current_user_sentence = []
-
-                if last_timestamp and (timestamp - last_timestamp).seconds > 2:
-                    if current_ai_sentence:
-                        sentences.append({"speaker": "ai", "text": " ".join(current_ai_sentence), "timestamp": last_ai_timestamp})
-                        current_ai_sentence = []
-
-                if not current_ai_sentence:
-                    last_ai_timestamp = full_timestamp_str
-
-                current_ai_sentence.append(text.strip())
-                if last_timestamp:
-                    latencies.append((timestamp - last_timestamp).total_seconds())
-                last_timestamp = timestamp
-
-            elif "User" in speaker_type:
-                if current_ai_sentence:
-                    sentences.append({"speaker": "ai", "text": " ".join(current_ai_sentence), "timestamp": last_ai_timestamp})
-                    current_ai_sentence = []
-
-                user_text = text.strip()
-                if "<noise>" in user_text.lower():
-                    noise_count += 1
-
-                if not current_user_sentence:
-                    last_user_timestamp = full_timestamp_str
-
-                current_user_sentence.append(user_text)
-    
-    
-    
-    
-    if current_ai_sentence:
-        sentences.append({"speaker": "ai", "text": " ".join(current_ai_sentence), "timestamp": last_ai_timestamp})
+def collect_turns(filepath):
+    """Deterministic part of parsing: assemble chunks into turns and compute
+    latency/noise metrics. No LLM calls; a few ms per log."""
+    return tokenize_file(filepath)
+
+
+def analyze_turns(collected, client=None):
+    """LLM part of parsing: grammar-fix user turns and run the call analysis prompt"""
+    client = client or get_client()
+    sentences = collected["sentences"]
+    call_start, call_end = collected["call_start"], collected["call_end"]
 
-    if current_user_sentence:
-        user_text_raw = "".join(current_user_sentence)
-        user_text_response = gemini_model.generate_content(f"fix grammar and punctuations in the hindi text and return just the text without any formatting or explanation: {user_text_raw}")
-        cleaned_user_text = strip_basic_markdown(user_text_response.text)
-        print(cleaned_user_text)
-        sentences.append({"speaker": "user", "text": cleaned_user_text, "timestamp": last_user_timestamp})
+    # Grammar correction + transliteration for every user turn in batched requests
+    user_turns = [s for s in sentences if s["speaker"] == "user"]
+    with timer("stage_seconds", stage="parse.grammar_fix"):
+        fixed_texts = normalize_user_turns([s["text"] for s in user_turns], client=client)
+    for turn, fixed in zip(user_turns, fixed_texts):
+        turn["text"] = strip_basic_markdown(fixed)
 
     # Metrics
     start_dt = datetime.fromisoformat(call_start) if call_start else None
     end_dt = datetime.fromisoformat(call_end) if call_end else None
     duration = (end_dt - start_dt).total_seconds() if start_dt and end_dt else None
-    avg_latency = round(mean(latencies), 2) if latencies else None
+    latency_count = collected["latency_count"]
+    avg_latency = round(collected["latency_sum"] / latency_count, 2) if latency_count else None
 
     conversation_text = "\n".join(f"{s['speaker']}: {s['text']}" for s in sentences)
 
@@ -140,29 +84,29 @@ def parse_log_file(filepath):
     """
 
     try:
-        response = gemini_model.generate_content(prompt)
-        # print(response.text)
+        with timer("stage_seconds", stage="parse.summary"):
+            response_text = generate(client, prompt, model=PARSER_MODEL, site="parser.summary")
 
         # Extract JSON from inside the ```json ... ``` block
-        match = re.search(r"```json\s*(\{.*?\})\s*```", response.text, re.DOTALL)
+        match = re.search(r"```json\s*(\{.*?\})\s*```", response_text, re.DOTALL)
         if match:
             json_str = match.group(1)
             gemini_analysis = json.loads(json_str)
         else:
             # fallback if model didn’t wrap in ```json
-            gemini_analysis = json.loads(response.text.strip())
+            gemini_analysis = json.loads(response_text.strip())
     except Exception as e:
         gemini_analysis = {"error": str(e)}
 
 
     summary = {
-        "filename": os.path.basename(filepath),
-        "stream_sid": stream_sid,
+        "filename": collected["filename"],
+        "stream_sid": collected["stream_sid"],
         "call_started": call_start,
         "call_ended": call_end,
         "duration_seconds": duration,
         "average_ai_response_latency": avg_latency,
-        "noise_count": noise_count,
+        "noise_count": collected["noise_count"],
         "total_user_messages": len([s for s in sentences if s["speaker"] == "user"]),
         "total_ai_responses": len([s for s in sentences if s["speaker"] == "ai"]),
         **gemini_analysis
@@ -174,52 +118,191 @@ def parse_log_file(filepath):
         "conversation": sentences
     }
 
+
+def parse_log_file(filepath, client=None):
+    return analyze_turns(collect_turns(filepath), client=client)
+
 def get_last_n_conversations(n=10):
-    convo_dir = os.path.join(os.path.dirname(__file__), "../convoJson")
-    files = sorted(
-        glob.glob(os.path.join(convo_dir, "*.json")),
-        key=os.path.getmtime,
-        reverse=True
-    )[:n]
-
-    recent_logs = []
-    for file_path in files:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            recent_logs.append({
-                "summary": data.get("summary"),
-                "conversation": data.get("conversation")[-6:]  # optional: last 6 turns
-            })
-    return recent_logs
-
-
-def parse_all_logs():
-    input_folder = os.path.join(os.path.dirname(__file__), "../processed_logs")
-    output_folder = os.path.join(os.path.dirname(__file__), "../convoJson")
-    os.makedirs(output_folder, exist_ok=True)
-
-    for fname in os.listdir(input_folder):
+    """Summaries + last few turns of the n most recent calls, served from the index"""
+    return get_recent(n)
+
+
+INPUT_FOLDER = os.path.join(os.path.dirname(__file__), "../processed_logs")
+OUTPUT_FOLDER = os.path.join(os.path.dirname(__file__), "../convoJson")
+
+
+def json_name_for(fname):
+    """convoJson filename for a processed log - replace .txt, otherwise append .json"""
+    if fname.endswith(".txt"):
+        return fname.replace(".txt", ".json")
+    return fname + ".json"
+
+
+# A hidden marker next to a log whose content changed after it was parsed
+REPARSE_SUFFIX = ".reparse"
+
+
+def _reparse_marker(fname):
+    return os.path.join(INPUT_FOLDER, f".{fname}{REPARSE_SUFFIX}")
+
+
+def invalidate_parsed(log_path):
+    """Make a log pending again after its content changed (a newer S3 object).
+    Its convoJson stays, and is served as before, until the next
+    parse_all_logs atomically replaces it and clears the marker."""
+    fname = os.path.basename(log_path)
+    with open(_reparse_marker(fname), "w"):
+        pass
+    print(f"{fname} changed upstream; it will be parsed again")
+
+
+def _parsed(fname):
+    try:
+        os.unlink(_reparse_marker(fname))
+    except FileNotFoundError:
+        pass
+
+
+def list_pending_logs():
+    """Logs in processed_logs that have no convoJson output yet, or whose
+    output is from an earlier version of the log (see invalidate_parsed)"""
+    if not os.path.isdir(INPUT_FOLDER):
+        return []
+    pending = []
+    for fname in sorted(os.listdir(INPUT_FOLDER)):
         # Skip directories and hidden files
-        full_path = os.path.join(input_folder, fname)
+        full_path = os.path.join(INPUT_FOLDER, fname)
         if os.path.isfile(full_path) and not fname.startswith('.'):
-            # Generate JSON filename - if it has .txt extension, replace it, otherwise add .json
-            if fname.endswith(".txt"):
-                json_fname = fname.replace(".txt", ".json")
-            else:
-                json_fname = fname + ".json"
-            
-            json_path = os.path.join(output_folder, json_fname)
-            if not os.path.exists(json_path):
-                print(f"Parsing {fname}...")
-                try:
-                    parsed_json = parse_log_file(full_path)
-                    with open(json_path, "w", encoding="utf-8") as f:
-                        json.dump(parsed_json, f, indent=2, ensure_ascii=False)
-                    print(f"Successfully parsed {fname} -> {json_fname}")
-                except Exception as e:
-                    print(f"Error parsing {fname}: {e}")
-            else:
-                print(f"Skipping {fname}, JSON already exists.")
+            json_path = os.path.join(OUTPUT_FOLDER, json_name_for(fname))
+            if not os.path.exists(json_path) or os.path.exists(_reparse_marker(fname)):
+                pending.append((fname, full_path, json_path))
+    return pending
+
+
+# Parallelism for parse_all_logs: logs parsed at once, each on its own thread
+DEFAULT_WORKERS = int(os.getenv("PARSE_WORKERS", "1"))
+
+
+def _timed_collect(full_path):
+    started = time.perf_counter()
+    return collect_turns(full_path), time.perf_counter() - started
+
+
+def _timed_analyze(collected):
+    started = time.perf_counter()
+    return analyze_turns(collected), time.perf_counter() - started
+
+
+def _timed_parse(full_path):
+    collected, collect_seconds = _timed_collect(full_path)
+    parsed_json, llm_seconds = _timed_analyze(collected)
+    return parsed_json, collect_seconds, llm_seconds
+
+
+def _invalidate_sentiment(json_path, parsed_json):
+    # curves computed from an earlier version of this call are now stale
+    invalidate_sentiment_flow(os.path.basename(json_path))
+
+
+# Stages run on each conversation right after it is written and indexed, as
+# stage(json_path, parsed_json). They must be quick: slow work (like scoring
+# the sentiment flow) belongs on the stage's own background pool.
+POST_WRITE_STAGES = [store_conversation] if STORE_ENABLED else []
+POST_WRITE_STAGES += [
+    precompute_sentiment_flow if STAGE_WORKERS > 0 else _invalidate_sentiment,
+    index_conversation_turns,
+]
+
+
+def _write_conversation(json_path, parsed_json, collect_seconds=None, llm_seconds=None):
+    if collect_seconds is not None:
+        # recorded here, on the writing thread, for serial and parallel runs alike
+        timed_stage("parse.collect", collect_seconds)
+    if llm_seconds is not None:
+        timed_stage("parse.llm", llm_seconds)
+    # temp file + rename so a crash never leaves a half-written convoJson file
+    with timer("stage_seconds", stage="parse.write"):
+        atomic_write_json(json_path, parsed_json)
+    with timer("stage_seconds", stage="parse.index"):
+        index_conversation(json_path, parsed_json)
+    for stage in POST_WRITE_STAGES:
+        try:
+            with timer("stage_seconds", stage=f"post_write.{stage.__name__}"):
+                stage(json_path, parsed_json)
+        except Exception as e:
+            # the conversation itself is safely written; a failed stage must not undo that
+            print(f"Stage {stage.__name__} failed for {os.path.basename(json_path)}: {e}")
+
+
+def _parse_serial(pending, results):
+    for n, (fname, full_path, json_path) in enumerate(pending, start=1):
+        print(f"[{n}/{len(pending)}] Parsing {fname}...")
+        try:
+            collected, collect_seconds = _timed_collect(full_path)
+            parsed_json, llm_seconds = _timed_analyze(collected)
+            _write_conversation(json_path, parsed_json, collect_seconds, llm_seconds)
+            _parsed(fname)
+            results[fname] = {"status": "parsed", "collect_seconds": round(collect_seconds, 3),
+                              "llm_seconds": round(llm_seconds, 3)}
+            print(f"Successfully parsed {fname} -> {os.path.basename(json_path)} "
+                  f"(collect {collect_seconds:.2f}s, llm {llm_seconds:.2f}s)")
+        except Exception as e:
+            print(f"Error parsing {fname}: {e}")
+            results[fname] = {"status": "error", "error": str(e)}
+
+
+def _parse_parallel(pending, results, workers):
+    # Turn assembly takes milliseconds and the LLM stages wait on the network,
+    # so both run on threads; a spawned process pool cost more than it saved
+    # and re-imported the web app in every child.
+    total = len(pending)
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="parse") as pool:
+        futures = {pool.submit(_timed_parse, full_path): (fname, json_path)
+                   for fname, full_path, json_path in pending}
+        for future in as_completed(futures):
+            fname, json_path = futures[future]
+            done += 1
+            try:
+                parsed_json, collect_seconds, llm_seconds = future.result()
+                _write_conversation(json_path, parsed_json, collect_seconds, llm_seconds)
+                _parsed(fname)
+                results[fname] = {"status": "parsed", "collect_seconds": round(collect_seconds, 3),
+                                  "llm_seconds": round(llm_seconds, 3)}
+                print(f"[{done}/{total}] Parsed {fname} (collect {collect_seconds:.2f}s, llm {llm_seconds:.2f}s)")
+            except Exception as e:
+                print(f"[{done}/{total}] Error parsing {fname}: {e}")
+                results[fname] = {"status": "error", "error": str(e)}
+
+
+def parse_all_logs(workers=None):
+    """Parse every pending log into convoJson.
+    Safe to resume after a crash: outputs are written atomically, stale temp
+    files are cleared first, and files that already have JSON are skipped
+    unless marked for a re-parse.
+    Returns {fname: {"status": "parsed" | "error", ...timings / error}}."""
+    workers = workers or DEFAULT_WORKERS
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    remove_stale_partials(OUTPUT_FOLDER)
+
+    pending = list_pending_logs()
+    results = {}
+    if not pending:
+        return results
+
+    started = time.perf_counter()
+    if workers <= 1 or len(pending) == 1:
+        _parse_serial(pending, results)
+    else:
+        _parse_parallel(pending, results, workers)
+
+    parsed = sum(1 for r in results.values() if r["status"] == "parsed")
+    print(f"Parsed {parsed}/{len(pending)} logs in {time.perf_counter() - started:.2f}s with {workers} worker(s)")
+    return results
 
 if __name__ == "__main__":
-    parse_all_logs()
\ No newline at end of file
+    cli = argparse.ArgumentParser(description="Parse processed_logs into convoJson")
+    cli.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                     help="logs parsed at once, one thread each")
+    args = cli.parse_args()
+    parse_all_logs(workers=args.workers)
@@ -0,0 +1,346 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import hmac
+import uuid
+import pstats
+import cProfile
+import threading
+import contextvars
+from collections import Counter
+from flask import Blueprint, Response, jsonify, request, send_file, g
+
+from routes.fileio import atomic_write_json
+from routes.metrics import inc
+
+bp_profiling = Blueprint('profiling', __name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "../profiles"))
+# off: never; header: requests sending X-Profile: <PROFILE_TOKEN> get a
+# cProfile capture; all: every request does (staging only)
+PROFILE_MODE = os.getenv("PROFILE_REQUESTS", "header")
+# Required for header captures and for reading /profiles (Authorization:
+# Bearer <token>); without it both are off
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN") or None
+PROFILE_HEADER = "X-Profile"
+# Requests slower than this many ms keep a sampled profile; 0 turns sampling off
+SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "10")) / 1000
+# Profiles kept on disk; the oldest are deleted past this
+KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+MAX_STACK_DEPTH = 128
+
+_ID_RE = re.compile(r"^\d{13}-[0-9a-f]{8}$")
+_EXTENSIONS = {"cprofile": ".prof", "sampled": ".collapsed.txt"}
+
+# The capture of the request being served on this thread, if any
+_current = contextvars.ContextVar("profile_capture", default=None)
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame):
+    """Stack of frame as one 'outer;...;inner' line, the collapsed format
+    flamegraph.pl and speedscope read"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """One background thread that, while any thread is registered, records
+    the stacks of the registered threads every `interval` seconds. A request
+    and the job threads working for it share one Counter. The thread exits
+    when nothing is registered, so an idle process pays nothing."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, thread_id, counts=None):
+        counts = Counter() if counts is None else counts
+        with self._lock:
+            self._active[thread_id] = counts
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+        return counts
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._active.pop(thread_id, None)
+
+    def snapshot(self, counts):
+        """A copy of counts that job threads still being sampled cannot change"""
+        with self._lock:
+            return Counter(counts)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                targets = list(self._active.items())
+            frames = sys._current_frames()
+            stacks = [(counts, _collapse(frames[thread_id])) for thread_id, counts in targets
+                      if thread_id in frames]
+            del frames
+            with self._lock:
+                for counts, stack in stacks:
+                    counts[stack] += 1
+            time.sleep(self.interval)
+
+
+_sampler = StackSampler()
+
+
+def _prune():
+    for meta_path in sorted(p for p in os.listdir(PROFILE_DIR) if p.endswith(".json"))[:-KEEP or None]:
+        profile_id = meta_path[:-len(".json")]
+        for ext in (".json", *_EXTENSIONS.values()):
+            try:
+                os.unlink(os.path.join(PROFILE_DIR, profile_id + ext))
+            except FileNotFoundError:
+                pass
+
+
+def _store(kind, write, meta):
+    """Write one profile plus its metadata; returns the metadata"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+    write(os.path.join(PROFILE_DIR, profile_id + _EXTENSIONS[kind]))
+    meta = {**meta, "id": profile_id, "kind": kind, "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    atomic_write_json(os.path.join(PROFILE_DIR, profile_id + ".json"), meta, indent=None)
+    _prune()
+    inc("profiles_captured_total", kind=kind)
+    return meta
+
+
+def _write_collapsed(counts):
+    def write(path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in counts.most_common():
+                f.write(f"{stack} {count}\n")
+    return write
+
+
+def _write_cprofile(profilers):
+    def write(path):
+        stats = pstats.Stats(profilers[0])
+        if profilers[1:]:
+            stats.add(*profilers[1:])
+        stats.dump_stats(path)
+    return write
+
+
+class _Capture:
+    """A request being profiled plus the job threads it hands work to.
+    cProfile only sees the thread that enabled it, so each job thread runs
+    its own profiler and the request's profile merges the ones finished by
+    the time it is stored; a job still running then (the request answered
+    202) is stored as a profile of its own once it ends, with "parent" set
+    to the request's profile id. Sampled captures share one Counter between
+    the request and its jobs; samples taken after the request is stored
+    are dropped."""
+
+    def __init__(self, kind, profiler=None, samples=None):
+        self.kind = kind
+        self.profiler = profiler
+        self.samples = samples
+        self.job_profilers = []
+        self.meta = None
+        self.lock = threading.Lock()
+
+    def job_finished(self, profiler, duration_ms):
+        with self.lock:
+            if self.meta is None:
+                self.job_profilers.append(profiler)
+                return
+            meta = {**self.meta, "duration_ms": round(duration_ms, 1), "parent": self.meta["id"], "job": True}
+        try:
+            _store("cprofile", _write_cprofile([profiler]), meta)
+        except OSError as e:
+            print(f"Could not store job profile: {e}")
+
+
+def follow(fn):
+    """fn wrapped so that, when a job pool runs it on another thread, that
+    thread is profiled as part of the request submitting it. Returns fn
+    itself when the current request is not being profiled."""
+    capture = _current.get()
+    if capture is None:
+        return fn
+
+    def run(*args, **kwargs):
+        thread_id = threading.get_ident()
+        if capture.kind == "sampled":
+            _sampler.start(thread_id, capture.samples)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _sampler.stop(thread_id)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one profiler per process; run unprofiled
+            return fn(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            capture.job_finished(profiler, (time.perf_counter() - started) * 1000)
+    return run
+
+
+def _token_matches(value):
+    return PROFILE_TOKEN is not None and value is not None and hmac.compare_digest(value, PROFILE_TOKEN)
+
+
+def _wants_cprofile():
+    if PROFILE_MODE == "all":
+        return True
+    if PROFILE_MODE != "header":
+        return False
+    return _token_matches(request.headers.get(PROFILE_HEADER))
+
+
+def _request_meta(duration_ms):
+    return {
+        "method": request.method,
+        "path": request.full_path.rstrip("?"),
+        "route": request.url_rule.rule if request.url_rule is not None else None,
+        "duration_ms": round(duration_ms, 1),
+    }
+
+
+def _before_request():
+    if request.path.startswith("/profiles"):
+        return
+    capture = None
+    if _wants_cprofile():
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            capture = _Capture("cprofile", profiler=profiler)
+        except ValueError:
+            # only one profiler may run at a time (Python 3.12+); skip this one
+            pass
+    elif SLOW_MS > 0:
+        capture = _Capture("sampled", samples=_sampler.start(threading.get_ident()))
+    if capture is not None:
+        g._profile_capture = capture
+        g._profile_started = time.perf_counter()
+        _current.set(capture)
+
+
+def _after_request(response):
+    capture = g.pop("_profile_capture", None)
+    if capture is None:
+        return response
+    duration_ms = (time.perf_counter() - g.pop("_profile_started")) * 1000
+    _current.set(None)
+    try:
+        if capture.kind == "cprofile":
+            capture.profiler.disable()
+            with capture.lock:
+                capture.meta = _store("cprofile", _write_cprofile([capture.profiler, *capture.job_profilers]),
+                                      _request_meta(duration_ms))
+            response.headers["X-Profile-Id"] = capture.meta["id"]
+        else:
+            _sampler.stop(threading.get_ident())
+            samples = _sampler.snapshot(capture.samples)
+            if duration_ms >= SLOW_MS and samples:
+                with capture.lock:
+                    capture.meta = _store("sampled", _write_collapsed(samples), _request_meta(duration_ms))
+                response.headers["X-Profile-Id"] = capture.meta["id"]
+    except OSError as e:
+        print(f"Could not store profile: {e}")
+    return response
+
+
+def _teardown_request(error=None):
+    # after_request is skipped when a view raises; never leave a profiler running
+    _current.set(None)
+    capture = g.pop("_profile_capture", None)
+    if capture is None:
+        return
+    if capture.profiler is not None:
+        capture.profiler.disable()
+    else:
+        _sampler.stop(threading.get_ident())
+
+
+def init_app(app):
+    """Hook profiling into app; nothing is registered when it is switched off.
+    Header mode without PROFILE_TOKEN counts as off, so a client cannot start
+    captures on an unconfigured server."""
+    header_mode = PROFILE_MODE == "header" and PROFILE_TOKEN is not None
+    if PROFILE_MODE != "all" and not header_mode and SLOW_MS <= 0:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+
+def list_profiles():
+    try:
+        names = sorted((n for n in os.listdir(PROFILE_DIR) if n.endswith(".json")), reverse=True)
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        try:
+            with open(os.path.join(PROFILE_DIR, name), "r", encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+    return profiles
+
+
+@bp_profiling.before_request
+def _require_token():
+    """Profiles list request paths and internals; only PROFILE_TOKEN holders read them"""
+    if PROFILE_TOKEN is None:
+        return jsonify({"error": "Profiles are disabled; set PROFILE_TOKEN to read them."}), 403
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not _token_matches(token.strip()):
+        return jsonify({"error": "Profile token required."}), 401
+
+
+@bp_profiling.route('/profiles', methods=['GET'])
+def profiles_index():
+    """Recent captured profiles, newest first"""
+    return jsonify({"mode": PROFILE_MODE, "slow_ms": SLOW_MS, "keep": KEEP, "profiles": list_profiles()})
+
+
+@bp_profiling.route('/profiles/<profile_id>', methods=['GET'])
+def profile_download(profile_id):
+    """The raw profile (.prof for pstats/snakeviz, collapsed stacks for
+    flamegraphs); ?format=text renders a cProfile capture as a pstats table"""
+    if not _ID_RE.match(profile_id):
+        return jsonify({"error": "Profile not found."}), 404
+    for kind, ext in _EXTENSIONS.items():
+        path = os.path.join(PROFILE_DIR, profile_id + ext)
+        if os.path.exists(path):
+            break
+    else:
+        return jsonify({"error": "Profile not found."}), 404
+
+    if request.args.get("format") == "text" and kind == "cprofile":
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(60)
+        return Response(out.getvalue(), mimetype="text/plain")
+    mimetype = "application/octet-stream" if kind == "cprofile" else "text/plain"
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=profile_id + ext)
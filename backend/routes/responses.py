@@ -0,0 +1,123 @@
+import os
+import gzip
+import threading
+from collections import OrderedDict
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+from routes import jsoncodec
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Bodies smaller than this go out uncompressed; the headers would eat the gain
+MIN_COMPRESS_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Compressed bodies kept per (ETag, encoding) for responses that carry a strong ETag
+ENCODED_CACHE_ENTRIES = 256
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify through orjson (stdlib fallback), writing UTF-8 instead of
+    \\u escapes so Devanagari text is not tripled in size"""
+
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        if set(kwargs) - {"indent", "separators"}:
+            return super().dumps(obj, **kwargs)
+        return jsoncodec.dumps(obj, indent=kwargs.get("indent"), sort_keys=self.sort_keys,
+                               default=self.default).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return jsoncodec.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        body = jsoncodec.dumps(obj, indent=indent, sort_keys=self.sort_keys, default=self.default)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+def choose_encoding(accept_encodings):
+    """Best content coding we can produce for an Accept-Encoding header"""
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+_encoded = OrderedDict()
+_encoded_lock = threading.Lock()
+
+
+def _compress_cached(etag, body, encoding):
+    # A strong ETag names exactly one body, so its compressed form can be reused
+    key = (etag, encoding)
+    with _encoded_lock:
+        if key in _encoded:
+            _encoded.move_to_end(key)
+            return _encoded[key]
+    data = compress(body, encoding)
+    with _encoded_lock:
+        _encoded[key] = data
+        while len(_encoded) > ENCODED_CACHE_ENTRIES:
+            _encoded.popitem(last=False)
+    return data
+
+
+def matching_etag(etag):
+    """The variant of etag (plain or as compressed by compress_response) named
+    in the request's If-None-Match, or None"""
+    for candidate in (etag, f"{etag}-gzip", f"{etag}-br"):
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
+
+
+def compress_response(response):
+    """after_request hook: gzip/brotli JSON and text bodies above
+    MIN_COMPRESS_BYTES for clients that accept it. Streams (SSE) and
+    send_file responses are left alone."""
+    if response.direct_passthrough or response.is_streamed or "Content-Encoding" in response.headers:
+        return response
+    if response.status_code == 304:
+        response.vary.add("Accept-Encoding")  # may stand in for a compressed 200
+        return response
+    if response.status_code != 200 or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_BYTES:
+        return response
+
+    etag, weak = response.get_etag()
+    data = _compress_cached(etag, body, encoding) if etag and not weak else compress(body, encoding)
+    response.set_data(data)
+    response.headers["Content-Encoding"] = encoding
+    if etag:
+        # the compressed representation needs its own validator
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    return response
+
+
+def init_app(app):
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
@@ -1,23 +1,156 @@
-import subprocess
 import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def download_logs():
-    os.makedirs("processed_logs", exist_ok=True)
+import boto3
+from botocore import UNSIGNED
+from botocore.config import Config
+
+from routes.fileio import atomic_write_json
+from routes.metrics import inc, timer, timed_stage
+
+BUCKET = os.getenv("S3_BUCKET", "call-transcripts-01")
+PREFIX = os.getenv("S3_PREFIX", "transcripts/")
+LOCAL_DIR = os.path.join(os.path.dirname(__file__), "../processed_logs")
+# Hidden so the parser and live tail never treat it as a log
+MANIFEST_NAME = ".s3_manifest.json"
+MAX_WORKERS = int(os.getenv("S3_SYNC_WORKERS", "8"))
+CHUNK_SIZE = 256 * 1024
+
+
+def make_client(endpoint_url=None):
+    """Pooled S3 client; anonymous like the old `--no-sign-request` unless S3_SIGNED=1.
+    S3_ENDPOINT_URL points it at a local stand-in (moto server, MinIO)."""
+    config = Config(
+        max_pool_connections=MAX_WORKERS * 2,
+        retries={"max_attempts": 5, "mode": "adaptive"},
+        signature_version=None if os.getenv("S3_SIGNED") == "1" else UNSIGNED,
+    )
+    return boto3.client("s3", config=config, endpoint_url=endpoint_url or os.getenv("S3_ENDPOINT_URL"))
+
+
+def _load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _local_path(local_dir, prefix, key):
+    rel = key[len(prefix):] if key.startswith(prefix) else key
+    path = os.path.normpath(os.path.join(local_dir, rel))
+    # never write outside local_dir, whatever the key looks like
+    if not path.startswith(os.path.normpath(local_dir) + os.sep):
+        return None
+    return path
+
+
+def _download(client, bucket, key, path):
+    """Stream one object to a hidden temp file, then rename it into place"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.partial")
+    written = 0
+    with timer("stage_seconds", stage="s3.get_object"):
+        body = client.get_object(Bucket=bucket, Key=key)["Body"]
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in iter(lambda: body.read(CHUNK_SIZE), b""):
+                f.write(chunk)
+                written += len(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    finally:
+        body.close()
+    return written
+
+
+def sync_logs(client=None, bucket=BUCKET, prefix=PREFIX, local_dir=LOCAL_DIR, workers=MAX_WORKERS,
+              on_changed=None):
+    """Incrementally mirror s3://bucket/prefix into local_dir.
+    Keys whose ETag and LastModified match the persisted manifest (and whose
+    local file still exists) are skipped; the rest download concurrently.
+    on_changed(local_path) runs for each key whose ETag differs from the
+    manifest's once its new content is in place, before the manifest records
+    it, so a crash in between re-runs it next time.
+    Returns throughput metrics for the run."""
+    client = client or make_client()
+    os.makedirs(local_dir, exist_ok=True)
+    manifest_path = os.path.join(local_dir, MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+    started = time.perf_counter()
+
+    listed, to_fetch = 0, []
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            key = obj["Key"]
+            if key.endswith("/"):
+                continue
+            listed += 1
+            path = _local_path(local_dir, prefix, key)
+            if path is None:
+                continue
+            version = {"etag": obj.get("ETag"), "last_modified": str(obj.get("LastModified")), "size": obj.get("Size")}
+            known = manifest.get(key)
+            if known and known.get("etag") == version["etag"] \
+                    and known.get("last_modified") == version["last_modified"] and os.path.exists(path):
+                continue
+            changed = bool(known) and known.get("etag") != version["etag"]
+            to_fetch.append((key, path, version, changed))
+    list_seconds = time.perf_counter() - started
+    timed_stage("s3.list", list_seconds)
+
+    fetched, changed_keys, failed, total_bytes = 0, 0, {}, 0
+    if to_fetch:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(to_fetch)))) as pool:
+            futures = {pool.submit(_download, client, bucket, key, path): (key, path, version, changed)
+                       for key, path, version, changed in to_fetch}
+            for future in as_completed(futures):
+                key, path, version, changed = futures[future]
+                try:
+                    total_bytes += future.result()
+                    if changed:
+                        if on_changed is not None:
+                            on_changed(path)
+                        changed_keys += 1
+                    manifest[key] = version
+                    fetched += 1
+                    inc("s3_objects_total", outcome="fetched")
+                except Exception as e:
+                    failed[key] = str(e)
+                    inc("s3_objects_total", outcome="failed")
+        atomic_write_json(manifest_path, manifest, indent=None)
+
+    seconds = time.perf_counter() - started
+    inc("s3_bytes_total", total_bytes)
+    inc("s3_objects_total", listed - len(to_fetch), outcome="skipped")
+    return {
+        "listed_keys": listed,
+        "fetched_keys": fetched,
+        "changed_keys": changed_keys,
+        "skipped_keys": listed - len(to_fetch),
+        "failed_keys": failed,
+        "bytes": total_bytes,
+        "list_seconds": round(list_seconds, 3),
+        "seconds": round(seconds, 3),
+        "keys_per_second": round(fetched / seconds, 2) if seconds else 0,
+        "bytes_per_second": round(total_bytes / seconds, 2) if seconds else 0,
+    }
+
+
+def download_logs(on_changed=None):
     try:
-        result = subprocess.run([
-            "aws", "s3", "cp",
-            "s3://call-transcripts-01/transcripts/",
-            "./processed_logs/",
-            "--recursive", "--no-sign-request"
-        ], capture_output=True, text=True, timeout=30)
-        
-        if result.returncode == 0:
-            print("Successfully downloaded logs from S3")
-        else:
-            print(f"S3 download failed (but will continue with local files): {result.stderr}")
-    except subprocess.TimeoutExpired:
-        print("S3 download timed out (but will continue with local files)")
-    except FileNotFoundError:
-        print("AWS CLI not found (but will continue with local files)")
+        metrics = sync_logs(on_changed=on_changed)
+        print(f"S3 sync: {metrics['fetched_keys']} new/changed of {metrics['listed_keys']} keys, "
+              f"{metrics['bytes']} bytes in {metrics['seconds']}s")
+        if metrics["failed_keys"]:
+            print(f"S3 sync failed for {len(metrics['failed_keys'])} keys (will retry next run)")
+        return metrics
     except Exception as e:
         print(f"S3 download error (but will continue with local files): {e}")
+        return None
@@ -0,0 +1,605 @@
+import os
+import re
+import json
+import glob
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+from array import array
+from flask import Blueprint, jsonify, request
+
+from routes.convo_index import district_for
+from routes.cursors import encode_cursor, decode_cursor
+from routes.sentiment_flow import heuristic_scores
+from routes.transcripts import parse_transcript
+
+bp_search = Blueprint('search', __name__)
+
+CONVO_DIR = os.path.join(os.path.dirname(__file__), "../convoJson")
+TRANSCRIPT_DIR = os.path.join(os.path.dirname(__file__), "../transcripts")
+INDEX_PATH = os.path.join(CONVO_DIR, "_search.sqlite3")
+
+# Bumped whenever _SCHEMA changes shape; an older index is dropped and rebuilt
+SCHEMA_VERSION = 1
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Ranked queries score at most this many of the newest matching turns, so a
+# term found in half the corpus costs the same at 10k turns as at 10M
+RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "2000"))
+# bm25 depends on the whole corpus, so a window re-ranked for every page
+# would reorder as calls are indexed; its order is ranked once and stored,
+# and rank cursors page through that for this many seconds
+RANK_SNAPSHOT_SECONDS = int(os.getenv("SEARCH_RANK_SNAPSHOT_SECONDS", "3600"))
+# Retry-After for a 503 while the index is being built or is locked
+BUILDING_RETRY_SECONDS = 10
+
+# A turn's rowid is doc_id << TURN_BITS | position, so every document owns one
+# contiguous rowid range and re-indexing it is a range delete, not a scan
+TURN_BITS = 20
+
+SOURCES = ("convo", "transcript")
+SPEAKERS = ("user", "ai")
+SENTIMENTS = ("positive", "neutral", "negative")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    district TEXT,
+    call_started TEXT,
+    sentiment TEXT,
+    turns INTEGER NOT NULL,
+    UNIQUE (source, filename)
+);
+CREATE INDEX IF NOT EXISTS idx_documents_district ON documents (district COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_documents_call_started ON documents (call_started);
+
+-- One row per turn. Turn-level filters are single tokens in columns of their
+-- own, so they are one more posting list to intersect; call-level filters
+-- (district, sentiment, date) go through the documents table instead.
+CREATE VIRTUAL TABLE IF NOT EXISTS turns USING fts5(
+    text, speaker, turn_sentiment,
+    timestamp UNINDEXED,
+    prefix = '3',
+    tokenize = "unicode61 remove_diacritics 2 categories 'L* N* Co M*'"
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Kept apart from the index so storing a ranking never waits on an ingest write
+_SNAPSHOT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rank_snapshots (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    rowids BLOB NOT NULL,
+    scores BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rank_snapshots_created ON rank_snapshots (created);
+"""
+
+# bm25 weight per FTS column, in _SCHEMA order
+_RANK = "bm25(turns, 1.0, 0.0, 0.0)"
+
+# Set once this process has seen a finished build; until then /search answers 503
+_bootstrapped = False
+# Index paths whose schema this process has created or migrated
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+
+class IndexNotBuilt(Exception):
+    """The index has not been built yet (ingest builds it; see ensure_built)"""
+
+
+def _migrate(conn):
+    # derived data: an old layout is dropped and rebuilt on first use
+    if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+        return
+    for table in ("turns", "documents", "meta"):
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.executescript(_SCHEMA)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def get_connection(readonly=False):
+    """Connection to the index; the schema is set up once per process and
+    readonly connections never take the write lock (see convo_index)"""
+    if INDEX_PATH not in _schema_ready:
+        with _schema_lock:
+            if INDEX_PATH not in _schema_ready:
+                os.makedirs(CONVO_DIR, exist_ok=True)
+                conn = sqlite3.connect(INDEX_PATH, timeout=30)
+                try:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    _migrate(conn)
+                    conn.executescript(_SCHEMA)
+                finally:
+                    conn.close()
+                _schema_ready.add(INDEX_PATH)
+    conn = sqlite3.connect(INDEX_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if readonly:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+def _snapshot_path():
+    return os.path.splitext(INDEX_PATH)[0] + "_pages.sqlite3"
+
+
+def _snapshot_connection():
+    path = _snapshot_path()
+    if path not in _schema_ready:
+        with _schema_lock:
+            if path not in _schema_ready:
+                conn = sqlite3.connect(path, timeout=30)
+                try:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(_SNAPSHOT_SCHEMA)
+                finally:
+                    conn.close()
+                _schema_ready.add(path)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _save_ranking(ranked):
+    """Store a ranked window as (rowid, score) pairs; returns its id"""
+    snapshot_id = uuid.uuid4().hex
+    now = time.time()
+    conn = _snapshot_connection()
+    try:
+        with conn:
+            conn.execute("DELETE FROM rank_snapshots WHERE created < ?", (now - RANK_SNAPSHOT_SECONDS,))
+            conn.execute("INSERT INTO rank_snapshots (id, created, rowids, scores) VALUES (?, ?, ?, ?)",
+                         (snapshot_id, now, array("q", [r for r, _ in ranked]).tobytes(),
+                          array("d", [score for _, score in ranked]).tobytes()))
+    finally:
+        conn.close()
+    return snapshot_id
+
+
+def _load_ranking(snapshot_id):
+    conn = _snapshot_connection()
+    try:
+        row = conn.execute("SELECT rowids, scores FROM rank_snapshots WHERE id = ? AND created >= ?",
+                           (snapshot_id, time.time() - RANK_SNAPSHOT_SECONDS)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        raise ValueError("Cursor expired; run the search again.")
+    rowids, scores = array("q"), array("d")
+    rowids.frombytes(row[0])
+    scores.frombytes(row[1])
+    return list(zip(rowids, scores))
+
+
+def _sentiment_label(score):
+    return "positive" if score > 5.0 else "negative" if score < 5.0 else "neutral"
+
+
+def _convo_document(data, json_path):
+    if not isinstance(data, dict) or not isinstance(data.get("conversation"), list):
+        return None
+    summary = data.get("summary") if isinstance(data.get("summary"), dict) else {}
+    sentiment = summary.get("sentiment")
+    return {
+        "district": district_for(summary.get("filename") or json_path, summary),
+        "call_started": summary.get("call_started"),
+        "sentiment": sentiment.lower() if isinstance(sentiment, str) else None,
+        "turns": [t for t in data["conversation"] if isinstance(t, dict)],
+    }
+
+
+def _transcript_document(path):
+    with open(path, "r", encoding="utf-8") as f:
+        conversation = parse_transcript(f.read())
+    return {"district": district_for(path), "call_started": None, "sentiment": None, "turns": conversation}
+
+
+def _delete(conn, source, filename):
+    row = conn.execute("SELECT doc_id FROM documents WHERE source = ? AND filename = ?",
+                       (source, filename)).fetchone()
+    if row is None:
+        return
+    first = row["doc_id"] << TURN_BITS
+    conn.execute("DELETE FROM turns WHERE rowid BETWEEN ? AND ?", (first, first + (1 << TURN_BITS) - 1))
+    conn.execute("DELETE FROM documents WHERE doc_id = ?", (row["doc_id"],))
+
+
+def _insert(conn, source, filename, mtime, size, doc):
+    turns = doc["turns"][:1 << TURN_BITS]
+    doc_id = conn.execute(
+        """INSERT INTO documents (source, filename, mtime, size, district, call_started, sentiment, turns)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        (source, filename, mtime, size, doc["district"], doc["call_started"], doc["sentiment"], len(turns)),
+    ).lastrowid
+    texts = [str(t.get("text") or "") for t in turns]
+    first = doc_id << TURN_BITS
+    conn.executemany(
+        "INSERT INTO turns (rowid, text, speaker, turn_sentiment, timestamp) VALUES (?, ?, ?, ?, ?)",
+        [(first + i, text, t.get("speaker"), _sentiment_label(score), t.get("timestamp"))
+         for i, (t, text, score) in enumerate(zip(turns, texts, heuristic_scores(texts)))],
+    )
+
+
+def _replace(conn, source, path, doc):
+    filename = os.path.basename(path)
+    _delete(conn, source, filename)
+    if doc is not None:
+        st = os.stat(path)
+        _insert(conn, source, filename, st.st_mtime, st.st_size, doc)
+
+
+def index_conversation_turns(json_path, data=None):
+    """Add or refresh the turns of one convoJson file.
+    Runs as a parser post-write stage, so `data` is usually already parsed."""
+    if data is None:
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    conn = get_connection()
+    try:
+        with conn:
+            _replace(conn, "convo", json_path, _convo_document(data, json_path))
+    finally:
+        conn.close()
+
+
+def index_transcript(path):
+    conn = get_connection()
+    try:
+        with conn:
+            _replace(conn, "transcript", path, _transcript_document(path))
+    finally:
+        conn.close()
+
+
+def remove_document(source, filename):
+    conn = get_connection()
+    try:
+        with conn:
+            _delete(conn, source, os.path.basename(filename))
+    finally:
+        conn.close()
+
+
+def _list_files(source):
+    if source == "convo":
+        return [p for p in glob.glob(os.path.join(CONVO_DIR, "*.json"))
+                if not os.path.basename(p).startswith("_")]
+    return glob.glob(os.path.join(TRANSCRIPT_DIR, "*.txt"))
+
+
+def _read_document(source, path):
+    if source == "transcript":
+        return _transcript_document(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return _convo_document(json.load(f), path)
+
+
+def rebuild_index():
+    """Drop all entries and re-index every conversation and transcript"""
+    conn = get_connection()
+    indexed = 0
+    try:
+        with conn:
+            conn.execute("DELETE FROM turns")
+            conn.execute("DELETE FROM documents")
+            for source in SOURCES:
+                for path in _list_files(source):
+                    try:
+                        doc = _read_document(source, path)
+                    except (json.JSONDecodeError, OSError, UnicodeDecodeError):
+                        print(f"Warning: Could not read {path}")
+                        continue
+                    if doc is not None:
+                        _replace(conn, source, path, doc)
+                        indexed += 1
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+        conn.execute("INSERT INTO turns (turns) VALUES ('optimize')")
+    finally:
+        conn.close()
+    print(f"Search index: indexed {indexed} documents")
+    return indexed
+
+
+def check_index(fix=False, sources=SOURCES):
+    """Compare the index with the files on disk, per source.
+    Returns the missing, stale and orphaned filenames; with fix=True they
+    are re-indexed or removed."""
+    conn = get_connection(readonly=True)
+    try:
+        indexed = {(r["source"], r["filename"]): (r["mtime"], r["size"])
+                   for r in conn.execute("SELECT source, filename, mtime, size FROM documents")}
+    finally:
+        conn.close()
+
+    report = {}
+    for source in sources:
+        on_disk = {}
+        for path in _list_files(source):
+            st = os.stat(path)
+            on_disk[os.path.basename(path)] = (path, (st.st_mtime, st.st_size))
+        known = {f: v for (s, f), v in indexed.items() if s == source}
+        report[source] = {
+            "missing": sorted(f for f in on_disk if f not in known),
+            "stale": sorted(f for f in on_disk if f in known and known[f] != on_disk[f][1]),
+            "orphaned": sorted(f for f in known if f not in on_disk),
+        }
+        if fix:
+            for fname in report[source]["missing"] + report[source]["stale"]:
+                try:
+                    if source == "convo":
+                        index_conversation_turns(on_disk[fname][0])
+                    else:
+                        index_transcript(on_disk[fname][0])
+                except (json.JSONDecodeError, OSError, UnicodeDecodeError) as e:
+                    print(f"Warning: Could not index {fname}: {e}")
+            for fname in report[source]["orphaned"]:
+                remove_document(source, fname)
+    report["consistent"] = not any(v for r in report.values() for v in r.values())
+    return report
+
+
+def is_built(conn=None):
+    global _bootstrapped
+    if _bootstrapped:
+        return True
+    own = conn is None
+    conn = conn or get_connection(readonly=True)
+    try:
+        _bootstrapped = conn.execute("SELECT value FROM meta WHERE key = 'built'").fetchone() is not None
+    finally:
+        if own:
+            conn.close()
+    return _bootstrapped
+
+
+def ensure_built():
+    """Build the index if it never has been. A full build of a large corpus
+    takes a while, so it runs in ingest (under the ingest lock) or from the
+    CLI, never inside a request."""
+    if not is_built():
+        rebuild_index()
+
+
+_QUERY_WORD_RE = re.compile(r'"[^"]*"?|\S+')
+
+
+def _phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _text_query(q):
+    """User query -> FTS5 expression over the text column.
+    Words are ANDed; "quoted phrases", trailing-* prefixes and OR / NOT
+    between terms are understood; anything else is matched literally."""
+    parts, pending = [], None
+    for word in _QUERY_WORD_RE.findall(q):
+        if word in ("OR", "AND", "NOT"):
+            if word == "NOT" and not parts:
+                raise ValueError("NOT needs a term before it, e.g. khaad NOT urea.")
+            pending = word if parts else None
+            continue
+        prefix = word.endswith("*") and not word.startswith('"')
+        text = word.strip('"').rstrip("*")
+        if not any(ch.isalnum() for ch in text):
+            continue
+        if parts:
+            parts.append(pending or "AND")
+        parts.append(_phrase(text) + ("*" if prefix else ""))
+        pending = None
+    return " ".join(parts) or None
+
+
+def _match_expression(q, speaker=None, turn_sentiment=None):
+    text = _text_query(q or "")
+    if text is None:
+        raise ValueError("Provide a search query (q).")
+    clauses = [f"text : ({text})"]
+    if speaker:
+        if speaker not in SPEAKERS:
+            raise ValueError(f"speaker must be one of {', '.join(SPEAKERS)}")
+        clauses.append(f'speaker : "{speaker}"')
+    if turn_sentiment:
+        if turn_sentiment not in SENTIMENTS:
+            raise ValueError(f"turn_sentiment must be one of {', '.join(SENTIMENTS)}")
+        clauses.append(f'turn_sentiment : "{turn_sentiment}"')
+    return " AND ".join(clauses)
+
+
+def _document_filter(district=None, sentiment=None, source=None, since=None, until=None):
+    """SQL restricting turns to calls matching the call-level filters, or None.
+    Checked as a set lookup on the doc_id part of each matching rowid, which
+    costs far less than reading the turn row or another posting list."""
+    where, params = [], []
+    if district:
+        where.append("district = ? COLLATE NOCASE")
+        params.append(" ".join(district.replace("_", " ").split()))
+    if sentiment:
+        if sentiment not in SENTIMENTS:
+            raise ValueError(f"sentiment must be one of {', '.join(SENTIMENTS)}")
+        where.append("sentiment = ?")
+        params.append(sentiment)
+    if source:
+        if source not in SOURCES:
+            raise ValueError(f"source must be one of {', '.join(SOURCES)}")
+        where.append("source = ?")
+        params.append(source)
+    if since:
+        where.append("call_started >= ?")
+        params.append(since)
+    if until:
+        where.append("call_started < ?")
+        params.append(until)
+    if not where:
+        return None, []
+    return f"(rowid >> {TURN_BITS}) IN (SELECT doc_id FROM documents WHERE {' AND '.join(where)})", params
+
+
+def search(q="", speaker=None, district=None, sentiment=None, turn_sentiment=None, source=None,
+           since=None, until=None, sort="rank", limit=DEFAULT_LIMIT, cursor=None):
+    """Turn-level hits for q, best first (sort="rank") or most recently
+    indexed first (sort="recent"), as {"hits", "next_cursor"}.
+    speaker and turn_sentiment filter turns; district, sentiment, source and
+    since/until (ISO bounds on call_started) filter whole calls. Ranking
+    covers the newest RANK_WINDOW matches, ranked once: later pages come
+    from that stored order, so they neither skip nor repeat hits while new
+    calls are indexed (a hit whose call was re-indexed meanwhile is dropped).
+    next_cursor is None on the last page."""
+    if sort not in ("rank", "recent"):
+        raise ValueError("sort must be rank or recent")
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    match = _match_expression(q, speaker, turn_sentiment)
+    where, params = ["turns MATCH ?"], [match]
+    doc_filter, doc_params = _document_filter(district, sentiment, source, since, until)
+    if doc_filter:
+        where.append(doc_filter)
+        params += doc_params
+
+    conn = get_connection(readonly=True)
+    try:
+        if not is_built(conn):
+            raise IndexNotBuilt()
+        snapshot_id = None
+        if sort == "rank":
+            if cursor:
+                snapshot_id, offset = decode_cursor(cursor, 2)
+                if not isinstance(snapshot_id, str) or not isinstance(offset, int) or offset < 0:
+                    raise ValueError("Invalid cursor.")
+                ranked = _load_ranking(snapshot_id)
+            else:
+                # only the newest RANK_WINDOW matches are scored (FTS5 walks
+                # rowids in order), then ranked here
+                ranked = sorted(
+                    ((r["rowid"], r["score"]) for r in conn.execute(
+                        f"""SELECT rowid, {_RANK} AS score FROM turns WHERE {' AND '.join(where)}
+                            ORDER BY rowid DESC LIMIT ?""",
+                        (*params, RANK_WINDOW),
+                    )),
+                    key=lambda hit: (hit[1], hit[0]),
+                )
+                offset = 0
+            page = ranked[offset:offset + limit]
+            more = len(ranked) > offset + limit
+        else:
+            if cursor:
+                (before,) = decode_cursor(cursor, 1)
+                if not isinstance(before, int):
+                    raise ValueError("Invalid cursor.")
+                where.append("rowid < ?")
+                params.append(before)
+            page = [(r["rowid"], None) for r in conn.execute(
+                f"SELECT rowid FROM turns WHERE {' AND '.join(where)} ORDER BY rowid DESC LIMIT ?",
+                (*params, limit + 1),
+            )]
+            more = len(page) > limit
+            page = page[:limit]
+
+        # snippets and document fields only for the page
+        rowids = [rowid for rowid, _ in page]
+        details = {r["rowid"]: r for r in conn.execute(
+            f"""SELECT rowid, speaker, turn_sentiment, timestamp,
+                       snippet(turns, 0, '**', '**', '…', 16) AS snippet
+                FROM turns WHERE turns MATCH ? AND rowid IN ({','.join('?' * len(rowids))})""",
+            (match, *rowids),
+        )} if rowids else {}
+        doc_ids = sorted({rowid >> TURN_BITS for rowid in rowids})
+        docs = {r["doc_id"]: r for r in conn.execute(
+            f"SELECT * FROM documents WHERE doc_id IN ({','.join('?' * len(doc_ids))})", doc_ids)}
+    finally:
+        conn.close()
+
+    hits = []
+    for rowid, score in page:
+        turn, doc = details.get(rowid), docs.get(rowid >> TURN_BITS)
+        if turn is None or doc is None:
+            continue
+        hits.append({
+            "source": doc["source"],
+            "filename": doc["filename"],
+            "district": doc["district"],
+            "call_started": doc["call_started"],
+            "sentiment": doc["sentiment"],
+            "turn": rowid & ((1 << TURN_BITS) - 1),
+            "speaker": turn["speaker"],
+            "timestamp": turn["timestamp"],
+            "turn_sentiment": turn["turn_sentiment"],
+            "snippet": turn["snippet"],
+            # bm25 is negative, lower is better; flipped so higher is better
+            "score": round(-score, 4) if score is not None else None,
+        })
+    next_cursor = None
+    if more:
+        if sort == "rank":
+            next_cursor = encode_cursor([snapshot_id or _save_ranking(ranked), offset + limit])
+        else:
+            next_cursor = encode_cursor([page[-1][0]])
+    return {"hits": hits, "next_cursor": next_cursor}
+
+
+@bp_search.route('/search', methods=['GET'])
+def search_endpoint():
+    """Full-text search over conversation and transcript turns.
+    ?q=khaad OR urea&district=Bhagalpur&since=2025-08-01&speaker=user&limit=20&cursor=..."""
+    args = request.args
+    started = time.perf_counter()
+    try:
+        result = search(
+            q=args.get("q", ""),
+            speaker=args.get("speaker"),
+            district=args.get("district"),
+            sentiment=args.get("sentiment"),
+            turn_sentiment=args.get("turn_sentiment"),
+            source=args.get("source"),
+            since=args.get("since"),
+            until=args.get("until"),
+            sort=args.get("sort", "rank"),
+            limit=args.get("limit", DEFAULT_LIMIT, type=int),
+            cursor=args.get("cursor"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except IndexNotBuilt:
+        response = jsonify({"error": "The search index is still being built, retry shortly.", "status": "building"})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(BUILDING_RETRY_SECONDS)
+        return response
+    except sqlite3.OperationalError as e:
+        if "locked" in str(e) or "busy" in str(e):
+            response = jsonify({"error": "The search index is busy, retry shortly."})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(BUILDING_RETRY_SECONDS)
+            return response
+        return jsonify({"error": f"Could not run query: {e}"}), 400
+    result["took_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify(result)
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Maintain the full-text search index")
+    sub = cli.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="re-index every conversation and transcript from scratch "
+                                    "(waits for any running ingest)")
+    check_cmd = sub.add_parser("check", help="compare the index with convoJson and transcripts")
+    check_cmd.add_argument("--fix", action="store_true", help="re-index inconsistent entries")
+    args = cli.parse_args()
+
+    if args.command == "rebuild":
+        from routes.ingest import ingest_lock
+        with ingest_lock(blocking=True):
+            rebuild_index()
+    else:
+        print(json.dumps(check_index(fix=args.fix), indent=2))
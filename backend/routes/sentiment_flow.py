@@ -1,291 +1,493 @@
 import os
 import json
 import re
-from functools import lru_cache
+import fcntl
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from dotenv import load_dotenv
-import google.generativeai as genai
+from routes.llm_client import get_client, generate
+from routes.metrics import timer
+from routes.profiling import follow
+from routes.fileio import atomic_write_json
+from routes.convo_store import read_turns
+from routes.lexicon import get_scorer
 
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
 CONVO_DIR = os.path.join(os.path.dirname(__file__), "../convoJson")
 CACHE_DIR = os.path.join(CONVO_DIR, "_sentiment_cache")
 os.makedirs(CACHE_DIR, exist_ok=True)
 
 SENTIMENT_MODEL_NAME = "gemini-2.5-flash"
 
-# ...existing code...
-@lru_cache(maxsize=64)
-def _cached_sentiment_analysis(filename: str):
-    # Normalize filename to a convoJson json file name
-    try:
-        base = os.path.basename(filename or "").strip()
-        if base.endswith(".txt"):
-            base = base[:-4] + ".json"
-        elif not base.endswith(".json"):
-            base = base + ".json"
-        filename = base
-    except Exception:
-        pass
-
-    # Prepare disk cache path (fix: was previously undefined)
-    # Keep cache file name simple and safe
-    safe_name = re.sub(r"[^a-zA-Z0-9_.-]", "_", filename)
-    disk_cache_path = os.path.join(CACHE_DIR, f"{safe_name}.sentiment.json")
-
-    # Resolve transcript path and validate
-    filepath = os.path.join(CONVO_DIR, filename)
-    if not os.path.exists(filepath):
-        return {"error": "File not found"}
-
-    def robustify(parsed_obj, user_sentences_local, ai_sentences_local):
-        """Ensure both user & ai arrays exist, non-empty, and aligned in length.
-        If one side missing or empty, synthesize neutral baseline (5.0) matching other length.
-        If lengths differ, pad shorter with last running average (baseline 5)."""
-        if not isinstance(parsed_obj, dict):
-            return parsed_obj
-        parsed_obj.setdefault('user', [])
-        parsed_obj.setdefault('ai', [])
-        fallback_meta = parsed_obj.get('meta', {}) or {}
-        # Build baseline if one side empty but other has content
-        user_len = len(parsed_obj['user'])
-        ai_len = len(parsed_obj['ai'])
-        # Helper to compute running avg
-        def running_avg(series):
-            if not series: return 5.0
-            total = 0.0
-            for i, item in enumerate(series, start=1):
-                total += float(item.get('score', 5))
-            return total / len(series)
-        if user_len == 0 and ai_len > 0:
-            baseline = running_avg(parsed_obj['ai']) if ai_len else 5.0
-            parsed_obj['user'] = [{"index": i+1, "score": round(baseline,2)} for i in range(ai_len)]
-            fallback_meta['user_baseline_injected'] = True
-        if ai_len == 0 and user_len > 0:
-            baseline = running_avg(parsed_obj['user']) if user_len else 5.0
-            parsed_obj['ai'] = [{"index": i+1, "score": round(baseline,2)} for i in range(user_len)]
-            fallback_meta['ai_baseline_injected'] = True
-        # Recompute lengths after baseline injection
-        user_len = len(parsed_obj['user'])
-        ai_len = len(parsed_obj['ai'])
-        if user_len == 0 and ai_len == 0:
-            # Completely empty: synthesize single neutral point
-            parsed_obj['user'] = [{"index":1, "score":5.0}]
-            parsed_obj['ai'] = [{"index":1, "score":5.0}]
-            fallback_meta['both_baseline_injected'] = True
-        # Pad shorter side
-        user_len = len(parsed_obj['user'])
-        ai_len = len(parsed_obj['ai'])
-        if user_len != ai_len:
-            target = max(user_len, ai_len)
-            def pad(series):
-                if not series:
-                    last_avg = 5.0
-                else:
-                    total = 0.0
-                    for i, item in enumerate(series, start=1):
-                        total += float(item.get('score',5))
-                    last_avg = total / len(series)
-                start_idx = series[-1]['index'] + 1 if series else 1
-                for idx in range(start_idx, target+1):
-                    series.append({"index": idx, "score": round(last_avg,2)})
-            if user_len < target:
-                pad(parsed_obj['user'])
-                fallback_meta['user_padded'] = True
-            if ai_len < target:
-                pad(parsed_obj['ai'])
-                fallback_meta['ai_padded'] = True
-        # Ensure indices sequential starting at 1
-        for key in ['user','ai']:
-            parsed_obj[key].sort(key=lambda x: x.get('index', 0))
-            for i, item in enumerate(parsed_obj[key], start=1):
-                item['index'] = i
-        parsed_obj['meta'] = {**parsed_obj.get('meta', {}), **fallback_meta}
-        return parsed_obj
+# Curves kept in memory (small: two float lists per call)
+MEMORY_ENTRIES = int(os.getenv("SENTIMENT_MEMORY_ENTRIES", "256"))
+
+# Long calls are scored in overlapping windows of sentences sized by an
+# estimated token budget, several windows at a time, merged back by index
+WINDOW_TOKEN_BUDGET = int(os.getenv("SENTIMENT_WINDOW_TOKENS", "2000"))
+WINDOW_OVERLAP = 2
+MAX_SENTENCE_CHARS = 2000
+MAX_WORKERS = int(os.getenv("SENTIMENT_WORKERS", "4"))
+# Extra requests for indices the model skipped before the heuristic fills them
+MAX_RETRY_ROUNDS = 2
+
+# Conversations scored at once by the ingest stage (each runs up to
+# MAX_WORKERS windows concurrently); 0 turns off scoring at ingest, leaving
+# uncached calls to be scored on first view
+STAGE_WORKERS = int(os.getenv("SENTIMENT_STAGE_WORKERS", "2"))
+# How long a request waits on a scoring job before answering 202 (short: the
+# request holds a server thread while it waits; clients poll)
+WAIT_SECONDS = float(os.getenv("SENTIMENT_WAIT_SECONDS", "3"))
+
+_WINDOW_PROMPT = """
+You are a precise sentiment scoring engine. Score each sentence independently for sentiment on a 0 to 10 float scale where:
+0 = extremely negative/distressed
+2 = clearly negative
+5 = neutral / mixed / informational
+8 = clearly positive / supportive
+10 = extremely positive / delighted / strongly reassuring
+
+IMPORTANT:
+- Judge ONLY the emotional valence contained in the sentence itself (not future context).
+- Keep cultural / language nuances (text may be transliterated Hindi) and focus on user feeling ("user") or AI tone ("ai").
+- Return ONLY a JSON array with one object per input item, in the form
+[{{"i": <index from input>, "score": <float>}}, ...]
+Keep every index from the input. Do NOT include the sentence text. No markdown.
+If a sentence is purely procedural or neutral, score near 5.
+
+Input:
+{items}
+"""
+
+
+def _estimate_tokens(text):
+    # ~3-4 bytes per token for Latin text; Devanagari is 3 bytes per character
+    return len(text.encode("utf-8")) // 3 + 4
+
+
+def _windows(items, budget=WINDOW_TOKEN_BUDGET, overlap=WINDOW_OVERLAP):
+    """Split [(i, speaker, text)] into windows of at most `budget` estimated
+    tokens, each repeating the last `overlap` sentences of the previous one"""
+    windows, start = [], 0
+    while start < len(items):
+        end, tokens = start, 0
+        while end < len(items) and (end == start or tokens + _estimate_tokens(items[end][2]) <= budget):
+            tokens += _estimate_tokens(items[end][2])
+            end += 1
+        windows.append(items[start:end])
+        if end >= len(items):
+            break
+        start = max(start + 1, end - overlap)
+    return windows
 
-    # Try disk cache first
-    if os.path.exists(disk_cache_path):
+
+def _parse_scores(text):
+    match = re.search(r"\[[\s\S]*\]", text)
+    items = json.loads(match.group(0) if match else text)
+    out = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
         try:
-            with open(disk_cache_path, 'r', encoding='utf-8') as f:
-                cached = json.load(f)
-            # We still need convo sentences to know true counts for robustify; load convo file quickly
-            convo_path = os.path.join(CONVO_DIR, filename)
-            user_sentences_local, ai_sentences_local = [], []
-            if os.path.exists(convo_path):
-                try:
-                    with open(convo_path, 'r', encoding='utf-8') as cf:
-                        convo_data = json.load(cf)
-                        convo_list = convo_data.get('conversation', [])
-                        user_sentences_local = [c for c in convo_list if c.get('speaker')=='user']
-                        ai_sentences_local = [c for c in convo_list if c.get('speaker')=='ai']
-                except Exception:
-                    pass
-            robust = robustify(cached, user_sentences_local, ai_sentences_local)
-            return robust
-        except Exception:
-            pass  # fall through to regeneration
+            out[int(item["i"])] = max(0.0, min(10.0, float(item["score"])))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return out
 
+
+def _score_window(client, window):
+    items = json.dumps([{"i": i, "speaker": speaker, "text": text} for i, speaker, text in window],
+                       ensure_ascii=False)
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        response = generate(client, _WINDOW_PROMPT.format(items=items), model=SENTIMENT_MODEL_NAME,
+                            site="sentiment.window")
+        requested = {i for i, _, _ in window}
+        return {i: score for i, score in _parse_scores(response).items() if i in requested}
     except Exception as e:
-        return {"error": f"Failed to load file: {e}"}
+        print(f"Sentiment window failed: {e}")
+        return {}
+
+
+def score_sentences(items, client=None, max_workers=MAX_WORKERS, budget=WINDOW_TOKEN_BUDGET):
+    """Score [(i, speaker, text)] in concurrent windows.
+    Sentences covered by two overlapping windows get the mean of both scores;
+    indices the model leaves out are re-requested (without overlap, in windows
+    half the size, since dropped items usually mean the answer ran out of
+    room) for up to MAX_RETRY_ROUNDS more rounds. Returns ({i: score}, stats)."""
+    client = client or get_client()
+    items = [(i, speaker, (text or "").replace("\n", " ").strip()[:MAX_SENTENCE_CHARS]) for i, speaker, text in items]
+    sums, counts = {}, {}
+    stats = {"windows": 0, "rounds": 0}
+    pending, overlap = items, WINDOW_OVERLAP
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for _ in range(1 + MAX_RETRY_ROUNDS):
+            if not pending:
+                break
+            windows = _windows(pending, budget=budget, overlap=overlap)
+            stats["windows"] += len(windows)
+            stats["rounds"] += 1
+            for result in pool.map(lambda w: _score_window(client, w), windows):
+                for i, score in result.items():
+                    sums[i] = sums.get(i, 0.0) + score
+                    counts[i] = counts.get(i, 0) + 1
+            pending, overlap = [item for item in items if item[0] not in sums], 0
+            budget = max(1, budget // 2)
+    return {i: sums[i] / counts[i] for i in sums}, stats
+
+
+# Heuristic fallback sentiment (lexical scoring over sentiment_lexicon.tsv;
+# these terms are used only if that file is missing)
+NEG_WORDS = {"problem","samasya","karz","loan","byaj","mafi","nahi","nahin","burden","loss","damage","fail","issue","confused","anxious"}
+POS_WORDS = {"achha","theek","fayda","hope","sahi","improve","kam","kamkar","solution","help","support","relief","relieved"}
+
+
+def _scorer():
+    return get_scorer(default_weights={**{w: -1.0 for w in NEG_WORDS}, **{w: 1.0 for w in POS_WORDS}})
+
+
+def heuristic_score(text: str) -> float:
+    return _scorer().score(text)
 
-    conversation = data.get("conversation", [])
+
+def heuristic_scores(texts):
+    """heuristic_score of each text, in one scan"""
+    return _scorer().score_many(texts)
+
+
+def robustify(parsed_obj):
+    """Ensure both user & ai arrays exist, non-empty, and aligned in length.
+    If one side missing or empty, synthesize neutral baseline (5.0) matching other length.
+    If lengths differ, pad shorter with last running average (baseline 5)."""
+    if not isinstance(parsed_obj, dict):
+        return parsed_obj
+    parsed_obj.setdefault('user', [])
+    parsed_obj.setdefault('ai', [])
+    fallback_meta = parsed_obj.get('meta', {}) or {}
+    # Build baseline if one side empty but other has content
+    user_len = len(parsed_obj['user'])
+    ai_len = len(parsed_obj['ai'])
+    # Helper to compute running avg
+    def running_avg(series):
+        if not series: return 5.0
+        total = 0.0
+        for i, item in enumerate(series, start=1):
+            total += float(item.get('score', 5))
+        return total / len(series)
+    if user_len == 0 and ai_len > 0:
+        baseline = running_avg(parsed_obj['ai']) if ai_len else 5.0
+        parsed_obj['user'] = [{"index": i+1, "score": round(baseline,2)} for i in range(ai_len)]
+        fallback_meta['user_baseline_injected'] = True
+    if ai_len == 0 and user_len > 0:
+        baseline = running_avg(parsed_obj['user']) if user_len else 5.0
+        parsed_obj['ai'] = [{"index": i+1, "score": round(baseline,2)} for i in range(user_len)]
+        fallback_meta['ai_baseline_injected'] = True
+    # Recompute lengths after baseline injection
+    user_len = len(parsed_obj['user'])
+    ai_len = len(parsed_obj['ai'])
+    if user_len == 0 and ai_len == 0:
+        # Completely empty: synthesize single neutral point
+        parsed_obj['user'] = [{"index":1, "score":5.0}]
+        parsed_obj['ai'] = [{"index":1, "score":5.0}]
+        fallback_meta['both_baseline_injected'] = True
+    # Pad shorter side
+    user_len = len(parsed_obj['user'])
+    ai_len = len(parsed_obj['ai'])
+    if user_len != ai_len:
+        target = max(user_len, ai_len)
+        def pad(series):
+            if not series:
+                last_avg = 5.0
+            else:
+                total = 0.0
+                for i, item in enumerate(series, start=1):
+                    total += float(item.get('score',5))
+                last_avg = total / len(series)
+            start_idx = series[-1]['index'] + 1 if series else 1
+            for idx in range(start_idx, target+1):
+                series.append({"index": idx, "score": round(last_avg,2)})
+        if user_len < target:
+            pad(parsed_obj['user'])
+            fallback_meta['user_padded'] = True
+        if ai_len < target:
+            pad(parsed_obj['ai'])
+            fallback_meta['ai_padded'] = True
+    # Ensure indices sequential starting at 1
+    for key in ['user','ai']:
+        parsed_obj[key].sort(key=lambda x: x.get('index', 0))
+        for i, item in enumerate(parsed_obj[key], start=1):
+            item['index'] = i
+    parsed_obj['meta'] = {**parsed_obj.get('meta', {}), **fallback_meta}
+    return parsed_obj
+
+
+def _build_full_heuristic(user_sentences, ai_sentences):
+    user_scores, ai_scores = _scorer().score_conversations([user_sentences, ai_sentences])
+    return {
+        "user": [{"index": i + 1, "score": round(score, 2)} for i, score in enumerate(user_scores)],
+        "ai": [{"index": i + 1, "score": round(score, 2)} for i, score in enumerate(ai_scores)],
+        "meta": {"heuristic_only": True},
+    }
+
+
+def compute_sentiment_flow(conversation):
+    """Per-sentence user/AI scores for a conversation list, uncached"""
     if not conversation:
         # Return neutral baseline for empty convo
-        empty_parsed = {"user": [{"index":1,"score":5.0}], "ai": [{"index":1,"score":5.0}], "meta": {"both_baseline_injected": True}}
-        try:
-            with open(disk_cache_path, 'w', encoding='utf-8') as f:
-                json.dump(empty_parsed, f, ensure_ascii=False, indent=2)
-        except Exception:
-            pass
-        return empty_parsed
+        return {"user": [{"index":1,"score":5.0}], "ai": [{"index":1,"score":5.0}], "meta": {"both_baseline_injected": True}}
 
     user_sentences = [c for c in conversation if c.get("speaker") == "user"]
     ai_sentences = [c for c in conversation if c.get("speaker") == "ai"]
 
-    # Heuristic fallback sentiment (very simple lexical scoring)
-    neg_words = {"problem","samasya","karz","loan","byaj","mafi","nahi","nahin","burden","loss","damage","fail","issue","confused","anxious"}
-    pos_words = {"achha","theek","fayda","hope","sahi","improve","kam","kamkar","solution","help","support","relief","relieved"}
-    def heuristic_score(text: str) -> float:
-        if not text:
-            return 5.0
-        t = text.lower()
-        neg = sum(1 for w in neg_words if w in t)
-        pos = sum(1 for w in pos_words if w in t)
-        if neg==0 and pos==0:
-            return 5.0
-        raw = 5.0 + (pos - neg) * 1.2  # shift by difference
-        return max(0.0, min(10.0, raw))
-
-    # Build numbered lists to help model stay aligned
-    def build_numbered(sentences):
-        lines = []
-        for i, s in enumerate(sentences, start=1):
-            text = s.get("text", "").replace('\n', ' ').strip()
-            if len(text) > 500:  # truncate overly long content
-                text = text[:500] + "..."
-            lines.append(f"{i}. {text}")
-        return "\n".join(lines)
-
-    user_block = build_numbered(user_sentences)
-    ai_block = build_numbered(ai_sentences)
-
-    # Helper: build full heuristic fallback object
-    def build_full_heuristic():
-        return {
-            "user": [
-                {"index": i + 1, "score": round(heuristic_score(s.get("text", "")), 2)}
-                for i, s in enumerate(user_sentences)
-            ],
-            "ai": [
-                {"index": i + 1, "score": round(heuristic_score(s.get("text", "")), 2)}
-                for i, s in enumerate(ai_sentences)
-            ],
-            "meta": {"heuristic_only": True},
-        }
-
     # If API key is missing, skip model and return heuristic-only
     if not os.getenv("GEMINI_API_KEY"):
-        parsed = robustify(build_full_heuristic(), user_sentences, ai_sentences)
+        return robustify(_build_full_heuristic(user_sentences, ai_sentences))
+
+    try:
+        # Both speakers go through together so windows keep the back-and-forth
+        # context; `i` is the position in the conversation
+        items = [(i, c.get("speaker"), c.get("text", "")) for i, c in enumerate(conversation)
+                 if c.get("speaker") in ("user", "ai")]
+        scores, stats = score_sentences(items)
+        if not scores:
+            raise ValueError("no sentiment scores returned")
+
+        parsed = {"user": [], "ai": [], "meta": {"user_fallback": False, "ai_fallback": False, **stats}}
+        for speaker in ("user", "ai"):
+            series = [(i, c) for i, c in enumerate(conversation) if c.get("speaker") == speaker]
+            for n, (i, c) in enumerate(series, start=1):
+                if i in scores:
+                    score = scores[i]
+                else:
+                    # still missing after the retry rounds
+                    score = heuristic_score(c.get("text", ""))
+                    parsed["meta"][f"{speaker}_fallback"] = True
+                parsed[speaker].append({"index": n, "score": round(score, 2)})
+        return robustify(parsed)
+    except Exception:
+        # Any model error -> return heuristic-only fallback
+        return robustify(_build_full_heuristic(user_sentences, ai_sentences))
+
+
+def _normalize_filename(filename):
+    # Normalize filename to a convoJson json file name
+    base = os.path.basename(filename or "").strip()
+    if base.endswith(".txt"):
+        base = base[:-4] + ".json"
+    elif not base.endswith(".json"):
+        base = base + ".json"
+    return base
+
+
+def content_version(filepath):
+    """Version of a convoJson file without reading it. The parser replaces
+    files by rename, so any rewrite changes mtime_ns (and usually size)."""
+    st = os.stat(filepath)
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+class SentimentFlowCache:
+    """Sentiment curves keyed by (filename, content version).
+    A bounded in-memory LRU sits in front of one small JSON file per
+    conversation in CACHE_DIR that records the version it was computed from,
+    so a hit costs a stat plus (at most) that one read. Entries computed from
+    an older version of the conversation are never served.
+
+    Scoring itself only happens on a bounded job pool: the ingest stage
+    submits each conversation as it is written, and a request for a curve
+    that is not ready waits on the job already in flight for that version
+    (or queues one) rather than scoring on its own thread. A flock per
+    conversation keeps separate worker processes from scoring it twice."""
+
+    def __init__(self, cache_dir=CACHE_DIR, convo_dir=CONVO_DIR, memory_entries=MEMORY_ENTRIES,
+                 stage_workers=STAGE_WORKERS):
+        self.cache_dir = cache_dir
+        self.convo_dir = convo_dir
+        self.memory_entries = memory_entries
+        self.stage_workers = stage_workers
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._pool = None
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stale": 0, "invalidations": 0,
+                         "submitted": 0, "coalesced": 0, "computed": 0, "failed": 0, "timeouts": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _disk_path(self, filename):
+        # Keep cache file name simple and safe
+        safe_name = re.sub(r"[^a-zA-Z0-9_.-]", "_", filename)
+        return os.path.join(self.cache_dir, f"{safe_name}.sentiment.json")
+
+    def _remember(self, filename, version, flow):
+        with self._lock:
+            self._memory[filename] = (version, flow)
+            self._memory.move_to_end(filename)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _read_disk(self, filename, version):
         try:
-            with open(disk_cache_path, 'w', encoding='utf-8') as f:
-                json.dump(parsed, f, ensure_ascii=False, indent=2)
-        except Exception:
-            pass
-        return parsed
+            with open(self._disk_path(filename), "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not isinstance(cached, dict) or cached.get("version") != version:
+            self._count("stale")
+            return None
+        return cached.get("flow")
 
-    model = genai.GenerativeModel(SENTIMENT_MODEL_NAME)
+    def _cached(self, filename, version):
+        with self._lock:
+            entry = self._memory.get(filename)
+            if entry is not None and entry[0] == version:
+                self._memory.move_to_end(filename)
+                self.counters["memory_hits"] += 1
+                return entry[1]
 
-    prompt = f"""
-You are a precise sentiment scoring engine. Score each sentence independently for sentiment on a 0 to 10 float scale where:
-0 = extremely negative/distressed
-2 = clearly negative
-5 = neutral / mixed / informational
-8 = clearly positive / supportive
-10 = extremely positive / delighted / strongly reassuring
+        flow = self._read_disk(filename, version)
+        if flow is not None:
+            self._count("disk_hits")
+            self._remember(filename, version, flow)
+        return flow
 
-IMPORTANT:
-- Judge ONLY the emotional valence contained in the sentence itself (not future context).
-- Keep cultural / language nuances (text may be transliterated Hindi) and focus on user feeling or AI tone.
-- Return STRICT JSON with this exact schema:
-{{
-  "user": [{{"index": <number>, "score": <float>}} ...],
-  "ai": [{{"index": <number>, "score": <float>}} ...]
-}}
-Do NOT include the sentence text in the JSON (frontend already has it). Ensure indices align with numbering below.
-If a sentence is purely procedural or neutral, score near 5.
+    def _executor(self):
+        # callers hold self._lock
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=max(1, self.stage_workers),
+                                            thread_name_prefix="sentiment-stage")
+        return self._pool
 
-User sentences:
-{user_block}
+    def _compute(self, filename, version, conversation=None):
+        """Job body: score one version of a conversation and store it"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self._disk_path(filename) + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # another process may have scored this version while we waited
+                flow = self._read_disk(filename, version)
+                if flow is not None:
+                    self._remember(filename, version, flow)
+                    return flow
+                if conversation is None:
+                    try:
+                        conversation = read_turns(os.path.join(self.convo_dir, filename))
+                    except Exception as e:
+                        self._count("failed")
+                        return {"error": f"Failed to load file: {e}"}
+                with timer("stage_seconds", stage="sentiment.score"):
+                    flow = compute_sentiment_flow(conversation)
+                self._count("computed")
+                try:
+                    current = content_version(os.path.join(self.convo_dir, filename))
+                except FileNotFoundError:
+                    current = None
+                if current == version:  # rewritten meanwhile: its own job stores the new curve
+                    try:
+                        atomic_write_json(self._disk_path(filename), {"version": version, "flow": flow}, indent=None)
+                    except OSError as e:
+                        print(f"Could not write sentiment cache for {filename}: {e}")
+                self._remember(filename, version, flow)
+                return flow
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
 
-AI sentences:
-{ai_block}
+    def _finished(self, filename, future):
+        with self._lock:
+            if self._inflight.get(filename, (None, None))[1] is future:
+                del self._inflight[filename]
+        if future.exception() is not None:
+            self._count("failed")
+            print(f"Sentiment scoring failed for {filename}: {future.exception()}")
 
-Return ONLY JSON. No markdown.
-"""
+    def submit(self, filename, version, conversation=None):
+        """Queue scoring of this version of a conversation, or return the
+        Future of the job already in flight for it. conversation may be
+        passed when the caller has it in memory (as ingest does)."""
+        filename = _normalize_filename(filename)
+        with self._lock:
+            entry = self._inflight.get(filename)
+            if entry is not None and entry[0] == version:
+                self.counters["coalesced"] += 1
+                return entry[1]
+            future = self._executor().submit(follow(self._compute), filename, version, conversation)
+            self._inflight[filename] = (version, future)
+            self.counters["submitted"] += 1
+        future.add_done_callback(lambda f: self._finished(filename, f))
+        return future
 
-    try:
-        response = model.generate_content(prompt)
-        raw = response.text.strip()
-        # Attempt to extract JSON
-        match = re.search(r"\{[\s\S]*\}$", raw)
-        json_str = match.group(0) if match else raw
-        parsed = json.loads(json_str)
-        # Basic validation
-        if not isinstance(parsed, dict) or 'user' not in parsed or 'ai' not in parsed:
-            return {"error": "Malformed response"}
-
-        fallback_meta = {"user_fallback": False, "ai_fallback": False}
-
-        # If model returned empty arrays but we have sentences, build heuristic list
-        def build_fallback(series_name: str, sentences_list):
-            return [{"index": i+1, "score": round(heuristic_score(s.get('text','')),2)} for i, s in enumerate(sentences_list)]
-
-        if (not parsed['user']) and user_sentences:
-            parsed['user'] = build_fallback('user', user_sentences)
-            fallback_meta['user_fallback'] = True
-        # If model returned fewer than actual sentences, append heuristic scores for missing
-        if user_sentences and len(parsed['user']) < len(user_sentences):
-            existing_indices = {p['index'] for p in parsed['user'] if 'index' in p}
-            for i, s in enumerate(user_sentences, start=1):
-                if i not in existing_indices:
-                    parsed['user'].append({"index": i, "score": round(heuristic_score(s.get('text','')),2)})
-            parsed['user'].sort(key=lambda x: x['index'])
-            fallback_meta['user_fallback'] = True
-
-        if (not parsed['ai']) and ai_sentences:
-            parsed['ai'] = build_fallback('ai', ai_sentences)
-            fallback_meta['ai_fallback'] = True
-        if ai_sentences and len(parsed['ai']) < len(ai_sentences):
-            existing_indices = {p['index'] for p in parsed['ai'] if 'index' in p}
-            for i, s in enumerate(ai_sentences, start=1):
-                if i not in existing_indices:
-                    parsed['ai'].append({"index": i, "score": round(heuristic_score(s.get('text','')),2)})
-            parsed['ai'].sort(key=lambda x: x['index'])
-            fallback_meta['ai_fallback'] = True
-
-        parsed = robustify(parsed, user_sentences, ai_sentences)
-        # Persist to disk cache
+    def precompute(self, json_path, parsed_json):
+        """Ingest stage: drop curves for the previous version of a freshly
+        written conversation and score the new one in the background"""
+        filename = os.path.basename(json_path)
+        self.invalidate(filename)
+        self.submit(filename, content_version(json_path), parsed_json.get("conversation", []))
+
+    def get(self, filename, wait=WAIT_SECONDS):
+        """The curve for the current version of filename. Never scores on the
+        calling thread: waits up to `wait` seconds on the scoring job and
+        returns None if it is still running."""
+        filename = _normalize_filename(filename)
+        filepath = os.path.join(self.convo_dir, filename)
         try:
-            with open(disk_cache_path, 'w', encoding='utf-8') as f:
-                json.dump(parsed, f, ensure_ascii=False, indent=2)
-        except Exception:
-            pass
-        return parsed
-    except Exception:
-        # Any model error -> return heuristic-only fallback
-        parsed = robustify(build_full_heuristic(), user_sentences, ai_sentences)
+            version = content_version(filepath)
+        except FileNotFoundError:
+            return {"error": "File not found"}
+
+        flow = self._cached(filename, version)
+        if flow is not None:
+            return flow
+
+        self._count("misses")
+        future = self.submit(filename, version)
+        try:
+            return future.result(timeout=wait)
+        except FutureTimeout:
+            self._count("timeouts")
+            return None
+
+    def invalidate(self, filename):
+        """Drop cached curves for a conversation (called when it is rewritten)"""
+        filename = _normalize_filename(filename)
+        with self._lock:
+            self._memory.pop(filename, None)
+            self.counters["invalidations"] += 1
         try:
-            with open(disk_cache_path, 'w', encoding='utf-8') as f:
-                json.dump(parsed, f, ensure_ascii=False, indent=2)
-        except Exception:
+            os.unlink(self._disk_path(filename))
+        except FileNotFoundError:
             pass
-        return parsed
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            memory_size = len(self._memory)
+            in_flight = len(self._inflight)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        return {**counters, "hit_rate": round(hits / lookups, 4) if lookups else None,
+                "memory_entries": memory_size, "in_flight": in_flight,
+                "stage_workers": self.stage_workers}
+
+
+_cache = SentimentFlowCache()
+
+
+def get_sentiment_flow(filename: str, wait=WAIT_SECONDS):
+    """Public wrapper with cache control. None while scoring is still running."""
+    return _cache.get(filename, wait=wait)
+
+
+def precompute_sentiment_flow(json_path, parsed_json):
+    """Ingest pipeline stage, run after a conversation is written"""
+    _cache.precompute(json_path, parsed_json)
+
+
+def invalidate_sentiment_flow(filename: str):
+    _cache.invalidate(filename)
 
 
-def get_sentiment_flow(filename: str):
-    """Public wrapper with cache control."""
-    return _cached_sentiment_analysis(filename)
+def get_sentiment_cache_stats():
+    return _cache.stats()
@@ -0,0 +1,32 @@
+import re
+
+# Speaker prefixes like "Villager:" or "Sumitra Devi:" at line starts
+_SPEAKER_RE = re.compile(r"^(?P<speaker>[A-Za-z .]+):\s*(?P<msg>.*)$")
+
+
+def parse_transcript(text):
+    """Turn a plain text transcript into a conversation array.
+    Lines from the villager are 'user', lines with a named caller/agent are
+    'ai'; unprefixed lines continue the previous speaker."""
+    conversation = []
+    last_speaker = None
+    for ln in (ln.strip() for ln in text.splitlines()):
+        if not ln:
+            continue
+        m = _SPEAKER_RE.match(ln)
+        if m:
+            raw_speaker = m.group("speaker").strip().lower()
+            msg = m.group("msg").strip()
+            if not msg:
+                continue
+            if "villager" in raw_speaker or "user" in raw_speaker:
+                speaker = "user"
+            else:
+                speaker = "ai"
+            conversation.append({"speaker": speaker, "text": msg})
+            last_speaker = speaker
+        else:
+            if last_speaker is None:
+                last_speaker = "user"
+            conversation.append({"speaker": last_speaker, "text": ln})
+    return conversation
@@ -10,6 +10,7 @@ import { RecentConversations } from './RecentConversations';
 import { ConcernsPieChart } from './ConcernsPieChart';
 import RealTimePivotTable from './RealTimePivotTable';
 import { apiJson } from '@/lib/api';
+import { useLiveCall } from '@/hooks/use-live-calls';
 
 async function fetchDashboardData() {
   try {
@@ -240,6 +241,7 @@ export const Dashboard = () => {
   const [calls, setCalls] = useState<CallItem[] | null>(null);
   const [dataCaptureMetrics, setDataCaptureMetrics] = useState<DataCaptureMetrics | null>(null);
   const [isDemoMetrics, setIsDemoMetrics] = useState(false);
+  const liveCall = useLiveCall();
 
   useEffect(() => {
     // Load primary dashboard data
@@ -277,7 +279,7 @@ export const Dashboard = () => {
 
   // Simulate real-time data updates for transcript
   useEffect(() => {
-  if (!dashboardData) { return; }
+  if (!dashboardData || liveCall) { return; }
 
     const messageInterval = setInterval(() => {
       setDisplayedMessages(prev => {
@@ -293,7 +295,14 @@ export const Dashboard = () => {
     return () => {
       clearInterval(messageInterval);
     };
-  }, [dashboardData]);
+  }, [dashboardData, liveCall]);
+
+  // Turns pushed from an in-progress call take over the transcript feed
+  useEffect(() => {
+    if (liveCall && liveCall.turns.length > 0) {
+      setDisplayedMessages(liveCall.turns);
+    }
+  }, [liveCall]);
 
   if (!dashboardData) {
     return (
@@ -482,7 +491,7 @@ export const Dashboard = () => {
             {/* Left Column */}
             <div className="lg:col-span-2 flex flex-col gap-6">
               <div className="h-[40rem] min-h-0 glass rounded-2xl p-4">
-                <TranscriptFeed messages={displayedMessages} isLive={true} />
+                <TranscriptFeed messages={displayedMessages} isLive={!liveCall || !liveCall.ended} />
               </div>
               <div className="h-80 md:h-96 flex-shrink-0">
                 <ConcernsPieChart />
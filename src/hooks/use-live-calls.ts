@@ -0,0 +1,132 @@
+import * as React from "react"
+import { apiFetch } from "@/lib/api"
+
+export interface LiveTurn {
+  speaker: "user" | "ai"
+  text: string
+  timestamp: string
+}
+
+export interface LiveCall {
+  file: string
+  turns: LiveTurn[]
+  ended: boolean
+}
+
+interface StreamEvent {
+  id: string | null
+  type: string
+  data: string
+}
+
+const DEFAULT_RETRY_MS = 3000
+
+// Reads a text/event-stream body (the fields the backend sends: id, event,
+// data, retry and ": keep-alive" comments) until the server closes it.
+async function readEvents(
+  body: ReadableStream<Uint8Array>,
+  onEvent: (event: StreamEvent) => void,
+  onRetry: (ms: number) => void
+) {
+  const reader = body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ""
+  let id: string | null = null
+  let type = "message"
+  let data: string[] = []
+
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) return
+    buffer += decoder.decode(value, { stream: true })
+    const lines = buffer.split("\n")
+    buffer = lines.pop() ?? ""
+    for (const raw of lines) {
+      const line = raw.endsWith("\r") ? raw.slice(0, -1) : raw
+      if (line === "") {
+        if (data.length) onEvent({ id, type, data: data.join("\n") })
+        id = null
+        type = "message"
+        data = []
+        continue
+      }
+      if (line.startsWith(":")) continue
+      const colon = line.indexOf(":")
+      const field = colon === -1 ? line : line.slice(0, colon)
+      let fieldValue = colon === -1 ? "" : line.slice(colon + 1)
+      if (fieldValue.startsWith(" ")) fieldValue = fieldValue.slice(1)
+      if (field === "id") id = fieldValue
+      else if (field === "event") type = fieldValue
+      else if (field === "data") data.push(fieldValue)
+      else if (field === "retry" && /^\d+$/.test(fieldValue)) onRetry(Number(fieldValue))
+    }
+  }
+}
+
+function wait(ms: number, signal: AbortSignal) {
+  return new Promise<void>((resolve) => {
+    const timer = setTimeout(resolve, ms)
+    signal.addEventListener("abort", () => {
+      clearTimeout(timer)
+      resolve()
+    }, { once: true })
+  })
+}
+
+// Subscribes to the backend's /stream/calls Server-Sent Events feed and keeps
+// the most recently active in-progress call. The stream is read with apiFetch
+// rather than EventSource, which cannot send the ngrok-skip-browser-warning
+// header (behind the tunnel it would get ngrok's HTML page). Reconnects after
+// the server's retry: delay (or Retry-After on a 503) and resumes from the
+// last event id, as EventSource would.
+export function useLiveCall() {
+  const [call, setCall] = React.useState<LiveCall | null>(null)
+
+  React.useEffect(() => {
+    const controller = new AbortController()
+    let lastEventId: string | null = null
+    let retryMs = DEFAULT_RETRY_MS
+
+    const handle = (event: StreamEvent) => {
+      if (event.id !== null) lastEventId = event.id
+      const data = JSON.parse(event.data)
+      if (event.type === "call_started") {
+        setCall({ file: data.file, turns: [], ended: false })
+      } else if (event.type === "turn") {
+        setCall((prev) =>
+          prev && prev.file === data.file
+            ? { ...prev, turns: [...prev.turns, data.turn] }
+            : { file: data.file, turns: [data.turn], ended: false }
+        )
+      } else if (event.type === "call_ended") {
+        setCall((prev) => (prev && prev.file === data.file ? { ...prev, ended: true } : prev))
+      }
+    }
+
+    const run = async () => {
+      while (!controller.signal.aborted) {
+        let delay = retryMs
+        try {
+          const headers: Record<string, string> = { Accept: "text/event-stream" }
+          if (lastEventId !== null) headers["Last-Event-ID"] = lastEventId
+          const res = await apiFetch("/stream/calls", { headers, cache: "no-store", signal: controller.signal })
+          if (res.ok && res.body) {
+            await readEvents(res.body, handle, (ms) => { retryMs = ms })
+            delay = retryMs
+          } else {
+            const retryAfter = Number(res.headers.get("Retry-After"))
+            if (retryAfter > 0) delay = retryAfter * 1000
+          }
+        } catch (err) {
+          if (controller.signal.aborted) return
+        }
+        await wait(delay, controller.signal)
+      }
+    }
+    run()
+
+    return () => controller.abort()
+  }, [])
+
+  return call
+}
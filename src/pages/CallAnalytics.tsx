@@ -107,8 +107,13 @@ export default function CallAnalytics() {
 						? base.replace(/\.txt$/, '.json')
 						: `${base}.json`;
 
-				const res = await apiFetch(`/sentiment_flow/${encodeURIComponent(jsonName)}`);
-				if(!res.ok) {
+				let res = await apiFetch(`/sentiment_flow/${encodeURIComponent(jsonName)}`);
+				// 202: the call is still being scored at ingest
+				for(let attempt = 0; res.status === 202 && attempt < 30; attempt++) {
+					await new Promise(resolve => setTimeout(resolve, 2000));
+					res = await apiFetch(`/sentiment_flow/${encodeURIComponent(jsonName)}`);
+				}
+				if(!res.ok || res.status === 202) {
 					throw new Error('Failed to fetch sentiment flow');
 				}
 				const data = await res.json();
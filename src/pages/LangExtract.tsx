@@ -1,5 +1,5 @@
 import { useState, useEffect } from "react";
-import { apiJson } from '@/lib/api';
+import { apiFetch, apiJson } from '@/lib/api';
 import {
   Card,
   CardContent,
@@ -26,6 +26,43 @@ import {
 } from "@/components/ui/select";
 import { Skeleton } from "@/components/ui/skeleton";
 
+// The visualization is fetched with apiFetch rather than loaded by the iframe
+// itself: an iframe src cannot send the ngrok-skip-browser-warning header, so
+// behind the tunnel it would show ngrok's interstitial page instead.
+const VisualizationFrame = ({ url }: { url: string }) => {
+  const [html, setHtml] = useState<string | null>(null);
+  const [error, setError] = useState<string | null>(null);
+
+  useEffect(() => {
+    let cancelled = false;
+    setHtml(null);
+    setError(null);
+    apiFetch(url, { headers: { Accept: "text/html" } })
+      .then(async (res) => {
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        const text = await res.text();
+        if (!cancelled) setHtml(text);
+      })
+      .catch((err) => {
+        if (!cancelled) setError(err.message);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [url]);
+
+  if (error) return <p className="text-red-500">{error}</p>;
+  if (html === null) return <Skeleton className="h-96 w-full" />;
+  return (
+    <iframe
+      srcDoc={html}
+      className="w-full h-full"
+      style={{ minHeight: "400px" }}
+      title="Transcript Visualization"
+    />
+  );
+};
+
 const LangExtractPage = () => {
   const [transcripts, setTranscripts] = useState<string[]>([]);
   const [selectedTranscript, setSelectedTranscript] = useState<string | null>(
@@ -57,7 +94,19 @@ const LangExtractPage = () => {
         setError(null);
         setAnalysis(null);
         try {
-		  const data = await apiJson(`/analyze/${selectedTranscript}`);
+		  let res = await apiFetch(`/analyze/${encodeURIComponent(selectedTranscript)}`);
+		  // 202: the extraction is still running on the server; poll until it lands in the cache
+		  for (let attempt = 0; res.status === 202 && attempt < 60; attempt++) {
+		    await new Promise(resolve => setTimeout(resolve, 2000));
+		    res = await apiFetch(`/analyze/${encodeURIComponent(selectedTranscript)}`);
+		  }
+		  if (res.status === 202) {
+		    throw new Error('Analysis is taking longer than expected; try again shortly');
+		  }
+		  const data = await res.json();
+		  if (!res.ok || data.error) {
+		    throw new Error(data.error || `HTTP ${res.status}`);
+		  }
           setAnalysis(data);
         } catch (err) {
           setError(err.message);
@@ -176,13 +225,8 @@ const LangExtractPage = () => {
                       Transcript Visualization
                     </h3>
                     <ScrollArea className="h-96 w-full rounded-md border">
-                      {analysis.visualization_html ? (
-                        <iframe
-                          srcDoc={analysis.visualization_html}
-                          className="w-full h-full"
-                          style={{ minHeight: "400px" }}
-                          title="Transcript Visualization"
-                        />
+                      {analysis.visualization_url ? (
+                        <VisualizationFrame url={analysis.visualization_url} />
                       ) : (
                         <p>No visualization available.</p>
                       )}